@@ -11,10 +11,30 @@ Usage: python process_sprites.py [pokemon_name] [--all]
 
 import os
 import re
+import collections
+import io
+import bisect
 import json
+import ctypes
+import ctypes.util
+import mmap
+import select
+import struct
+import hashlib
+import subprocess
+import tempfile
+import time
+import queue
+import threading
+import tracemalloc
+import contextlib
+import cProfile
+import pstats
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from pathlib import Path
-from typing import Dict, List, Tuple, Optional
-from PIL import Image, ImagePalette
+from typing import Dict, List, Tuple, Optional, NamedTuple
+from PIL import Image, ImageChops, ImagePalette, ImageSequence
 import argparse
 
 
@@ -119,6 +139,660 @@ class GBCPaletteParser:
 
         return colors[:4]  # GBC sprites use max 4 colors
 
+    @staticmethod
+    def parse_rgb555(data: bytes) -> List[Tuple[int, int, int]]:
+        """Colors stored in a built ROM (little-endian xBBBBBGGGGGRRRRR words), converted like a .pal file"""
+        colors = []
+        for i in range(0, len(data) - 1, 2):
+            word = data[i] | data[i + 1] << 8
+            r, g, b = word & 0x1f, word >> 5 & 0x1f, word >> 10 & 0x1f
+            colors.append(((r * 255) // 31, (g * 255) // 31, (b * 255) // 31))
+        while len(colors) < 4:
+            colors.append((0, 0, 0))
+        return colors[:4]
+
+class GBCPaletteDatabase:
+    """Every .pal file under gfx/pokemon and gfx/trainers, parsed once per run
+
+    Palettes are keyed on their path relative to the ROM root, so every lookup is
+    a dictionary hit. With a cache file, files whose mtime and size are unchanged
+    reuse the colors parsed by the previous run instead of being read again.
+    """
+
+    FILE_NAME = '.sprite_palette_db.json'
+    FORMAT_VERSION = 1
+    SEARCH_DIRS = ('gfx/pokemon', 'gfx/trainers')
+
+    def __init__(self, rom_path: Path, cache_path: Optional[Path] = None):
+        self.rom_path = rom_path
+        self.cache_path = cache_path
+        self.palettes: Dict[str, Tuple[Tuple[int, int, int], ...]] = {}
+        self.parsed = 0
+        self.reused = 0
+        self._build()
+
+    def _build(self):
+        previous = {}
+        if self.cache_path is not None:
+            try:
+                with open(self.cache_path, 'r') as f:
+                    data = json.load(f)
+                if data.get('version') == self.FORMAT_VERSION:
+                    previous = data.get('palettes', {})
+            except (OSError, ValueError):
+                pass
+
+        stamps = {}
+        pending = [self.rom_path / search_dir for search_dir in self.SEARCH_DIRS]
+        while pending:
+            directory = pending.pop()
+            try:
+                entries = list(os.scandir(directory))
+            except OSError:
+                continue
+            for entry in entries:
+                if entry.is_dir():
+                    pending.append(Path(entry.path))
+                elif entry.name.endswith('.pal') and entry.is_file():
+                    key = Path(entry.path).relative_to(self.rom_path).as_posix()
+                    stat = entry.stat()
+                    stamp = [stat.st_mtime_ns, stat.st_size]
+                    cached = previous.get(key)
+                    if cached is not None and cached[:2] == stamp:
+                        colors = tuple(tuple(color) for color in cached[2])
+                        self.reused += 1
+                    else:
+                        colors = tuple(GBCPaletteParser.parse_palette_file(entry.path))
+                        self.parsed += 1
+                    self.palettes[key] = colors
+                    stamps[key] = stamp
+
+        if self.cache_path is not None and (self.parsed or len(previous) != len(self.palettes)):
+            rows = {key: stamps[key] + [self.palettes[key]] for key in sorted(self.palettes)}
+            with open(self.cache_path, 'w') as f:
+                json.dump({'version': self.FORMAT_VERSION, 'palettes': rows}, f, separators=(',', ':'))
+
+    def get(self, pal_path: Path) -> Optional[List[Tuple[int, int, int]]]:
+        """Parsed colors of a .pal file, or None if it does not exist"""
+        try:
+            colors = self.palettes.get(Path(pal_path).relative_to(self.rom_path).as_posix())
+        except ValueError:
+            return None
+        return list(colors) if colors is not None else None
+
+    def refresh(self, pal_paths: List[Path]):
+        """Re-read the given .pal files after they changed on disk, dropping deleted ones"""
+        for pal_path in pal_paths:
+            try:
+                key = Path(pal_path).relative_to(self.rom_path).as_posix()
+            except ValueError:
+                continue
+            if Path(pal_path).is_file():
+                self.palettes[key] = tuple(GBCPaletteParser.parse_palette_file(str(pal_path)))
+                self.parsed += 1
+            else:
+                self.palettes.pop(key, None)
+
+
+class SpriteAssetInventory:
+    """Files of the ROM's gfx directories, listed with one os.scandir sweep per directory
+
+    Each directory's files are grouped by stem, so a sheet, its .pal and its mask
+    partner (a stem ending in _mask) are found together, and the existence checks,
+    sprite lists and palette-variant lookups of a run become dictionary hits instead of
+    a stat call each. Directories are swept the first time something asks about them.
+    """
+
+    def __init__(self):
+        # directory -> stem -> suffixes present ('.png', '.pal', ...)
+        self.files: Dict[Path, Dict[str, set]] = {}
+        self.subdirs: Dict[Path, set] = {}
+        self._sorted: Dict[Tuple[Path, str], List[str]] = {}
+        self.sweeps = 0
+
+    def _listing(self, directory: Path) -> Dict[str, set]:
+        files = self.files.get(directory)
+        if files is None:
+            files, subdirs = {}, set()
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        if entry.is_dir():
+                            subdirs.add(entry.name)
+                        elif entry.is_file():
+                            stem, suffix = os.path.splitext(entry.name)
+                            files.setdefault(stem, set()).add(suffix)
+            except OSError:
+                pass
+            self.files[directory] = files
+            self.subdirs[directory] = subdirs
+            self.sweeps += 1
+        return files
+
+    def exists(self, path: Path) -> bool:
+        """Whether a file is present"""
+        stem, suffix = os.path.splitext(path.name)
+        return suffix in self._listing(path.parent).get(stem, ())
+
+    def is_dir(self, path: Path) -> bool:
+        """Whether a subdirectory is present"""
+        self._listing(path.parent)
+        return path.name in self.subdirs[path.parent]
+
+    def dirs(self, directory: Path) -> List[str]:
+        """Sorted names of the subdirectories of a directory"""
+        self._listing(directory)
+        return sorted(self.subdirs[directory])
+
+    def stems(self, directory: Path, suffix: str) -> List[str]:
+        """Sorted stems of the files in a directory with one suffix"""
+        key = (directory, suffix)
+        if key not in self._sorted:
+            self._sorted[key] = sorted(stem for stem, suffixes in self._listing(directory).items()
+                                       if suffix in suffixes)
+        return self._sorted[key]
+
+    def variants(self, directory: Path, stem: str, suffix: str) -> List[str]:
+        """Sorted stems equal to stem or starting with stem_ (kimono_girl, kimono_girl_1, ...)"""
+        stems = self.stems(directory, suffix)
+        start = bisect.bisect_left(stems, stem)
+        found = [stem] if start < len(stems) and stems[start] == stem else []
+        prefix = f"{stem}_"
+        for index in range(bisect.bisect_left(stems, prefix), len(stems)):
+            if not stems[index].startswith(prefix):
+                break
+            found.append(stems[index])
+        return sorted(found)
+
+
+class GBCRomImage:
+    """A built .gbc ROM, memory-mapped and addressed through the .sym file rgblink wrote with it
+
+    Symbols are "bank:address Label" lines; address 4000-7fff of bank n is at file offset
+    n * 0x4000 + address - 0x4000. Only the pages a run reads are loaded, so a whole
+    build is one open file however many graphics are decoded from it.
+    """
+
+    BANK_SIZE = 0x4000
+
+    # LZ commands of the pokecrystal-family compressor (tools/lz): 3-bit command, 5-bit length - 1,
+    # or %111 + 3-bit command + 10-bit length - 1 for long runs; $ff ends the stream
+    LZ_LITERAL, LZ_ITERATE, LZ_ALTERNATE, LZ_ZERO, LZ_REPEAT, LZ_FLIP, LZ_REVERSE, LZ_LONG = range(8)
+    BIT_REVERSED = bytes(int(f"{value:08b}"[::-1], 2) for value in range(256))
+
+    def __init__(self, gbc_path, sym_path=None):
+        self.gbc_path = Path(gbc_path)
+        self.sym_path = Path(sym_path) if sym_path is not None else self.gbc_path.with_suffix('.sym')
+        self.symbols: Dict[str, int] = {}
+        with open(self.sym_path, 'r') as f:
+            for line in f:
+                match = re.match(r'\s*([0-9A-Fa-f]+):([0-9A-Fa-f]+)\s+([^\s;]+)', line)
+                if match is None:
+                    continue
+                bank, address = int(match.group(1), 16), int(match.group(2), 16)
+                if address < 0x8000:  # RAM symbols are not in the image
+                    self.symbols[match.group(3)] = self.to_offset(bank, address)
+        # Where each top-level label's data ends: the next top-level label (locals like .frame1 are inside it)
+        self._starts = sorted({offset for label, offset in self.symbols.items() if '.' not in label})
+        self._labels: Dict[int, str] = {}
+        for label, offset in sorted(self.symbols.items(), reverse=True):
+            if '.' not in label:
+                self._labels[offset] = label
+        self._data: Optional[mmap.mmap] = None
+
+    def __getstate__(self):
+        # Pool workers map the file again themselves
+        state = self.__dict__.copy()
+        state['_data'] = None
+        return state
+
+    @classmethod
+    def to_offset(cls, bank: int, address: int) -> int:
+        return address if address < cls.BANK_SIZE else bank * cls.BANK_SIZE + address - cls.BANK_SIZE
+
+    @property
+    def data(self) -> mmap.mmap:
+        if self._data is None:
+            with open(self.gbc_path, 'rb') as f:
+                self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._data
+
+    def label_at(self, offset: int) -> Optional[str]:
+        return self._labels.get(offset)
+
+    def end(self, label: str) -> int:
+        """Offset where a label's data stops: the next top-level label, or the end of its bank"""
+        start = self.symbols[label]
+        bank_end = (start // self.BANK_SIZE + 1) * self.BANK_SIZE
+        index = bisect.bisect_right(self._starts, start)
+        return min(self._starts[index] if index < len(self._starts) else bank_end, bank_end, len(self.data))
+
+    def span(self, label: str) -> bytes:
+        return self.data[self.symbols[label]:self.end(label)]
+
+    def far_pointers(self, label: str) -> List[int]:
+        """Offsets of a table of dba entries (bank, then little-endian address)"""
+        table = self.span(label)
+        return [self.to_offset(table[i], table[i + 1] | table[i + 2] << 8) for i in range(0, len(table) - 2, 3)]
+
+    def near_pointers(self, label: str) -> List[int]:
+        """Offsets of a table of dw entries into the table's own bank, which ends where its first target starts"""
+        data = self.data
+        start = self.symbols[label]
+        bank = start // self.BANK_SIZE
+        pointers = []
+        cursor = start
+        while cursor + 1 < len(data) and (not pointers or cursor < min(pointers)):
+            pointers.append(self.to_offset(bank, data[cursor] | data[cursor + 1] << 8))
+            cursor += 2
+        return pointers
+
+    def lz_decompress(self, offset: int) -> bytes:
+        """Decompress the LZ stream starting at offset"""
+        data = self.data
+        out = bytearray()
+        cursor = offset
+        while True:
+            command = data[cursor]
+            cursor += 1
+            if command == 0xff:
+                return bytes(out)
+            if command >> 5 == self.LZ_LONG:
+                kind = command >> 2 & 7
+                length = ((command & 3) << 8 | data[cursor]) + 1
+                cursor += 1
+            else:
+                kind = command >> 5
+                length = (command & 0x1f) + 1
+
+            if kind == self.LZ_LITERAL:
+                out += data[cursor:cursor + length]
+                cursor += length
+            elif kind == self.LZ_ITERATE:
+                out += bytes([data[cursor]]) * length
+                cursor += 1
+            elif kind == self.LZ_ALTERNATE:
+                pair = data[cursor:cursor + 2]
+                out += (pair * (length // 2 + 1))[:length]
+                cursor += 2
+            elif kind == self.LZ_ZERO:
+                out += bytes(length)
+            elif kind in (self.LZ_REPEAT, self.LZ_FLIP, self.LZ_REVERSE):
+                # Source is a negative distance (bit 7 set) or a big-endian offset from the stream start
+                if data[cursor] & 0x80:
+                    source = len(out) - (data[cursor] & 0x7f) - 1
+                    cursor += 1
+                else:
+                    source = data[cursor] << 8 | data[cursor + 1]
+                    cursor += 2
+                for i in range(length):
+                    if kind == self.LZ_REPEAT:
+                        out.append(out[source + i])
+                    elif kind == self.LZ_FLIP:
+                        out.append(self.BIT_REVERSED[out[source + i]])
+                    else:
+                        out.append(out[source - i])
+            else:
+                raise ValueError(f"bad LZ command {command:#04x} at {cursor - 1:#x}")
+
+
+class RomImageSprites:
+    """The gfx/pokemon and gfx/trainers trees of a built ROM, decoded straight from its image
+
+    Pics are found by label (<Name>Frontpic, <Name>Backpic and the pics TrainerPicPointers
+    lists), named as the source tree names them (VulpixAlolanFrontpic ->
+    pokemon/vulpix_alolan/front.png), LZ-decompressed and decoded from column-major 2bpp
+    tiles into the four gray levels of the source PNGs, so every colorizer and output stage
+    reads them unchanged. An animated front pic is rebuilt into the vertical sheet of frames
+    front.png holds from its <Name>Frames and <Name>Bitmasks tables. Palettes are read from
+    PokemonPalettes and TrainerPalettes in pic pointer table order. Everything else (items,
+    minis, icons, trainer palette variants) still comes from the ROM tree on disk.
+    """
+
+    # 2bpp color index -> gray level of the source PNGs (lightest first)
+    SHADE_LEVELS = (255, 170, 85, 0)
+    _PLANES = [tuple(value >> (7 - bit) & 1 for bit in range(8)) for value in range(256)]
+
+    def __init__(self, image: GBCRomImage, rom_path: Path):
+        self.image = image
+        self.rom_path = rom_path
+        # Path relative to the ROM root -> pic label
+        self.sheets: Dict[str, str] = {}
+        self.palettes: Dict[str, Tuple[Tuple[int, int, int], ...]] = {}
+
+        symbols = image.symbols
+        for label in symbols:
+            match = re.fullmatch(r'([A-Z]\w*?)(Front|Back)pic', label)
+            if match is not None:
+                self.sheets[f"gfx/pokemon/{self.source_name(match.group(1))}/{match.group(2).lower()}.png"] = label
+
+        trainers = self.pointed_names('TrainerPicPointers', 'Pic', step=1)
+        for name, label in trainers:
+            if name is not None:
+                self.sheets[f"gfx/trainers/{name}.png"] = label
+        pokemon = self.pointed_names('PokemonPicPointers', 'Frontpic', step=2)
+
+        # Two colors per palette (white and black are fixed); normal then shiny for Pokemon.
+        # Tables run in pic pointer order, with a leading entry for species/class 0 when they are longer
+        for table, names, size in [('PokemonPalettes', pokemon, 8), ('TrainerPalettes', trainers, 4)]:
+            if table not in symbols or not names:
+                continue
+            data = image.span(table)
+            entries = len(data) // size
+            skip = 1 if entries > len(names) else 0
+            if entries < len(names):
+                print(f"Warning: {table} has {entries} entries for {len(names)} pics; not using ROM palettes")
+                continue
+            for index, (name, _) in enumerate(names):
+                if name is None:
+                    continue
+                entry = data[(index + skip) * size:(index + skip + 1) * size]
+                if size == 8:
+                    self.palettes[f"gfx/pokemon/{name}/normal.pal"] = tuple(GBCPaletteParser.parse_rgb555(entry[:4]))
+                    self.palettes[f"gfx/pokemon/{name}/shiny.pal"] = tuple(GBCPaletteParser.parse_rgb555(entry[4:]))
+                else:
+                    self.palettes[f"gfx/trainers/{name}.pal"] = tuple(GBCPaletteParser.parse_rgb555(entry))
+
+    def pointed_names(self, table: str, suffix: str, step: int) -> List[Tuple[Optional[str], Optional[str]]]:
+        """(source name, label) of every step-th pic a dba pointer table lists, in table order
+
+        Entries whose target has no label ending in suffix get a None name; unlabeled
+        entries after the last labeled one are padding and are dropped.
+        """
+        if table not in self.image.symbols:
+            return []
+        entries = []
+        for offset in self.image.far_pointers(table)[::step]:
+            label = self.image.label_at(offset)
+            if label is not None and label.endswith(suffix):
+                entries.append((self.source_name(label[:-len(suffix)]), label))
+            else:
+                entries.append((None, label))
+        while entries and entries[-1][1] is None:
+            entries.pop()
+        return entries
+
+    @staticmethod
+    def source_name(label: str) -> str:
+        """File name the source tree uses for a label prefix: KimonoGirl -> kimono_girl"""
+        return re.sub(r'(?<=[a-z0-9])(?=[A-Z])', '_', label).lower()
+
+    def populate(self, inventory: SpriteAssetInventory):
+        """List the image's files in an inventory in place of the directories they would be in
+
+        Sheets come from the image only, so a half-present tree on disk is not mixed in.
+        The disk's .pal files are kept: palettes the image has take precedence in the
+        palette database, and the rest (numbered trainer variants) are still found.
+        """
+        listed = set()
+        for rel_path in list(self.sheets) + list(self.palettes):
+            path = self.rom_path / rel_path
+            for directory in [path.parent, path.parent.parent]:
+                if directory not in listed:
+                    on_disk = inventory._listing(directory)
+                    inventory.files[directory] = {stem: {'.pal'} for stem, suffixes in on_disk.items()
+                                                  if '.pal' in suffixes}
+                    inventory.subdirs[directory] = set()
+                    listed.add(directory)
+            stem, suffix = os.path.splitext(path.name)
+            inventory.files[path.parent].setdefault(stem, set()).add(suffix)
+            if path.parent.parent == self.rom_path / "gfx" / "pokemon":
+                inventory.subdirs[path.parent.parent].add(path.parent.name)
+
+    def _relative(self, path) -> Optional[str]:
+        try:
+            return Path(path).relative_to(self.rom_path).as_posix()
+        except ValueError:
+            return None
+
+    def source_bytes(self, path) -> Optional[bytes]:
+        """The compressed data behind a sheet, for cache keys and scheduling; None if it is not in the image"""
+        label = self.sheets.get(self._relative(path))
+        if label is None:
+            return None
+        data = self.image.span(label)
+        prefix = label[:-len('Frontpic')] if label.endswith('Frontpic') else None
+        for table in ([f"{prefix}Frames", f"{prefix}Bitmasks"] if prefix else []):
+            if table in self.image.symbols:
+                data += self.image.span(table)
+        return data
+
+    def open(self, path) -> Optional[Image.Image]:
+        """Decode a sheet to an 'L' image of the source PNG's gray levels; None if it is not in the image"""
+        label = self.sheets.get(self._relative(path))
+        if label is None:
+            return None
+        tiles = self.image.lz_decompress(self.image.symbols[label])
+        count = len(tiles) // 16
+        if label.endswith('Frontpic'):
+            frames = self.animation_tile_maps(label[:-len('Frontpic')], count)
+            if frames is not None:
+                return self.render_tiles(tiles, frames)
+        # Pics are square
+        size = int(count ** 0.5)
+        return self.render_tiles(tiles, [list(range(size * size))])
+
+    def animation_tile_maps(self, prefix: str, count: int) -> Optional[List[List[int]]]:
+        """Tile ids of every frame of an animated pic, column-major; None if it has no animation tables
+
+        The first size*size tiles are the first frame. Each later frame is a bitmask index
+        followed by one tile id per set bit (bit n of byte n // 8 is tile position n) for the
+        positions that differ from the first frame. The pic size is the one for which every
+        frame ends exactly where the next begins.
+        """
+        symbols = self.image.symbols
+        frames_label, bitmasks_label = f"{prefix}Frames", f"{prefix}Bitmasks"
+        if frames_label not in symbols or bitmasks_label not in symbols:
+            return None
+        data = self.image.data
+        pointers = self.image.near_pointers(frames_label)
+        bitmasks_start, bitmasks_end = symbols[bitmasks_label], self.image.end(bitmasks_label)
+        frames_end = self.image.end(frames_label)
+
+        for size in range(7, 0, -1):
+            positions = size * size
+            if positions > count:
+                continue
+            mask_bytes = (positions + 7) // 8
+            frames = [list(range(positions))]
+            for index, pointer in enumerate(pointers):
+                mask_at = bitmasks_start + data[pointer] * mask_bytes
+                if mask_at + mask_bytes > bitmasks_end:
+                    break
+                tile_ids = list(frames[0])
+                cursor = pointer + 1
+                for position in range(positions):
+                    if data[mask_at + position // 8] >> (position % 8) & 1:
+                        tile_ids[position] = data[cursor]
+                        cursor += 1
+                frame_end = pointers[index + 1] if index + 1 < len(pointers) else frames_end
+                if max(tile_ids) >= count or (cursor != frame_end if index + 1 < len(pointers) else cursor > frame_end):
+                    break
+                frames.append(tile_ids)
+            else:
+                return frames
+        return None
+
+    @classmethod
+    def render_tiles(cls, tiles: bytes, frames: List[List[int]]) -> Image.Image:
+        """Stack frames of column-major 2bpp tile ids into one vertical sheet"""
+        size = int(len(frames[0]) ** 0.5)
+        width = size * 8
+        pixels = bytearray(width * width * len(frames))
+        levels = cls.SHADE_LEVELS
+        planes = cls._PLANES
+        for frame, tile_ids in enumerate(frames):
+            for position, tile in enumerate(tile_ids):
+                left = position // size * 8
+                top = frame * width + position % size * 8
+                for row in range(8):
+                    low = planes[tiles[tile * 16 + row * 2]]
+                    high = planes[tiles[tile * 16 + row * 2 + 1]]
+                    start = (top + row) * width + left
+                    pixels[start:start + 8] = bytes(levels[l | h << 1] for l, h in zip(low, high))
+        return Image.frombytes('L', (width, width * len(frames)), bytes(pixels))
+
+
+class GBCPaletteEngine:
+    """Lookup-table colorizer shared by every sprite category
+
+    Each colorizer's grayscale threshold rules are folded into a 256-entry
+    lookup table that maps a gray value to a shade slot. The resulting shade
+    map is colored through an RGBA palette, so a whole frame (or sheet) is
+    converted in C with color and alpha produced in the same pass.
+    """
+
+    # Descending grayscale thresholds: a value >= thresholds[i] lands in slot i,
+    # anything below the last threshold lands in the final slot
+    SPRITE_THRESHOLDS = (240, 170, 85)
+    MINI_THRESHOLDS = (192, 128, 64)
+    ICON_THRESHOLDS = (250, 192, 128, 64)
+    MASK_THRESHOLDS = (128,)
+
+    TRANSPARENT = (0, 0, 0, 0)
+
+    _lut_cache: Dict[Tuple[int, ...], List[int]] = {}
+
+    @classmethod
+    def build_shade_lut(cls, thresholds: Tuple[int, ...]) -> List[int]:
+        """Build (and memoize) the gray value -> shade slot lookup table"""
+        lut = cls._lut_cache.get(thresholds)
+        if lut is None:
+            lut = []
+            for gray_value in range(256):
+                slot = len(thresholds)
+                for i, threshold in enumerate(thresholds):
+                    if gray_value >= threshold:
+                        slot = i
+                        break
+                lut.append(slot)
+            cls._lut_cache[thresholds] = lut
+        return lut
+
+    @classmethod
+    def to_shade_map(cls, image: Image.Image, thresholds: Tuple[int, ...]) -> Image.Image:
+        """Reduce an image to an 'L' map of shade slots using the threshold rules"""
+        gray = image if image.mode == 'L' else image.convert('L')
+        return gray.point(cls.build_shade_lut(thresholds))
+
+    @classmethod
+    def render(cls, shade_map: Image.Image, slot_colors: List[Tuple[int, int, int, int]]) -> Image.Image:
+        """Color a shade map with one RGBA color per slot"""
+        indexed = shade_map.convert('P')
+        palette = bytearray()
+        for color in slot_colors:
+            palette.extend(color)
+        indexed.putpalette(bytes(palette), 'RGBA')
+        return indexed.convert('RGBA')
+
+    @classmethod
+    def colorize(cls, image: Image.Image, thresholds: Tuple[int, ...],
+                 slot_colors: List[Tuple[int, int, int, int]]) -> Image.Image:
+        """Apply threshold rules and slot colors to a frame or whole sheet"""
+        return cls.render(cls.to_shade_map(image, thresholds), slot_colors)
+
+    @classmethod
+    def sprite_slots(cls, palette: List[Tuple[int, int, int]]) -> List[Tuple[int, int, int, int]]:
+        """Slot colors for battle/trainer/item sprites: white is transparent, then 3 palette colors"""
+        padded = list(palette) + [(255, 255, 255)] * (4 - len(palette))
+        return [cls.TRANSPARENT] + [(r, g, b, 255) for r, g, b in padded[:3]]
+
+    @classmethod
+    def mini_slots(cls, palette: List[Tuple[int, int, int]]) -> List[Tuple[int, int, int, int]]:
+        """Slot colors for mini sprites: all 4 palette colors, fully opaque"""
+        padded = list(palette) + [(255, 255, 255)] * (4 - len(palette))
+        return [(r, g, b, 255) for r, g, b in padded[:4]]
+
+    @classmethod
+    def icon_slots(cls, colors: List[Tuple[int, int, int]]) -> List[Tuple[int, int, int, int]]:
+        """Slot colors for icons: near-white is transparent, then light/mid/main/dark"""
+        return [cls.TRANSPARENT] + [(r, g, b, 255) for r, g, b in colors[:4]]
+
+    @classmethod
+    def gray_passthrough_slots(cls, cutoff: int = 250) -> List[Tuple[int, int, int, int]]:
+        """Identity grayscale palette where values >= cutoff become transparent"""
+        return [cls.TRANSPARENT if v >= cutoff else (v, v, v, 255) for v in range(256)]
+
+    @classmethod
+    def apply_mask(cls, sprite: Image.Image, mask: Image.Image) -> Image.Image:
+        """Keep sprite pixels where the mask is dark, clear them where it is light"""
+        # Slot 0 (mask >= 128) is transparent, slot 1 keeps the sprite pixel
+        alpha = cls.to_shade_map(mask, cls.MASK_THRESHOLDS).point([0, 255] + [0] * 254)
+        if sprite.mode != 'RGBA':
+            sprite = sprite.convert('RGBA')
+        return Image.composite(sprite, Image.new('RGBA', sprite.size, cls.TRANSPARENT), alpha)
+
+    @classmethod
+    def render_masked(cls, shade_map: Image.Image, mask: Image.Image,
+                      slot_colors: List[Tuple[int, int, int, int]]) -> Image.Image:
+        """Color a shade map and clear the pixels where the mask is light, in one render"""
+        # Light mask pixels are routed to an extra, transparent slot past the palette
+        keep = cls.to_shade_map(mask, cls.MASK_THRESHOLDS).point([0, 255] + [0] * 254)
+        shade_map = Image.composite(shade_map, Image.new('L', shade_map.size, len(slot_colors)), keep)
+        return cls.render(shade_map, list(slot_colors) + [cls.TRANSPARENT])
+
+    @classmethod
+    def to_indexed(cls, image: Image.Image) -> Optional[Image.Image]:
+        """Exact palette-mode copy of an RGBA image with at most 256 colors, or None
+
+        Transparent colors come first so the tRNS chunk stays short; every pixel
+        decodes back to exactly the same RGBA value.
+        """
+        if image.mode != 'RGBA':
+            image = image.convert('RGBA')
+        colors = image.getcolors(256)
+        if colors is None:
+            return None
+
+        palette = sorted({color for _, color in colors}, key=lambda color: (color[3] == 255, color))
+        index = Image.new('L', image.size, 0)
+        for i, color in enumerate(palette[1:], 1):
+            r, g, b, a = ImageChops.difference(image, Image.new('RGBA', image.size, color)).split()
+            difference = ImageChops.lighter(ImageChops.lighter(r, g), ImageChops.lighter(b, a))
+            index.paste(i, mask=difference.point([255] + [0] * 255))
+
+        indexed = index.convert('P')
+        indexed.putpalette(b''.join(bytes(color) for color in palette), 'RGBA')
+        return indexed
+
+    @classmethod
+    def to_gif_frames(cls, frames: List[Image.Image]) -> Optional[Tuple[List[Image.Image], bytes]]:
+        """Palette-mode copies of animation frames sharing one exact GIF color table, or None
+
+        Entry 0 is the transparent color, keyed to a gray no opaque pixel uses so every
+        entry is distinct; the rest are the opaque colors the frames contain, which for
+        rendered sprites are just their palette slots. Frames with partial alpha or more
+        than 255 opaque colors cannot be stored exactly and return None.
+        """
+        colors = set()
+        for frame in frames:
+            found = frame.getcolors(256)
+            if found is None:
+                return None
+            colors.update(color for _, color in found)
+        if any(0 < color[3] < 255 for color in colors):
+            return None
+
+        opaque = sorted({color[:3] for color in colors if color[3] == 255})
+        key = next(v for v in range(256) if (v, v, v) not in opaque)
+        table = b''.join(bytes(color) for color in [(key, key, key)] + opaque)
+        if len(table) > 768:
+            return None
+
+        palette_image = Image.new('P', (1, 1))
+        palette_image.putpalette(table)
+        indexed_frames = []
+        for frame in frames:
+            if frame.mode != 'RGBA':
+                frame = frame.convert('RGBA')
+            # Every opaque color is in the table, so nearest-color lookup is an exact match
+            indexed = frame.convert('RGB').quantize(palette=palette_image, dither=Image.Dither.NONE)
+            indexed.paste(0, mask=frame.getchannel('A').point([255] + [0] * 255))
+            indexed.putpalette(table)
+            indexed_frames.append(indexed)
+        return indexed_frames, table
+
+
 class GBCAnimationParser:
     """Parses Game Boy Color animation files (.asm format)"""
 
@@ -203,17 +877,622 @@ class GBCAnimationParser:
 
         return frames
 
+def next_power_of_two(value: int) -> int:
+    return 1 << max(0, value - 1).bit_length()
+
+
+def fnv1a_32(text: str) -> int:
+    """32-bit FNV-1a hash of a name's UTF-8 bytes; the web app computes the same to find a shard"""
+    value = 0x811c9dc5
+    for byte in text.encode('utf-8'):
+        value = ((value ^ byte) * 0x01000193) & 0xffffffff
+    return value
+
+
+class ShardedManifestWriter:
+    """Writes the unified manifest as compact per-category files plus fixed-size hash buckets
+
+    Layout under <output>/sprite_manifests/:
+      index.json                  bucket count and entry count per category
+      <category>.json             every entry of one category
+      <category>/<bucket>.json    entries whose fnv1a_32(name) % buckets == bucket
+    Files whose content is unchanged are left untouched.
+    """
+
+    DIR_NAME = 'sprite_manifests'
+    FORMAT_VERSION = 1
+    ENTRIES_PER_BUCKET = 16
+
+    def __init__(self, output_path: Path, url_prefix: str = ''):
+        self.root = output_path / self.DIR_NAME
+        self.url_prefix = url_prefix
+        self.written = 0
+        self.unchanged = 0
+
+    @staticmethod
+    def dumps(data) -> str:
+        return json.dumps(data, separators=(',', ':'), sort_keys=True)
+
+    def _write(self, path: Path, data):
+        text = self.dumps(data)
+        try:
+            if path.read_text() == text:
+                self.unchanged += 1
+                return
+        except OSError:
+            pass
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text)
+        self.written += 1
+
+    def write(self, manifest: Dict[str, Dict]) -> Dict:
+        index = {'version': self.FORMAT_VERSION, 'hash': 'fnv1a-32', 'categories': {}}
+        for category, entries in manifest.items():
+            buckets = next_power_of_two(-(-len(entries) // self.ENTRIES_PER_BUCKET)) if entries else 1
+            shards: List[Dict] = [{} for _ in range(buckets)]
+            for name, entry in entries.items():
+                shards[fnv1a_32(name) % buckets][name] = entry
+
+            self._write(self.root / f"{category}.json", entries)
+            shard_dir = self.root / category
+            for bucket, shard in enumerate(shards):
+                self._write(shard_dir / f"{bucket}.json", shard)
+            # Drop buckets left over from a run with more of them
+            for stale in shard_dir.glob("*.json"):
+                if not stale.stem.isdigit() or int(stale.stem) >= buckets:
+                    stale.unlink()
+
+            index['categories'][category] = {
+                'entries': len(entries),
+                'buckets': buckets,
+                'file': f"{self.url_prefix}{self.DIR_NAME}/{category}.json",
+                'shards': f"{self.url_prefix}{self.DIR_NAME}/{category}/{{bucket}}.json",
+            }
+
+        self._write(self.root / 'index.json', index)
+        return index
+
+
+class SpriteAtlasPacker:
+    """Shelf packer placing small sprites onto one or more power-of-two sheets"""
+
+    def __init__(self, max_size: int = 1024):
+        self.max_size = max_size
+
+    def pack(self, sizes: Dict[str, Tuple[int, int]]) -> Tuple[List[Tuple[int, int]], Dict[str, Tuple[int, int, int]]]:
+        """Return the sheet sizes and a (sheet, x, y) placement for every named sprite"""
+        if not sizes:
+            return [], {}
+
+        # Tallest first keeps shelves tight; names break ties so packing is deterministic
+        order = sorted(sizes, key=lambda name: (-sizes[name][1], -sizes[name][0], name))
+        area = sum(w * h for w, h in sizes.values())
+        widest = max(w for w, _ in sizes.values())
+        sheet_width = min(self.max_size, max(next_power_of_two(int(area ** 0.5)), next_power_of_two(widest)))
+
+        sheets: List[Tuple[int, int]] = []
+        placements: Dict[str, Tuple[int, int, int]] = {}
+        x = y = shelf_height = used_height = 0
+        for name in order:
+            width, height = sizes[name]
+            if x + width > sheet_width:
+                y += shelf_height
+                x = shelf_height = 0
+            if y + height > self.max_size and used_height:
+                sheets.append((sheet_width, next_power_of_two(used_height)))
+                x = y = shelf_height = used_height = 0
+            placements[name] = (len(sheets), x, y)
+            x += width
+            shelf_height = max(shelf_height, height)
+            used_height = max(used_height, y + height)
+        sheets.append((sheet_width, next_power_of_two(used_height)))
+        return sheets, placements
+
+
+class SpriteCategory(NamedTuple):
+    """How the batch driver lists, processes and reports one sprite category"""
+    list_method: str
+    process_method: str
+    output_attr: str
+    banner: str          # printed before the category when several run together
+    found_label: str     # "Found 12 <found_label> to process..."
+    progress_label: str  # "[1/12] Processing <progress_label><name>"
+    done_label: str      # "Processed 12/12 <done_label>"
+
+
+SPRITE_CATEGORIES: Dict[str, SpriteCategory] = {
+    'pokemon': SpriteCategory('get_pokemon_list', 'process_pokemon', 'sprites_dir',
+                              "Processing all Pokemon sprites...", "Pokemon", "", "Pokemon sprites"),
+    'trainers': SpriteCategory('get_trainer_list', 'process_trainer', 'trainer_sprites_dir',
+                               "Processing all trainer sprites...", "trainers", "trainer ", "trainer sprites"),
+    'items': SpriteCategory('get_item_list', 'process_item', 'item_sprites_dir',
+                            "Processing all item sprites...", "items", "item ", "item sprites"),
+    'minis': SpriteCategory('get_mini_list', 'process_mini', 'minis_sprites_dir',
+                            "Processing all mini sprites...", "mini sprites", "mini ", "mini sprites"),
+    'icons': SpriteCategory('get_icon_list', 'process_icon', 'icons_sprites_dir',
+                            "Processing all icon sprites...", "icons", "icon ", "icons"),
+}
+
+# Animation formats that can be written alongside every animated GIF, with their
+# Pillow save options. Both keep per-frame timing in whole milliseconds.
+ANIMATION_SAVE_OPTIONS = {
+    'webp': {'format': 'WEBP', 'lossless': True, 'quality': 100},
+    'apng': {'format': 'PNG', 'disposal': 0, 'blend': 0},
+}
+ANIMATION_FORMATS = tuple(ANIMATION_SAVE_OPTIONS)
+
+# Processor instance owned by each pool worker, set up by _init_worker
+_worker_processor: Optional['GBCSpriteProcessor'] = None
+
+
+def _init_worker(processor: 'GBCSpriteProcessor'):
+    global _worker_processor
+    _worker_processor = processor
+    if processor.profile:
+        # Forked workers inherit the parent's hooks; others profile for as long as they live
+        SpriteProfiler.install()
+
+
+def _run_work_unit(category: str, entries: List[Tuple[int, int, str]]) -> List[Tuple[str, 'SpriteResult', str]]:
+    """Process one work unit in a pool worker, capturing each sprite's console output"""
+    results = []
+    for index, total, name in entries:
+        log = io.StringIO()
+        with contextlib.redirect_stdout(log):
+            result = _worker_processor.process_entry(category, index, total, name)
+        results.append((name, result, log.getvalue()))
+    return results
+
+
+class StageTimer:
+    """Accumulates wall-clock time per named processing stage of one sprite"""
+    __slots__ = ('stages',)
+
+    def __init__(self):
+        self.stages: Dict[str, float] = {}
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+
+    def summary(self) -> str:
+        total = sum(self.stages.values())
+        parts = [f"{name} {seconds * 1000:.1f}ms" for name, seconds in self.stages.items()]
+        return ", ".join(parts + [f"total {total * 1000:.1f}ms"])
+
+
+class SpriteProfiler:
+    """Wall/CPU time, stage times, file-system stat calls and peak memory of one unit of work
+
+    Profilers nest (a phase around its sprites); each new one resets tracemalloc's peak,
+    so the peak so far is first folded into every profiler still running.
+    """
+    __slots__ = ('timer', 'wall', 'cpu', 'stats', 'peak')
+
+    # os.stat calls made in this process; Path.exists/is_file/is_dir all go through it
+    stat_calls = 0
+    _original_stat = None
+    _running: List['SpriteProfiler'] = []
+
+    @classmethod
+    def install(cls):
+        """Start counting stat calls and tracing allocations in this process"""
+        if cls._original_stat is not None:
+            return
+        original_stat = cls._original_stat = os.stat
+
+        def counting_stat(*args, **kwargs):
+            cls.stat_calls += 1
+            return original_stat(*args, **kwargs)
+
+        os.stat = counting_stat
+        tracemalloc.start()
+
+    @classmethod
+    def uninstall(cls):
+        """Put os.stat back and stop tracing allocations"""
+        if cls._original_stat is None:
+            return
+        os.stat = cls._original_stat
+        cls._original_stat = None
+        tracemalloc.stop()
+
+    @classmethod
+    @contextlib.contextmanager
+    def installed(cls):
+        """Count stat calls and trace allocations for the duration of a profiled run"""
+        cls.install()
+        try:
+            yield
+        finally:
+            cls.uninstall()
+
+    @classmethod
+    def _fold_peak(cls):
+        peak = tracemalloc.get_traced_memory()[1]
+        for profiler in cls._running:
+            profiler.peak = max(profiler.peak, peak)
+
+    def __init__(self, timer: Optional[StageTimer] = None):
+        self.timer = timer or StageTimer()
+        self.wall = time.perf_counter()
+        self.cpu = time.process_time()
+        self.stats = SpriteProfiler.stat_calls
+        SpriteProfiler._fold_peak()
+        tracemalloc.reset_peak()
+        self.peak = 0
+        SpriteProfiler._running.append(self)
+
+    def finish(self, bytes_written: int = 0) -> Dict:
+        SpriteProfiler._fold_peak()
+        if self in SpriteProfiler._running:
+            SpriteProfiler._running.remove(self)
+        return {
+            'wall': time.perf_counter() - self.wall,
+            'cpu': time.process_time() - self.cpu,
+            'stages': dict(self.timer.stages),
+            'bytes': bytes_written,
+            'stat_calls': SpriteProfiler.stat_calls - self.stats,
+            'peak_memory': self.peak,
+        }
+
+
+class SpriteNameIndex:
+    """Every name the processor derives from a ROM folder or file, worked out once per run
+
+    Built from one listing of gfx/pokemon, gfx/minis and gfx/icons plus the parsed
+    palettes and icon colour table. For each Pokemon folder it holds the output name,
+    base species, the .pal each variant is colored with and the overworld_icon_pals.asm
+    key its icon colours come from; for each mini, the Pokemon whose palette it borrows;
+    for each icon, its colour key. Lookups are then dictionary hits instead of suffix
+    scans and file probes, and the table is exported as sprite_name_index.json.
+    """
+
+    FILE_NAME = 'sprite_name_index.json'
+    FORMAT_VERSION = 1
+    VARIANTS = ('normal', 'shiny')
+
+    def __init__(self, processor: 'GBCSpriteProcessor'):
+        self.rom_path = processor.rom_path
+        self.pokemon: Dict[str, Dict] = {}
+        for name in processor.get_pokemon_list():
+            output_name = processor.derive_output_name(name)
+            self.pokemon[name] = {
+                'output': output_name,
+                'base': output_name.split('_')[0],
+                'palettes': {variant: processor.find_pokemon_palette(name, variant) for variant in self.VARIANTS},
+                'icon_colors': processor.find_icon_color_key(name),
+            }
+
+        self.minis: Dict[str, Dict] = {}
+        for name in processor.get_mini_list():
+            pokemon_name = processor.derive_mini_pokemon_name(name)
+            self.minis[name] = {
+                'output': reduce_name(name),
+                'pokemon': pokemon_name,
+                'palette': processor.resolve_mini_palette(pokemon_name) if pokemon_name is not None else None,
+            }
+
+        self.icons: Dict[str, Dict] = {}
+        for name in processor.get_icon_list():
+            self.icons[name] = {'output': reduce_name(name), 'icon_colors': processor.find_icon_color_key(name)}
+
+        self._palette_db = processor.palette_db
+
+    def _palette_key(self, path: Optional[Path]) -> Optional[str]:
+        """ROM-relative path of a palette that exists, for the exported table"""
+        if path is None or self._palette_db.get(path) is None:
+            return None
+        return path.relative_to(self.rom_path).as_posix()
+
+    def to_json(self) -> Dict:
+        pokemon = {}
+        for name, entry in self.pokemon.items():
+            pokemon[name] = dict(entry, palettes={variant: self._palette_key(path)
+                                                  for variant, path in entry['palettes'].items()})
+        minis = {name: dict(entry, palette=self._palette_key(entry['palette'])) for name, entry in self.minis.items()}
+        return {'version': self.FORMAT_VERSION, 'pokemon': pokemon, 'minis': minis, 'icons': self.icons}
+
+    def write(self, path: Path) -> bool:
+        """Write the table as JSON, leaving the file alone when it is unchanged"""
+        text = json.dumps(self.to_json(), indent=2, sort_keys=True)
+        try:
+            if path.read_text() == text:
+                return False
+        except OSError:
+            pass
+        path.write_text(text)
+        return True
+
+
+class SpriteArtifact:
+    """One image file written by the processor, with what the manifest needs to know about it"""
+    __slots__ = ('path', 'width', 'height', 'frames', 'bytes', 'digest', 'linked')
+
+    def __init__(self, path: str, width: int, height: int, frames: int, bytes: int, digest: str,
+                 linked: bool = False):
+        self.path = path        # relative to the output directory, e.g. "sprites/items/potion.png"
+        self.width = width
+        self.height = height
+        self.frames = frames
+        self.bytes = bytes
+        self.digest = digest    # sha256 of the encoded file
+        self.linked = linked    # hardlinked to an identical output of this run instead of written
+
+    def to_row(self) -> List:
+        return [self.path, self.width, self.height, self.frames, self.bytes, self.digest]
+
+    @classmethod
+    def from_row(cls, row: List) -> 'SpriteArtifact':
+        return cls(*row)
+
+
+class SpriteResult:
+    """Outcome of processing one source sprite; truthy when it succeeded"""
+    __slots__ = ('ok', 'artifacts', 'profile')
+
+    def __init__(self, ok: bool, artifacts: List[SpriteArtifact], profile: Optional[Dict] = None):
+        self.ok = ok
+        self.artifacts = artifacts
+        self.profile = profile  # SpriteProfiler.finish() output when profiling
+
+    def __bool__(self) -> bool:
+        return self.ok
+
+
+class SpriteLog:
+    """Console output of one sprite in a pipelined run, including messages of writes still pending"""
+
+    def __init__(self):
+        self.parts: List = []  # printed text and writer futures, in order
+        self._text = io.StringIO()
+
+    def write(self, text: str) -> int:
+        return self._text.write(text)
+
+    def flush(self):
+        pass
+
+    def defer(self, future: Future):
+        """Hold a place for the (artifacts, message) a writer thread will produce"""
+        self.parts.append(self._text.getvalue())
+        self._text = io.StringIO()
+        self.parts.append(future)
+
+    def done(self) -> bool:
+        return all(part.done() for part in self.parts if isinstance(part, Future))
+
+    def finish(self) -> Tuple[List[SpriteArtifact], str]:
+        """Artifacts written for this sprite and its complete log (waits for pending writes)"""
+        artifacts, text = [], []
+        for part in self.parts + [self._text.getvalue()]:
+            if isinstance(part, Future):
+                written, message = part.result()
+                artifacts.extend(written)
+                text.append(message)
+            else:
+                text.append(part)
+        return artifacts, ''.join(text)
+
+
+class SpritePipeline:
+    """Reader and writer stages running on threads around the serial sprite loop
+
+    A reader thread decodes the source sheets of upcoming sprites while the loop
+    colours the current one, and a pool of writer threads encodes and writes its
+    PNGs and GIFs. Bounded queues between the stages cap how far the reader and
+    the writers can fall behind, so memory stays flat. Pillow releases the GIL
+    while decoding, quantizing and compressing, so even one process overlaps
+    file I/O and encoding with colouring. Writes to the same path run in the order
+    they were submitted.
+    """
+
+    STAGES = ('read', 'colour', 'write')
+
+    def __init__(self, processor: 'GBCSpriteProcessor', order: List[Tuple[str, str, bool]],
+                 depth: int = 8, writers: int = 2):
+        self.processor = processor
+        self.depth = depth
+        self.writers = writers
+        self.stats = {stage: {'items': 0, 'bytes': 0, 'busy': 0.0, 'waited': 0.0} for stage in self.STAGES}
+        self.started = time.perf_counter()
+        self.log: Optional[SpriteLog] = None
+        self.sheets: Dict[Path, Image.Image] = {}
+
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._prefetched: queue.Queue = queue.Queue(maxsize=depth)
+        self._write_slots = threading.Semaphore(depth * writers)
+        self._last_write: Dict[str, Future] = {}
+        self._writer_pool = ThreadPoolExecutor(max_workers=writers, thread_name_prefix='sprite-writer')
+        self._reader = threading.Thread(target=self._read, args=(order,), name='sprite-reader', daemon=True)
+        self._reader.start()
+
+    def _read(self, order: List[Tuple[str, str, bool]]):
+        """Decode the sheets of every (category, name, needed) in loop order into the prefetch queue"""
+        try:
+            for category, name, needed in order:
+                sheets = {}
+                if needed:
+                    start = time.perf_counter()
+                    for path in self.processor.get_sprite_sheets(category, name):
+                        try:
+                            data = self.processor.read_source(path)
+                            image = None
+                            if self.processor.rom_image is not None:
+                                image = self.processor.rom_image.open(path)
+                            if image is None:
+                                image = Image.open(io.BytesIO(data))
+                            image.load()
+                        except Exception:
+                            # The loop opens it itself and reports the error where it always has
+                            continue
+                        sheets[path] = image
+                        self.stats['read']['items'] += 1
+                        self.stats['read']['bytes'] += len(data)
+                    self.stats['read']['busy'] += time.perf_counter() - start
+                if not self._put((category, name, needed, sheets)):
+                    return
+        finally:
+            self._put(None)
+
+    def _put(self, item) -> bool:
+        while not self._stop.is_set():
+            try:
+                self._prefetched.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    @contextlib.contextmanager
+    def sprite(self, category: str, name: str, log: SpriteLog):
+        """Colour one sprite in the loop, with its prefetched sheets and log installed"""
+        start = time.perf_counter()
+        item = self._prefetched.get()
+        if item is None or item[:2] != (category, name):
+            raise RuntimeError(f"Sheet reader is out of step with the sprite loop at {category}/{name}")
+        self.stats['colour']['waited'] += time.perf_counter() - start
+
+        needed, self.sheets, self.log = item[2], item[3], log
+        start = time.perf_counter()
+        blocked = self.stats['write']['waited']
+        try:
+            yield
+        finally:
+            # Up-to-date and shared sprites only log a line; they are not counted as coloured
+            if needed:
+                blocked = self.stats['write']['waited'] - blocked
+                self.stats['colour']['busy'] += time.perf_counter() - start - blocked
+                self.stats['colour']['items'] += 1
+            self.sheets, self.log = {}, None
+
+    def take_sheet(self, path: Path) -> Optional[Image.Image]:
+        """The decoded sheet at path if the reader prefetched it for the current sprite"""
+        return self.sheets.pop(Path(path), None)
+
+    def submit(self, output_path, job):
+        """Queue an output job for the writer threads, blocking while the queue is full"""
+        start = time.perf_counter()
+        self._write_slots.acquire()
+        self.stats['write']['waited'] += time.perf_counter() - start
+
+        key = str(output_path)
+        future = self._writer_pool.submit(self._write, job, self._last_write.get(key))
+        self._last_write[key] = future
+        self.log.defer(future)
+
+    def _write(self, job, previous: Optional[Future]) -> Tuple[List[SpriteArtifact], str]:
+        try:
+            if previous is not None:
+                wait([previous])
+            start = time.perf_counter()
+            artifacts, message = job()
+            with self._lock:
+                self.stats['write']['busy'] += time.perf_counter() - start
+                self.stats['write']['items'] += len(artifacts)
+                self.stats['write']['bytes'] += sum(artifact.bytes for artifact in artifacts if not artifact.linked)
+            return artifacts, message
+        finally:
+            self._write_slots.release()
+
+    def close(self):
+        """Wait for every pending write and stop the reader"""
+        self._stop.set()
+        self._writer_pool.shutdown(wait=True)
+        self._reader.join()
+
+    def report(self) -> str:
+        """Per-stage throughput of the run so far"""
+        wall = time.perf_counter() - self.started
+        read, colour, write = (self.stats[stage] for stage in self.STAGES)
+
+        def rate(stage: Dict) -> float:
+            return stage['items'] / stage['busy'] if stage['busy'] else 0.0
+
+        return "\n".join([
+            f"Pipeline: {colour['items']} sprites in {wall:.2f}s "
+            f"(reading {self.depth} sprites ahead, {self.writers} writer thread{'s' if self.writers != 1 else ''})",
+            f"  read:   {read['items']} sheets, {read['bytes']} bytes, {read['busy']:.2f}s busy, "
+            f"{rate(read):.1f} sheets/s",
+            f"  colour: {colour['items']} sprites, {colour['busy']:.2f}s busy, {rate(colour):.1f} sprites/s, "
+            f"{colour['waited']:.2f}s waiting for sheets",
+            f"  write:  {write['items']} files, {write['bytes']} bytes, {write['busy']:.2f}s busy, "
+            f"{rate(write):.1f} files/s, colouring blocked {write['waited']:.2f}s on a full queue",
+        ])
+
+
+class SpriteBuildCache:
+    """Persistent record of which work units are up to date, keyed on a hash of their inputs"""
+
+    FILE_NAME = '.sprite_build_cache.json'
+    FORMAT_VERSION = 3
+
+    _code_version: Optional[str] = None
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.entries: Dict[str, Dict] = {}
+        self.hits = 0
+        self.misses = 0
+
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+            if data.get('version') == self.FORMAT_VERSION:
+                self.entries = data.get('entries', {})
+        except FileNotFoundError:
+            pass
+        except (ValueError, OSError) as e:
+            print(f"Warning: Ignoring unreadable build cache {self.path}: {e}")
+
+    @classmethod
+    def code_version(cls) -> str:
+        """Hash of this script, so any processor change invalidates every entry"""
+        if cls._code_version is None:
+            cls._code_version = hashlib.sha256(Path(__file__).read_bytes()).hexdigest()
+        return cls._code_version
+
+    def is_fresh(self, unit_id: str, key: str, output_root: Path) -> bool:
+        """True when the unit was built from identical inputs and its outputs still exist"""
+        entry = self.entries.get(unit_id)
+        if entry is None or entry.get('key') != key:
+            return False
+        return all((output_root / row[0]).exists() for row in entry.get('outputs', []))
+
+    def artifacts(self, unit_id: str) -> List[SpriteArtifact]:
+        """Artifacts recorded for an up-to-date unit"""
+        return [SpriteArtifact.from_row(row) for row in self.entries[unit_id].get('outputs', [])]
+
+    def store(self, unit_id: str, key: str, artifacts: List[SpriteArtifact]):
+        rows = {artifact.path: artifact.to_row() for artifact in artifacts}
+        self.entries[unit_id] = {'key': key, 'outputs': [rows[path] for path in sorted(rows)]}
+
+    def save(self):
+        with open(self.path, 'w') as f:
+            json.dump({'version': self.FORMAT_VERSION, 'entries': self.entries}, f, indent=2, sort_keys=True)
+
+
 class GBCSpriteProcessor:
     """Main sprite processing class"""
 
-    def __init__(self, rom_path: str, output_path: str):
+    def __init__(self, rom_path: str, output_path: str, use_cache: bool = False,
+                 url_root: Optional[str] = None):
         self.rom_path = Path(rom_path)
         self.output_path = Path(output_path)
+        # Manifest URLs are relative to this directory (the output path unless this
+        # ROM's tree is nested inside another one's, as in multi-ROM runs)
+        self.url_root = Path(url_root) if url_root is not None else self.output_path
         self.pokemon_dir = self.rom_path / "gfx" / "pokemon"
         self.trainer_dir = self.rom_path / "gfx" / "trainers"
         self.items_dir = self.rom_path / "gfx" / "items"
         self.minis_dir = self.rom_path / "gfx" / "minis"
         self.icons_dir = self.rom_path / "gfx" / "icons"
+        self.icon_pals_file = self.rom_path / "data" / "pokemon" / "overworld_icon_pals.asm"
 
         # Create output directories
         self.sprites_dir = self.output_path / "sprites" / "pokemon"
@@ -257,10 +1536,112 @@ class GBCSpriteProcessor:
         # Load icon palette mappings from overworld_icon_pals.asm
         self.icon_color_map = self._load_icon_palette_map()
 
+        # Artifacts written by the current process_* call, and by the whole run keyed by path
+        self.artifacts: List[SpriteArtifact] = []
+        self.run_artifacts: Dict[str, SpriteArtifact] = {}
+        self.manifest_sources = {'recorded': 0, 'disk': 0}
+
+        # Static PNG encoding: 'rgba' (32-bit) or 'indexed' (PLTE + tRNS)
+        self.png_mode = 'rgba'
+
+        # GIF encoding: 'quantize' (Pillow's adaptive palette and optimizer) or 'palette'
+        # (frames indexed straight from their exact colors into one shared color table)
+        self.gif_mode = 'quantize'
+
+        # Extra animation formats (from ANIMATION_FORMATS) written next to each GIF
+        self.animation_formats: List[str] = []
+
+        # When set to a list, every animation written is appended as (gif_path, frames, durations)
+        self.animation_log: Optional[List] = None
+
+        # Atlas placements keyed by sprite URL, loaded on first use
+        self._atlas_entries: Optional[Dict[str, Dict]] = None
+
+        # Print a per-sprite decode/render/encode timing breakdown
+        self.show_timings = False
+
+        # Pipelined batch runs (--pipeline): sprites read ahead and writer threads, 0 = off
+        self.pipeline_depth = 8
+        self.pipeline_writers = 0
+        self._pipeline: Optional[SpritePipeline] = None
+
+        # Built ROM whose pics and palettes stand in for gfx/pokemon and gfx/trainers (--rom-image)
+        self.rom_image: Optional[RomImageSprites] = None
+
+        # Decoded source sheets kept across process_* calls by long-running modes (serve), keyed by path
+        self.sheet_cache: Optional[Dict[str, Image.Image]] = None
+
+        # Profiling (--profile): every process_* call reports wall/CPU time, stages,
+        # bytes, stat calls and peak memory, collected here along with whole-run phases
+        self.profile = False
+        self.profile_records: List[Dict] = []
+        self.profile_phases: Dict[str, Dict] = {}
+        self.timer = StageTimer()
+        self._profiler: Optional[SpriteProfiler] = None
+
+        # Parsed palettes and derived names, built on first use
+        self._palette_db: Optional[GBCPaletteDatabase] = None
+        self._assets: Optional[SpriteAssetInventory] = None
+        self._name_index: Optional[SpriteNameIndex] = None
+
+        # Work units shared between ROM trees, keyed on their input hash, as
+        # (rom name, url prefix, artifacts); set to a dict to take part in multi-ROM runs
+        self.shared_units: Optional[Dict[str, Tuple[str, str, List[SpriteArtifact]]]] = None
+        # How byte-identical outputs are shared: 'off', 'hardlink' (one file on disk)
+        # or 'manifest' (every duplicate's manifest URL points at one file)
+        self.dedup_mode = 'off'
+        self.dedup_urls: Dict[str, str] = {}
+        # For --dedup: sha256 -> an output this process wrote with those bytes, and what
+        # each output it stored holds now (a later write may have replaced a blob)
+        self.dedup_blobs: Dict[str, Path] = {}
+        self.dedup_contents: Dict[Path, str] = {}
+
+        # Output paths of this tree served by another ROM's files, mapped to their URLs
+        self.shared_urls: Dict[str, str] = {}
+        self._shared_children: Dict[str, set] = {}
+
+        # Content-hash cache used by batch runs to skip sprites that are already up to date
+        self.build_cache: Optional[SpriteBuildCache] = None
+        if use_cache:
+            self.build_cache = SpriteBuildCache(self.output_path / SpriteBuildCache.FILE_NAME)
+
+    @property
+    def palette_db(self) -> GBCPaletteDatabase:
+        """Every ROM palette parsed once; persisted next to the output when caching is on"""
+        if self._palette_db is None:
+            cache_path = None
+            if self.build_cache is not None:
+                cache_path = self.output_path / GBCPaletteDatabase.FILE_NAME
+            self._palette_db = GBCPaletteDatabase(self.rom_path, cache_path)
+            if self.rom_image is not None:
+                self._palette_db.palettes.update(self.rom_image.palettes)
+        return self._palette_db
+
+    @property
+    def assets(self) -> SpriteAssetInventory:
+        """Listing of the ROM's gfx directories, read once per directory (or taken from the ROM image)"""
+        if self._assets is None:
+            self._assets = SpriteAssetInventory()
+            if self.rom_image is not None:
+                self.rom_image.populate(self._assets)
+        return self._assets
+
+    @property
+    def name_index(self) -> SpriteNameIndex:
+        """Output names, palette sources and icon colour keys of every ROM folder"""
+        if self._name_index is None:
+            self._name_index = SpriteNameIndex(self)
+        return self._name_index
+
+    def rescan_rom(self):
+        """List the ROM directories and rebuild the name index again on next use, after ROM files changed"""
+        self._assets = None
+        self._name_index = None
+
     def _load_icon_palette_map(self) -> Dict[str, Tuple[str, str]]:
         """Parse overworld_icon_pals.asm to get Pokemon -> (color1, color2) mapping"""
         pal_map = {}
-        pal_file = self.rom_path / "data" / "pokemon" / "overworld_icon_pals.asm"
+        pal_file = self.icon_pals_file
 
         if not pal_file.exists():
             print(f"Warning: Icon palette map not found at {pal_file}")
@@ -289,12 +1670,11 @@ class GBCSpriteProcessor:
     def get_pokemon_list(self) -> List[str]:
         """Get list of all Pokemon directories, including mapped variants"""
         pokemon_dirs = []
-        if self.pokemon_dir.exists():
-            for item in self.pokemon_dir.iterdir():
-                if item.is_dir() and not item.name.startswith('.') and not item.name.endswith('.asm'):
-                    # Include the directory name as-is for processing
-                    pokemon_dirs.append(item.name)
-        return sorted(pokemon_dirs)
+        for name in self.assets.dirs(self.pokemon_dir):
+            if not name.startswith('.') and not name.endswith('.asm'):
+                # Include the directory name as-is for processing
+                pokemon_dirs.append(name)
+        return pokemon_dirs
 
     def should_process_pokemon(self, pokemon_name: str) -> bool:
         """Determine if this Pokemon directory should be processed"""
@@ -303,6 +1683,11 @@ class GBCSpriteProcessor:
 
     def get_output_name(self, pokemon_name: str) -> str:
         """Get the output directory name for a Pokemon - normalized to match extraction format"""
+        entry = self.name_index.pokemon.get(pokemon_name)
+        return entry['output'] if entry is not None else self.derive_output_name(pokemon_name)
+
+    def derive_output_name(self, pokemon_name: str) -> str:
+        """Work out a Pokemon folder's output name (see get_output_name for the cached lookup)"""
         # Handle special mappings first
         mapped_name = pokemon_name
         # Map dudunsparce_two_segment to the default dudunsparce folder (this is the "plain" form)
@@ -330,33 +1715,47 @@ class GBCSpriteProcessor:
         # (reduces base name but preserves form suffixes with underscores)
         return reduce_pokemon_folder_name(mapped_name)
 
+    def split_frames(self, sprite_img: Image.Image) -> List[Image.Image]:
+        """Split a vertical sprite sheet into frames using auto-detection logic from crop_top_sprite.ts"""
+        width, height = sprite_img.size
+
+        # Auto-detect sprite dimensions (from your TypeScript logic)
+        sprite_height = width  # Default to square
+        for h in range(width, height + 1):
+            if height % h == 0 and h <= width:
+                sprite_height = h
+                break
+
+        # If we couldn't find a good divisor, use the original approach
+        if sprite_height > height:
+            sprite_height = min(56, height)
+
+        frames = []
+        num_frames = height // sprite_height
+
+        for i in range(num_frames):
+            top = i * sprite_height
+            bottom = min(top + sprite_height, height)
+            frame = sprite_img.crop((0, top, width, bottom))
+            frames.append(frame)
+
+        return frames if frames else [sprite_img]
+
     def extract_sprite_frames(self, sprite_path: str) -> List[Image.Image]:
         """Extract individual frames using auto-detection logic from crop_top_sprite.ts"""
         try:
-            sprite_img = Image.open(sprite_path).convert('RGBA')
-            width, height = sprite_img.size
-
-            # Auto-detect sprite dimensions (from your TypeScript logic)
-            sprite_height = width  # Default to square
-            for h in range(width, height + 1):
-                if height % h == 0 and h <= width:
-                    sprite_height = h
-                    break
-
-            # If we couldn't find a good divisor, use the original approach
-            if sprite_height > height:
-                sprite_height = min(56, height)
+            return self.split_frames(self.open_sheet(sprite_path).convert('RGBA'))
 
-            frames = []
-            num_frames = height // sprite_height
-
-            for i in range(num_frames):
-                top = i * sprite_height
-                bottom = min(top + sprite_height, height)
-                frame = sprite_img.crop((0, top, width, bottom))
-                frames.append(frame)
+        except Exception as e:
+            print(f"Warning: Could not process sprite {sprite_path}: {e}")
+            return []
 
-            return frames if frames else [sprite_img]
+    def extract_shade_frames(self, sprite_path: str,
+                             thresholds: Tuple[int, ...] = GBCPaletteEngine.SPRITE_THRESHOLDS) -> List[Image.Image]:
+        """Decode a sheet once into per-frame shade maps that any palette can be rendered from"""
+        try:
+            sprite_img = self.open_sheet(sprite_path).convert('RGBA')
+            return self.split_frames(GBCPaletteEngine.to_shade_map(sprite_img, thresholds))
 
         except Exception as e:
             print(f"Warning: Could not process sprite {sprite_path}: {e}")
@@ -364,87 +1763,359 @@ class GBCSpriteProcessor:
 
     def apply_palette_to_sprite(self, sprite: Image.Image, palette: List[Tuple[int, int, int]]) -> Image.Image:
         """Apply GBC palette to sprite and create transparency"""
-        # Convert to grayscale first to map palette indices
-        gray_sprite = sprite.convert('L')
-
-        # Extend palette to 4 colors if needed (GBC standard)
-        while len(palette) < 4:
-            palette.append((255, 255, 255))  # Add white as default
-
-        # Create RGBA image
-        rgba_sprite = Image.new('RGBA', sprite.size, (0, 0, 0, 0))
-        pixels = rgba_sprite.load()
-        gray_pixels = gray_sprite.load()
-
-        for y in range(sprite.size[1]):
-            for x in range(sprite.size[0]):
-                gray_value = gray_pixels[x, y]
-
-                # Map grayscale values to palette indices
-                # Game Boy Color uses: lightest=background, darkest=foreground
-                if gray_value >= 240:    # Near white -> transparent background
-                    pixels[x, y] = (0, 0, 0, 0)  # Transparent
-                elif gray_value >= 170:  # Light gray -> palette[0] (lightest color)
-                    r, g, b = palette[0] if len(palette) > 0 else (200, 200, 200)
-                    pixels[x, y] = (r, g, b, 255)
-                elif gray_value >= 85:   # Medium gray -> palette[1] (medium color)
-                    r, g, b = palette[1] if len(palette) > 1 else (128, 128, 128)
-                    pixels[x, y] = (r, g, b, 255)
-                else:                    # Dark gray/black -> palette[2] (darkest color)
-                    r, g, b = palette[2] if len(palette) > 2 else (64, 64, 64)
-                    pixels[x, y] = (r, g, b, 255)
-
-        return rgba_sprite
+        # Game Boy Color uses: lightest=background, darkest=foreground
+        # Near white -> transparent, light gray -> palette[0],
+        # medium gray -> palette[1], dark gray/black -> palette[2]
+        return GBCPaletteEngine.colorize(
+            sprite, GBCPaletteEngine.SPRITE_THRESHOLDS, GBCPaletteEngine.sprite_slots(palette)
+        )
+
+    def store_output(self, output_path, data: bytes, width: int, height: int, frames: int) -> SpriteArtifact:
+        """Write an encoded image file, or with --dedup link it to one already holding the same bytes"""
+        output_path = Path(output_path)
+        digest = hashlib.sha256(data).hexdigest()
+        artifact = SpriteArtifact(output_path.relative_to(self.output_path).as_posix(),
+                                  width, height, frames, len(data), digest)
+        if self.dedup_mode != 'off':
+            blob = self.dedup_blobs.get(digest)
+            if blob is not None and self.dedup_contents.get(blob) == digest and self.link_output(blob, output_path):
+                self.dedup_contents[output_path] = digest
+                artifact.linked = True
+                return artifact
+
+        self.release_output(output_path)
+        with open(output_path, 'wb') as f:
+            f.write(data)
+        if self.dedup_mode != 'off':
+            # Registered once complete, so writer threads never link to a half-written file
+            self.dedup_contents[output_path] = digest
+            if self.dedup_contents.get(self.dedup_blobs.get(digest)) != digest:
+                self.dedup_blobs[digest] = output_path
+        return artifact
+
+    def link_output(self, blob: Path, output_path: Path) -> bool:
+        """Make output_path a hardlink to blob, replacing whatever is there; False if linking failed"""
+        try:
+            if output_path.exists() and os.path.samefile(blob, output_path):
+                return True
+            staging = output_path.with_name(output_path.name + '.link')
+            os.link(blob, staging)
+            os.replace(staging, output_path)
+            return True
+        except OSError:
+            return False
+
+    def record_artifact(self, artifact: SpriteArtifact):
+        """Remember an output of the current process_* call"""
+        self.artifacts.append(artifact)
+        self.run_artifacts[artifact.path] = artifact
+
+    def run_output_job(self, output_path, job):
+        """Run a job that writes output_path and returns (artifacts, log message)
+
+        In pipelined runs the job goes to the writer threads instead; its artifacts
+        and message join the sprite's result and log once it has run.
+        """
+        if self._pipeline is not None:
+            self._pipeline.submit(output_path, job)
+            return
+        artifacts, message = job()
+        for artifact in artifacts:
+            self.record_artifact(artifact)
+        print(message, end='')
+
+    def writer_images(self, images: List[Image.Image]) -> List[Image.Image]:
+        """Images an output job may use; pipelined writers each get copies, as Image.save stores its options on the image"""
+        if self._pipeline is None:
+            return images
+        return [image.copy() for image in images]
+
+    def open_sheet(self, sheet_path) -> Image.Image:
+        """Open a source sheet, using the copy the pipeline's reader or the sheet cache already decoded if there is one"""
+        if self._pipeline is not None:
+            sheet = self._pipeline.take_sheet(sheet_path)
+            if sheet is not None:
+                return sheet
+        if self.sheet_cache is not None:
+            sheet = self.sheet_cache.get(str(sheet_path))
+            if sheet is None:
+                sheet = self.load_sheet(sheet_path)
+                sheet.load()
+                self.sheet_cache[str(sheet_path)] = sheet
+            return sheet.copy()
+        return self.load_sheet(sheet_path)
+
+    def load_sheet(self, sheet_path) -> Image.Image:
+        """Open a source sheet from the ROM tree, or decode it from the ROM image if that holds it"""
+        if self.rom_image is not None:
+            sheet = self.rom_image.open(sheet_path)
+            if sheet is not None:
+                return sheet
+        return Image.open(sheet_path)
+
+    def read_source(self, path: Path) -> bytes:
+        """Bytes of a ROM input, for hashing; a sheet held by the ROM image is its compressed data"""
+        if self.rom_image is not None:
+            data = self.rom_image.source_bytes(path)
+            if data is not None:
+                return data
+        return path.read_bytes()
+
+    def begin_sprite(self) -> StageTimer:
+        """Start timing a process_* call; its stages are recorded on the returned timer"""
+        self.timer = StageTimer()
+        if self.profile:
+            self._profiler = SpriteProfiler(self.timer)
+        return self.timer
+
+    def _finish(self, ok: bool) -> SpriteResult:
+        """Package the artifacts written by the current process_* call"""
+        artifacts, self.artifacts = self.artifacts, []
+        result = SpriteResult(ok, artifacts)
+        if self._profiler is not None:
+            result.profile = self._profiler.finish(sum(artifact.bytes for artifact in artifacts
+                                                       if not artifact.linked))
+            self._profiler = None
+        return result
+
+    @contextlib.contextmanager
+    def profile_phase(self, name: str):
+        """Profile a whole-run phase such as manifest building (no-op unless profiling)"""
+        if not self.profile:
+            yield
+            return
+        profiler = SpriteProfiler()
+        try:
+            yield
+        finally:
+            self.profile_phases[name] = profiler.finish()
+
+    def release_output(self, output_path):
+        """Detach an output path from files it is hardlinked with, so rewriting it leaves them alone"""
+        try:
+            if os.stat(output_path).st_nlink > 1:
+                os.unlink(output_path)
+        except FileNotFoundError:
+            pass
+
+    def save_static_sprite(self, sprite: Image.Image, output_path: Path):
+        """Save a processed frame as a static PNG and remember that it was written"""
+        sprite, = self.writer_images([sprite])
+
+        def write():
+            encoded = io.BytesIO()
+            if self.png_mode == 'indexed':
+                # Palette-mode PNG with a tRNS chunk; decodes to the same RGBA pixels
+                (GBCPaletteEngine.to_indexed(sprite) or sprite).save(encoded, 'PNG')
+            else:
+                sprite.save(encoded, 'PNG')
+            return [self.store_output(output_path, encoded.getvalue(), sprite.width, sprite.height, 1)], ''
+
+        self.run_output_job(output_path, write)
+
+    def save_animated_gif(self, frames: List[Image.Image], durations: List[int], output):
+        """Encode frames as an animated GIF to a path or file object"""
+        # Convert Game Boy timing to GIF timing
+        # GIFs typically display at 100fps (10ms minimum), but we want to preserve
+        # the relative timing from Game Boy (59.7275 fps)
+        gif_durations = []
+        for duration_ms in durations:
+            # Convert to centiseconds (GIF uses 1/100s units)
+            # Round to nearest centisecond but ensure minimum of 2 (20ms for smooth playback)
+            centiseconds = max(2, round(duration_ms / 10))
+            gif_durations.append(centiseconds)
+
+        # If we have fewer duration values than frames, repeat the last duration
+        while len(gif_durations) < len(frames):
+            gif_durations.append(gif_durations[-1] if gif_durations else 50)
+
+        # Add a 300ms (30 centiseconds) pause after the last frame
+        gif_durations[-1] += 30
+
+        # Frames already indexed to one exact table need no quantizing or palette optimizing
+        options = {'optimize': True}
+        indexed = GBCPaletteEngine.to_gif_frames(frames) if self.gif_mode == 'palette' else None
+        if indexed is not None:
+            frames, table = indexed
+            options = {'optimize': False, 'palette': table, 'transparency': 0}
+
+        # Save the animated GIF with the calculated durations
+        frames[0].save(
+            output,
+            format='GIF',
+            save_all=True,
+            append_images=frames[1:],
+            duration=[d * 10 for d in gif_durations],  # Convert centiseconds back to milliseconds
+            loop=0,
+            disposal=2,  # Clear frame before next
+            **options
+        )
 
     def create_animated_gif(self, frames: List[Image.Image], durations: List[int], output_path: str):
         """Create animated GIF from frames with accurate timing conversion and a 300ms delay after each loop"""
         if not frames:
             return
 
-        try:
-            # Convert Game Boy timing to GIF timing
-            # GIFs typically display at 100fps (10ms minimum), but we want to preserve
-            # the relative timing from Game Boy (59.7275 fps)
-            gif_durations = []
-            for duration_ms in durations:
-                # Convert to centiseconds (GIF uses 1/100s units)
-                # Round to nearest centisecond but ensure minimum of 2 (20ms for smooth playback)
-                centiseconds = max(2, round(duration_ms / 10))
-                gif_durations.append(centiseconds)
-
-            # If we have fewer duration values than frames, repeat the last duration
-            while len(gif_durations) < len(frames):
-                gif_durations.append(gif_durations[-1] if gif_durations else 50)
-
-            # Add a 300ms (30 centiseconds) pause after the last frame
-            gif_durations[-1] += 30
-
-            # Save the animated GIF with the calculated durations
-            frames[0].save(
-                output_path,
-                save_all=True,
-                append_images=frames[1:],
-                duration=[d * 10 for d in gif_durations],  # Convert centiseconds back to milliseconds
-                loop=0,
-                disposal=2,  # Clear frame before next
-                optimize=True
-            )
-            print(f"Created animated GIF: {output_path}")
+        frames = self.writer_images(frames)
+
+        def write():
+            try:
+                encoded = io.BytesIO()
+                self.save_animated_gif(frames, durations, encoded)
+                artifact = self.store_output(output_path, encoded.getvalue(),
+                                             frames[0].width, frames[0].height, len(frames))
+                return [artifact], f"Created animated GIF: {output_path}\n"
+
+            except Exception as e:
+                return [], f"Warning: Could not create GIF {output_path}: {e}\n"
+
+        self.run_output_job(output_path, write)
+
+    def get_animation_schedule(self, frames: List[Image.Image], durations: List[int]) -> List[float]:
+        """Intended display time of each frame in milliseconds, with the 300ms pause after each loop"""
+        schedule = [float(duration_ms) for duration_ms in durations[:len(frames)]]
+
+        # If we have fewer duration values than frames, repeat the last duration
+        while len(schedule) < len(frames):
+            schedule.append(schedule[-1] if schedule else 500.0)
+
+        schedule[-1] += 300
+        return schedule
+
+    def get_animation_durations_ms(self, frames: List[Image.Image], durations: List[int]) -> List[int]:
+        """Per-frame display time in whole milliseconds for formats with millisecond timing"""
+        return [max(1, round(duration_ms)) for duration_ms in self.get_animation_schedule(frames, durations)]
+
+    def save_animation(self, frames: List[Image.Image], durations: List[int], output, animation_format: str):
+        """Encode frames as an animated WebP or APNG to a path or file object"""
+        frames[0].save(
+            output,
+            save_all=True,
+            append_images=frames[1:],
+            duration=self.get_animation_durations_ms(frames, durations),
+            loop=0,
+            **ANIMATION_SAVE_OPTIONS[animation_format]
+        )
+
+    def create_animation(self, frames: List[Image.Image], durations: List[int], gif_path: Path):
+        """Write the animated GIF plus every extra animation format selected for this run"""
+        self.create_animated_gif(frames, durations, str(gif_path))
+        if not frames:
+            return
 
-        except Exception as e:
-            print(f"Warning: Could not create GIF {output_path}: {e}")
+        if self.animation_log is not None:
+            self.animation_log.append((Path(gif_path), frames, durations))
+
+        for animation_format in self.animation_formats:
+            output_path = Path(gif_path).with_suffix(f".{animation_format}")
+
+            def write(output_path=output_path, animation_format=animation_format,
+                      frames=self.writer_images(frames)):
+                try:
+                    encoded = io.BytesIO()
+                    self.save_animation(frames, durations, encoded, animation_format)
+                    artifact = self.store_output(output_path, encoded.getvalue(),
+                                                 frames[0].width, frames[0].height, len(frames))
+                    return [artifact], f"Created animated {animation_format.upper()}: {output_path}\n"
+                except Exception as e:
+                    return [], f"Warning: Could not create {animation_format.upper()} {output_path}: {e}\n"
+
+            self.run_output_job(output_path, write)
+
+    def share_output(self, artifact: SpriteArtifact, url: str):
+        """Serve one of this tree's outputs from a file another ROM already wrote"""
+        self.shared_urls[artifact.path] = url
+        self.run_artifacts[artifact.path] = artifact
+        parts = artifact.path.split('/')
+        for depth in range(1, len(parts)):
+            self._shared_children.setdefault('/'.join(parts[:depth]), set()).add(parts[depth])
+
+    def list_outputs(self, directory: Path) -> List[Path]:
+        """Children of an output directory, including outputs shared from another ROM"""
+        children = set(directory.iterdir()) if directory.is_dir() else set()
+        shared = self._shared_children.get(directory.relative_to(self.output_path).as_posix(), ())
+        children.update(directory / name for name in shared)
+        return sorted(children)
+
+    def is_output_dir(self, path: Path) -> bool:
+        return path.relative_to(self.output_path).as_posix() in self._shared_children or path.is_dir()
+
+    def is_output_file(self, path: Path) -> bool:
+        return path.relative_to(self.output_path).as_posix() in self.shared_urls or path.is_file()
+
+    def output_exists(self, path: Path) -> bool:
+        return path.relative_to(self.output_path).as_posix() in self.shared_urls or path.exists()
+
+    def get_output_url(self, path: Path) -> str:
+        """Manifest URL of an output, pointing shared outputs at the one stored file"""
+        rel_path = path.relative_to(self.output_path).as_posix()
+        shared_url = self.shared_urls.get(rel_path) or self.dedup_urls.get(rel_path)
+        if shared_url is not None:
+            return shared_url
+        return path.relative_to(self.url_root).as_posix()
+
+    def add_animation_formats(self, sprite_info: Dict, gif_file: Path):
+        """Record the other formats an animated manifest entry is also available in"""
+        formats = {}
+        for animation_format in ANIMATION_FORMATS:
+            alternate = gif_file.with_suffix(f".{animation_format}")
+            rel_path = alternate.relative_to(self.output_path).as_posix()
+            if rel_path in self.run_artifacts or self.output_exists(alternate):
+                formats[animation_format] = self.get_output_url(alternate)
+        if formats:
+            sprite_info["formats"] = formats
+
+    def resolve_pokemon_palette(self, pokemon_name: str, variant: str) -> Path:
+        """Find the .pal file a Pokemon variant is colored with (may not exist)"""
+        entry = self.name_index.pokemon.get(pokemon_name)
+        if entry is not None and variant in entry['palettes']:
+            return entry['palettes'][variant]
+        return self.find_pokemon_palette(pokemon_name, variant)
+
+    def find_pokemon_palette(self, pokemon_name: str, variant: str) -> Path:
+        """Search a Pokemon's folder, then its base form's, for a variant's .pal"""
+        pokemon_path = self.pokemon_dir / pokemon_name
 
-    def process_pokemon(self, pokemon_name: str) -> bool:
+        # Check if we need to look for palette files in a different directory
+        palette_dir = pokemon_path
+        if pokemon_name in self.palette_directory_mapping:
+            palette_dir = self.pokemon_dir / self.palette_directory_mapping[pokemon_name]
+
+        palette_file = palette_dir / f"{variant}.pal"
+
+        # If palette not found in current dir, try the base Pokemon folder
+        # (e.g., pikachu_plain uses palettes from pikachu folder)
+        if self.palette_db.get(palette_file) is None and '_' in pokemon_name:
+            # Extract base name by removing the form suffix
+            for suffix in ['_plain', '_alolan', '_galarian', '_hisuian', '_paldean',
+                           '_fly', '_surf', '_spark', '_spiky', '_chuchu', '_pika',
+                           '_koga', '_agatha', '_lance',
+                           '_two_segment', '_twosegment',
+                           '_three_segment', '_threesegment',
+                           '_kanto', '_ariana',
+                           '_red', '_yellow', '_green', '_blue']:
+                if pokemon_name.endswith(suffix):
+                    base_name = pokemon_name[:-len(suffix)]
+                    base_palette_file = self.pokemon_dir / base_name / f"{variant}.pal"
+                    if self.palette_db.get(base_palette_file) is not None:
+                        palette_file = base_palette_file
+                        break
+
+        return palette_file
+
+    def process_pokemon(self, pokemon_name: str) -> SpriteResult:
         """Process a single Pokemon's sprites - only front sprites, 4 files total"""
+        timer = self.begin_sprite()
+
         # Check if we should process this Pokemon
         if not self.should_process_pokemon(pokemon_name):
             print(f"Skipping {pokemon_name}")
-            return True
+            return self._finish(True)
 
         pokemon_path = self.pokemon_dir / pokemon_name
-        if not pokemon_path.exists():
+        if not self.assets.is_dir(pokemon_path):
             print(f"Pokemon directory not found: {pokemon_name}")
-            return False
+            return self._finish(False)
 
         # Get the output name (base Pokemon name)
         output_name = self.get_output_name(pokemon_name)
@@ -462,64 +2133,46 @@ class GBCSpriteProcessor:
         variants = ['normal', 'shiny']
         sprite_types = ['front', 'back']
 
+        # Each sheet is decoded to shade maps once and rendered for every palette variant
+        shade_sheets: Dict[str, List[Image.Image]] = {}
+
         for variant in variants:
-            # Check if we need to look for palette files in a different directory
-            palette_dir = pokemon_path
-            if pokemon_name in self.palette_directory_mapping:
-                palette_dir = self.pokemon_dir / self.palette_directory_mapping[pokemon_name]
-
-            palette_file = palette_dir / f"{variant}.pal"
-
-            # If palette not found in current dir, try the base Pokemon folder
-            # (e.g., pikachu_plain uses palettes from pikachu folder)
-            if not palette_file.exists() and '_' in pokemon_name:
-                # Extract base name by removing the form suffix
-                for suffix in ['_plain', '_alolan', '_galarian', '_hisuian', '_paldean',
-                               '_fly', '_surf', '_spark', '_spiky', '_chuchu', '_pika',
-                               '_koga', '_agatha', '_lance',
-                               '_two_segment', '_twosegment',
-                               '_three_segment', '_threesegment',
-                               '_kanto', '_ariana',
-                               '_red', '_yellow', '_green', '_blue']:
-                    if pokemon_name.endswith(suffix):
-                        base_name = pokemon_name[:-len(suffix)]
-                        base_palette_dir = self.pokemon_dir / base_name
-                        base_palette_file = base_palette_dir / f"{variant}.pal"
-                        if base_palette_file.exists():
-                            palette_file = base_palette_file
-                            palette_dir = base_palette_dir
-                            break
-
-            if not palette_file.exists():
+            palette_file = self.resolve_pokemon_palette(pokemon_name, variant)
+            palette = self.palette_db.get(palette_file)
+            if palette is None:
                 print(f"Palette file not found: {palette_file}")
                 continue
-
-            palette = GBCPaletteParser.parse_palette_file(str(palette_file))
+            slot_colors = GBCPaletteEngine.sprite_slots(palette)
 
             # Process both front and back sprites
             for sprite_type in sprite_types:
                 sprite_file = pokemon_path / f"{sprite_type}.png"
-                if not sprite_file.exists():
+                if not self.assets.exists(sprite_file):
                     if sprite_type == 'front':
                         print(f"Sprite file not found: {sprite_file}")
                     # Back sprites may not exist for all Pokemon, skip silently
                     continue
 
                 # Extract frames from sprite sheet
-                raw_frames = self.extract_sprite_frames(str(sprite_file))
-                if not raw_frames:
+                if sprite_type not in shade_sheets:
+                    with timer.stage('decode'):
+                        shade_sheets[sprite_type] = self.extract_shade_frames(str(sprite_file))
+                shade_frames = shade_sheets[sprite_type]
+                if not shade_frames:
                     print(f"No frames extracted from sprite: {sprite_file}")
                     continue
 
                 # Apply palette and transparency
-                processed_frames = [
-                    self.apply_palette_to_sprite(frame, palette) for frame in raw_frames
-                ]
+                with timer.stage('render'):
+                    processed_frames = [
+                        GBCPaletteEngine.render(frame, slot_colors) for frame in shade_frames
+                    ]
 
                 # Save static PNG (first frame)
                 png_output_path = output_dir / f"{variant}_{sprite_type}.png"
                 if processed_frames:
-                    processed_frames[0].save(png_output_path)
+                    with timer.stage('encode'):
+                        self.save_static_sprite(processed_frames[0], png_output_path)
                     print(f"Saved static PNG: {png_output_path}")
 
                 # Only create animated GIFs for front sprites (back sprites are single frame)
@@ -538,120 +2191,515 @@ class GBCSpriteProcessor:
 
                     # Save processed frames as an animated GIF
                     gif_output_path = output_dir / f"{variant}_{sprite_type}_animated.gif"
-                    self.create_animated_gif(processed_frames, durations, str(gif_output_path))
+                    with timer.stage('encode'):
+                        self.create_animation(processed_frames, durations, gif_output_path)
+
+        if self.show_timings:
+            print(f"Timing {pokemon_name}: {timer.summary()}")
+
+        return self._finish(True)
+
+    def get_output_key(self, category: str, name: str) -> str:
+        """Output location a source sprite writes to; sprites sharing one must run in order"""
+        if category == 'pokemon':
+            return self.get_output_name(name)
+        return reduce_name(name)
+
+    def get_sprite_sheets(self, category: str, name: str) -> List[Path]:
+        """Source sheets (and masks) one sprite decodes that are present in the ROM"""
+        if category == 'pokemon':
+            sources = [self.pokemon_dir / name / "front.png", self.pokemon_dir / name / "back.png"]
+        elif category == 'trainers':
+            sources = [self.trainer_dir / f"{name}.png"]
+        elif category == 'items':
+            sources = [self.items_dir / f"{name}.png"]
+        elif category == 'minis':
+            sources = [self.minis_dir / f"{name}.png", self.minis_dir / f"{name}_mask.png"]
+        else:
+            sources = [self.icons_dir / f"{name}.png"]
+        return [source for source in sources if self.assets.exists(source)]
+
+    def get_source_size(self, category: str, name: str) -> int:
+        """Bytes of source sheet data behind one sprite, used to schedule large work first"""
+        size = 0
+        for source in self.get_sprite_sheets(category, name):
+            data = self.rom_image.source_bytes(source) if self.rom_image is not None else None
+            if data is not None:
+                size += len(data)
+                continue
+            try:
+                size += source.stat().st_size
+            except OSError:
+                pass
+        return size
+
+    def output_options(self) -> Dict[str, str]:
+        """Settings that change the bytes written for the same inputs"""
+        return {'png_mode': self.png_mode, 'gif_mode': self.gif_mode,
+                'animation_formats': ','.join(self.animation_formats)}
+
+    def get_sprite_inputs(self, category: str, name: str) -> Dict[Path, str]:
+        """ROM files one sprite's outputs are derived from, each with the reason it is used
+
+        Includes the palettes a sprite falls back to or borrows (a form using its base
+        Pokemon's .pal, a mini using its Pokemon's normal.pal) and ones it would use if
+        they existed, such as a form's own .pal.
+        """
+        inputs: Dict[Path, str] = {}
+        if category == 'pokemon':
+            inputs[self.pokemon_dir / name / "front.png"] = "front sheet"
+            inputs[self.pokemon_dir / name / "back.png"] = "back sheet"
+            palette_dir = self.pokemon_dir / self.palette_directory_mapping.get(name, name)
+            for variant in ['normal', 'shiny']:
+                own_palette = palette_dir / f"{variant}.pal"
+                palette_file = self.resolve_pokemon_palette(name, variant)
+                inputs[own_palette] = f"{variant} palette"
+                if palette_file != own_palette:
+                    inputs[palette_file] = f"{variant} palette, falling back to {palette_file.parent.name}"
+        elif category == 'trainers':
+            inputs[self.trainer_dir / f"{name}.png"] = "sheet"
+            inputs[self.trainer_dir / f"{name}.pal"] = "palette"
+            for palette_name in self.get_trainer_palettes(name):
+                inputs.setdefault(self.trainer_dir / f"{palette_name}.pal", "palette variant")
+        elif category == 'items':
+            inputs[self.items_dir / f"{name}.png"] = "sheet"
+        elif category == 'minis':
+            inputs[self.minis_dir / f"{name}.png"] = "sheet"
+            inputs[self.minis_dir / f"{name}_mask.png"] = "mask"
+            pokemon_name = self.get_mini_pokemon_name(name)
+            if pokemon_name is not None:
+                inputs[self.resolve_mini_palette(pokemon_name)] = f"palette borrowed from Pokemon {pokemon_name}"
+        else:
+            inputs[self.icons_dir / f"{name}.png"] = "sheet"
+            inputs[self.icon_pals_file] = "icon colours"
+        return inputs
+
+    def get_cache_key(self, category: str, names: List[str]) -> str:
+        """Hash everything the outputs of a work unit are derived from"""
+        digest = hashlib.sha256()
+        digest.update(SpriteBuildCache.code_version().encode())
+        digest.update(repr(self.output_options()).encode())
+
+        def add_file(path: Path):
+            digest.update(str(path.relative_to(self.rom_path)).encode() + b'\0')
+            try:
+                digest.update(self.read_source(path))
+            except OSError:
+                digest.update(b'<missing>')
+            digest.update(b'\0')
+
+        def add_palette(path: Path):
+            digest.update(f"{path.relative_to(self.rom_path)}={self.palette_db.get(path)}\0".encode())
+
+        for name in names:
+            digest.update(f"{category}/{name}\0".encode())
+            if category == 'pokemon':
+                add_file(self.pokemon_dir / name / "front.png")
+                add_file(self.pokemon_dir / name / "back.png")
+                for variant in ['normal', 'shiny']:
+                    add_palette(self.resolve_pokemon_palette(name, variant))
+            elif category == 'trainers':
+                add_file(self.trainer_dir / f"{name}.png")
+                for palette_name in self.get_trainer_palettes(name):
+                    add_palette(self.trainer_dir / f"{palette_name}.pal")
+            elif category == 'items':
+                add_file(self.items_dir / f"{name}.png")
+            elif category == 'minis':
+                add_file(self.minis_dir / f"{name}.png")
+                add_file(self.minis_dir / f"{name}_mask.png")
+                digest.update(repr(self.get_mini_palette(name)).encode())
+            elif category == 'icons':
+                add_file(self.icons_dir / f"{name}.png")
+                color1_name, color2_name = self._get_icon_colors(name)
+                digest.update(repr((color1_name, color2_name,
+                                    self.icon_palettes.get(color1_name),
+                                    self.icon_palettes.get(color2_name))).encode())
+
+        return digest.hexdigest()
+
+    def process_entry(self, category: str, index: int, total: int, name: str,
+                      up_to_date: bool = False, shared_from: Optional[str] = None) -> SpriteResult:
+        """Process one sprite for the batch driver, logging its progress line first"""
+        spec = SPRITE_CATEGORIES[category]
+        print(f"[{index}/{total}] Processing {spec.progress_label}{name}")
+        if shared_from is not None:
+            print(f"Shared with {shared_from}: {name}")
+            return SpriteResult(True, [])
+        if up_to_date:
+            print(f"Up to date: {name}")
+            return SpriteResult(True, [])
+
+        self.artifacts = []
+        return getattr(self, spec.process_method)(name)
+
+    def process_categories(self, categories: List[str], jobs: int = 1, banners: bool = False):
+        """Process one or more sprite categories, serially or on a process pool
+
+        Sprites that write to the same output location form one work unit, processed
+        in serial order so later sprites overwrite earlier ones exactly as before.
+        When the build cache is enabled, units whose inputs hash unchanged and whose
+        outputs still exist are skipped. In multi-ROM runs (shared_units set), units
+        whose inputs hash the same as one another ROM already rendered are not
+        rendered again; their manifest entries point at that ROM's files.
+
+        With jobs > 1, units from every category are scheduled together on one pool,
+        largest source sheets first, and each sprite's console output is captured and
+        replayed in serial order, so logs and outputs match a serial run byte for byte.
+        With pipeline_writers set (and one job), sprites still run in serial order but
+        their sheets are read ahead and their outputs written on background threads.
+        """
+        # Parse every palette up front so pool workers inherit the finished database
+        palette_db = self.palette_db
+        print(f"Palette database: {len(palette_db.palettes)} palettes "
+              f"({palette_db.parsed} parsed, {palette_db.reused} reused)")
+
+        plans = []
+        for category in categories:
+            spec = SPRITE_CATEGORIES[category]
+            plans.append((category, getattr(self, spec.list_method)()))
+
+        # Group sprites into work units by output location, keeping serial order inside a unit
+        units: Dict[Tuple[str, str], List[Tuple[int, int, str]]] = {}
+        unit_of: Dict[Tuple[str, str], Tuple[str, str]] = {}
+        for category, names in plans:
+            for i, name in enumerate(names, 1):
+                key = (category, self.get_output_key(category, name))
+                units.setdefault(key, []).append((i, len(names), name))
+                unit_of[(category, name)] = key
+
+        # Work out which units the build cache or another ROM's outputs let us skip
+        cache = self.build_cache
+        cache_keys: Dict[Tuple[str, str], str] = {}
+        fresh = set()
+        shared: Dict[Tuple[str, str], Tuple[str, str, List[SpriteArtifact]]] = {}
+        if cache is not None or self.shared_units is not None:
+            for key, entries in units.items():
+                cache_keys[key] = self.get_cache_key(key[0], [name for _, _, name in entries])
+                if self.shared_units is not None and cache_keys[key] in self.shared_units:
+                    shared[key] = self.shared_units[cache_keys[key]]
+                elif cache is not None and cache.is_fresh(f"{key[0]}/{key[1]}", cache_keys[key], self.output_path):
+                    fresh.add(key)
+
+        unit_results: Dict[Tuple[str, str], List[SpriteResult]] = {key: [] for key in units}
+
+        def record_result(category: str, name: str, result: SpriteResult):
+            key = unit_of[(category, name)]
+            unit_id = f"{key[0]}/{key[1]}"
+            unit_results[key].append(result)
+            if result.profile is not None:
+                self.profile_records.append(dict(result.profile, category=category, name=name))
+            if key in shared:
+                if len(unit_results[key]) == 1:
+                    _, url_prefix, artifacts = shared[key]
+                    for artifact in artifacts:
+                        self.share_output(artifact, url_prefix + artifact.path)
+                return
+            if cache is not None and key in fresh:
+                cache.hits += 1
+                if len(unit_results[key]) == 1:
+                    result.artifacts = cache.artifacts(unit_id)
+            elif cache is not None:
+                cache.misses += 1
+                # Only remember units that fully succeeded
+                results = unit_results[key]
+                if len(results) == len(units[key]) and all(results):
+                    cache.store(unit_id, cache_keys[key], [a for r in results for a in r.artifacts])
+            for artifact in result.artifacts:
+                self.run_artifacts[artifact.path] = artifact
+
+        def print_header(position: int, category: str, total: int):
+            spec = SPRITE_CATEGORIES[category]
+            if banners:
+                print(("\n" if position else "") + spec.banner)
+            print(f"Found {total} {spec.found_label} to process...")
+
+        def print_footer(category: str, processed: int, total: int):
+            spec = SPRITE_CATEGORIES[category]
+            print(f"\nCompleted! Processed {processed}/{total} {spec.done_label}")
+            print(f"Output directory: {getattr(self, spec.output_attr)}")
+
+        if jobs <= 1 and self.pipeline_writers > 0:
+            self._process_units_pipelined(plans, unit_of, fresh, shared,
+                                          record_result, print_header, print_footer)
+        elif jobs <= 1:
+            for position, (category, names) in enumerate(plans):
+                total = len(names)
+                processed = 0
+                print_header(position, category, total)
+                for i, name in enumerate(names, 1):
+                    key = unit_of[(category, name)]
+                    shared_from = shared[key][0] if key in shared else None
+                    result = self.process_entry(category, i, total, name, key in fresh, shared_from)
+                    record_result(category, name, result)
+                    if result:
+                        processed += 1
+                print_footer(category, processed, total)
+        else:
+            self._process_units_parallel(plans, units, fresh, shared, jobs,
+                                         record_result, print_header, print_footer)
+
+        if self.shared_units is not None:
+            # Offer every fully built unit to the ROMs processed after this one
+            url_prefix = self.output_path.relative_to(self.url_root).as_posix() + '/'
+            if url_prefix == './':
+                url_prefix = ''
+            for key, results in unit_results.items():
+                if key not in shared and len(results) == len(units[key]) and all(results):
+                    artifacts = [a for r in results for a in r.artifacts]
+                    self.shared_units.setdefault(cache_keys[key], (self.rom_path.name, url_prefix, artifacts))
+            print(f"\nShared outputs: {sum(len(units[key]) for key in shared)} sprites reused from other ROMs, "
+                  f"{len(self.shared_urls)} files not written")
+
+        self.deduplicate_outputs()
+
+        if cache is not None:
+            print(f"\nBuild cache: {cache.hits} up to date, {cache.misses} rebuilt")
+            cache.save()
+
+    def deduplicate_outputs(self):
+        """Group this run's outputs by content hash and share each set of identical files
+
+        Outputs are hashed before they are written, so with --dedup most duplicates
+        were never written: they became hardlinks to the first copy this process wrote.
+        What is left is copies written by different pool workers (or before an earlier
+        run's copy was seen); in 'hardlink' mode those are relinked here. In 'manifest'
+        mode the manifest also points every path of a group at its lexically first
+        file, so clients fetch and cache one file.
+        """
+        groups: Dict[str, List[SpriteArtifact]] = {}
+        for artifact in self.run_artifacts.values():
+            if artifact.path not in self.shared_urls:
+                groups.setdefault(artifact.digest, []).append(artifact)
+
+        files = sum(len(group) for group in groups.values())
+        duplicate_bytes = 0
+        not_written = sum(artifact.bytes for artifact in self.run_artifacts.values() if artifact.linked)
+        relinked = 0
+        for group in groups.values():
+            if len(group) < 2:
+                continue
+            group.sort(key=lambda artifact: artifact.path)
+            canonical = self.output_path / group[0].path
+            for artifact in group[1:]:
+                duplicate_bytes += artifact.bytes
+                if self.dedup_mode == 'manifest':
+                    self.dedup_urls[artifact.path] = self.get_output_url(canonical)
+                if self.dedup_mode != 'off':
+                    target = self.output_path / artifact.path
+                    with contextlib.suppress(OSError):
+                        if os.path.samefile(canonical, target):
+                            continue
+                    if self.link_output(canonical, target):
+                        relinked += artifact.bytes
+                    else:
+                        print(f"Warning: Could not hardlink {target} to {canonical}")
+
+        if files:
+            print(f"\nOutput store: {files} files, {len(groups)} unique "
+                  f"({files / len(groups):.2f}x dedup ratio), {duplicate_bytes} duplicate bytes, "
+                  f"{not_written} not written, {relinked} relinked afterwards ({self.dedup_mode})")
+
+    def _process_units_pipelined(self, plans, unit_of, fresh, shared, record_result, print_header, print_footer):
+        """Run sprites in serial order through a SpritePipeline, printing their logs in that order"""
+        skipped = fresh | set(shared)
+        order = [(category, name, unit_of[(category, name)] not in skipped)
+                 for category, names in plans for name in names]
+        pipeline = SpritePipeline(self, order, self.pipeline_depth, self.pipeline_writers)
+        processed = {category: 0 for category, _ in plans}
+        # Sprites whose writes may still be pending, and header/footer lines queued behind them
+        pending: collections.deque = collections.deque()
+
+        def flush(block: bool = False):
+            while pending:
+                entry = pending[0]
+                if callable(entry):
+                    entry()
+                else:
+                    category, name, result, log = entry
+                    if not block and not log.done():
+                        return
+                    artifacts, text = log.finish()
+                    print(text, end='')
+                    result.artifacts.extend(artifacts)
+                    record_result(category, name, result)
+                    processed[category] += bool(result)
+                pending.popleft()
+
+        self._pipeline = pipeline
+        try:
+            for position, (category, names) in enumerate(plans):
+                total = len(names)
+                pending.append(lambda position=position, category=category, total=total:
+                               print_header(position, category, total))
+                for i, name in enumerate(names, 1):
+                    key = unit_of[(category, name)]
+                    shared_from = shared[key][0] if key in shared else None
+                    log = SpriteLog()
+                    with pipeline.sprite(category, name, log), contextlib.redirect_stdout(log):
+                        result = self.process_entry(category, i, total, name, key in fresh, shared_from)
+                    pending.append((category, name, result, log))
+                    flush()
+                pending.append(lambda category=category, total=total:
+                               print_footer(category, processed[category], total))
+            flush(block=True)
+        finally:
+            self._pipeline = None
+            pipeline.close()
+        print(f"\n{pipeline.report()}")
+
+    def _process_units_parallel(self, plans, units, fresh, shared, jobs, record_result, print_header, print_footer):
+        """Run work units on a process pool and replay their logs in serial order"""
+        costs = {
+            key: sum(self.get_source_size(key[0], name) for _, _, name in entries)
+            for key, entries in units.items()
+        }
+        schedule = sorted((key for key in units if key not in fresh and key not in shared),
+                          key=lambda key: (-costs[key], key))
+
+        events = []
+        for position, (category, names) in enumerate(plans):
+            events.append(('header', position, category, None))
+            events.extend(('sprite', position, category, name) for name in names)
+            events.append(('footer', position, category, None))
+        finished: Dict[Tuple[str, str], Tuple[SpriteResult, str]] = {}
+        processed = {category: 0 for category, _ in plans}
+        cursor = 0
+
+        # Up-to-date and shared units need no worker, just their log lines
+        for key in fresh | set(shared):
+            shared_from = shared[key][0] if key in shared else None
+            for index, total, name in units[key]:
+                log = io.StringIO()
+                with contextlib.redirect_stdout(log):
+                    result = self.process_entry(key[0], index, total, name, key in fresh, shared_from)
+                finished[(key[0], name)] = (result, log.getvalue())
+
+        def flush():
+            nonlocal cursor
+            while cursor < len(events):
+                kind, position, category, name = events[cursor]
+                total = len(plans[position][1])
+                if kind == 'header':
+                    print_header(position, category, total)
+                elif kind == 'footer':
+                    print_footer(category, processed[category], total)
+                elif (category, name) in finished:
+                    result, log = finished.pop((category, name))
+                    print(log, end='')
+                    record_result(category, name, result)
+                    processed[category] += bool(result)
+                else:
+                    return
+                cursor += 1
 
-        return True
+        flush()
+        if not schedule:
+            return
 
-    def process_all_pokemon(self):
-        """Process all Pokemon sprites"""
-        pokemon_list = self.get_pokemon_list()
-        total = len(pokemon_list)
-        processed = 0
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(self,)) as pool:
+            futures = {pool.submit(_run_work_unit, key[0], units[key]): key for key in schedule}
+            for future in as_completed(futures):
+                category = futures[future][0]
+                for name, result, log in future.result():
+                    finished[(category, name)] = (result, log)
+                flush()
 
-        print(f"Found {total} Pokemon to process...")
+    def process_all_pokemon(self, jobs: int = 1):
+        """Process all Pokemon sprites"""
+        self.process_categories(['pokemon'], jobs)
 
-        for i, pokemon_name in enumerate(pokemon_list, 1):
-            print(f"[{i}/{total}] Processing {pokemon_name}")
-            if self.process_pokemon(pokemon_name):
-                processed += 1
+    def get_sprite_size(self, sprite_file: Path) -> Tuple[int, int]:
+        """Dimensions of an output image, from this run's records or else from disk"""
+        artifact = self.run_artifacts.get(sprite_file.relative_to(self.output_path).as_posix())
+        if artifact is not None:
+            self.manifest_sources['recorded'] += 1
+            return artifact.width, artifact.height
 
-        print(f"\nCompleted! Processed {processed}/{total} Pokemon sprites")
-        print(f"Output directory: {self.sprites_dir}")
+        self.manifest_sources['disk'] += 1
+        with Image.open(sprite_file) as img:
+            return img.size
 
     def create_sprite_manifest(self):
         """Create a JSON manifest of all processed sprites with dimensions"""
         pokemon_manifest = {}
 
-        for pokemon_dir in self.sprites_dir.iterdir():
-            if pokemon_dir.is_dir():
-                pokemon_name = pokemon_dir.name
-                pokemon_data = {
-                    "normal_front": None,
-                    "shiny_front": None,
-                    "normal_front_animated": None,
-                    "shiny_front_animated": None,
-                    "normal_back": None,
-                    "shiny_back": None,
-                    # Note: Back sprites don't have animation frames in GBC Pokemon games
-                }
-
-                # Find all sprite files and get their dimensions
-                for sprite_file in pokemon_dir.iterdir():
-                    if sprite_file.suffix in ['.png', '.gif']:
-                        rel_path = f"sprites/pokemon/{pokemon_name}/{sprite_file.name}"
-
-                        # Get image dimensions
-                        try:
-                            with Image.open(sprite_file) as img:
-                                width, height = img.size
-                                sprite_info = {
-                                    "url": rel_path,
-                                    "width": width,
-                                    "height": height
-                                }
-                        except Exception as e:
-                            print(f"Warning: Could not read dimensions for {sprite_file}: {e}")
-                            sprite_info = {
-                                "url": rel_path,
-                                "width": 64,  # fallback dimensions
-                                "height": 64
-                            }
-
-                        # Map file names to manifest keys
-                        if sprite_file.name == "normal_front.png":
-                            pokemon_data["normal_front"] = sprite_info
-                        elif sprite_file.name == "shiny_front.png":
-                            pokemon_data["shiny_front"] = sprite_info
-                        elif sprite_file.name == "normal_front_animated.gif":
-                            pokemon_data["normal_front_animated"] = sprite_info
-                        elif sprite_file.name == "shiny_front_animated.gif":
-                            pokemon_data["shiny_front_animated"] = sprite_info
-                        elif sprite_file.name == "normal_back.png":
-                            pokemon_data["normal_back"] = sprite_info
-                        elif sprite_file.name == "shiny_back.png":
-                            pokemon_data["shiny_back"] = sprite_info
+        for pokemon_dir in self.list_outputs(self.sprites_dir):
+            if self.is_output_dir(pokemon_dir):
+                pokemon_data = self.get_pokemon_manifest_entry(pokemon_dir)
 
                 # Only add Pokemon that have at least normal front sprite
                 if pokemon_data["normal_front"]:
-                    pokemon_manifest[pokemon_name] = pokemon_data
+                    pokemon_manifest[pokemon_dir.name] = pokemon_data
 
         return pokemon_manifest
 
+    def get_pokemon_manifest_entry(self, pokemon_dir: Path) -> Dict:
+        """Manifest entry for one Pokemon output directory"""
+        pokemon_data = {
+            "normal_front": None,
+            "shiny_front": None,
+            "normal_front_animated": None,
+            "shiny_front_animated": None,
+            "normal_back": None,
+            "shiny_back": None,
+            # Note: Back sprites don't have animation frames in GBC Pokemon games
+        }
+
+        # Find all sprite files and get their dimensions
+        for sprite_file in self.list_outputs(pokemon_dir):
+            if sprite_file.suffix in ['.png', '.gif']:
+                rel_path = self.get_output_url(sprite_file)
+
+                # Get image dimensions
+                try:
+                    width, height = self.get_sprite_size(sprite_file)
+                    sprite_info = {
+                        "url": rel_path,
+                        "width": width,
+                        "height": height
+                    }
+                except Exception as e:
+                    print(f"Warning: Could not read dimensions for {sprite_file}: {e}")
+                    sprite_info = {
+                        "url": rel_path,
+                        "width": 64,  # fallback dimensions
+                        "height": 64
+                    }
+
+                # Map file names to manifest keys
+                if sprite_file.name == "normal_front.png":
+                    pokemon_data["normal_front"] = sprite_info
+                elif sprite_file.name == "shiny_front.png":
+                    pokemon_data["shiny_front"] = sprite_info
+                elif sprite_file.name == "normal_front_animated.gif":
+                    pokemon_data["normal_front_animated"] = sprite_info
+                    self.add_animation_formats(sprite_info, sprite_file)
+                elif sprite_file.name == "shiny_front_animated.gif":
+                    pokemon_data["shiny_front_animated"] = sprite_info
+                    self.add_animation_formats(sprite_info, sprite_file)
+                elif sprite_file.name == "normal_back.png":
+                    pokemon_data["normal_back"] = sprite_info
+                elif sprite_file.name == "shiny_back.png":
+                    pokemon_data["shiny_back"] = sprite_info
+
+        return pokemon_data
+
     def get_trainer_list(self) -> List[str]:
         """Get list of all trainer PNG files"""
-        trainer_pngs = []
-        if self.trainer_dir.exists():
-            for item in self.trainer_dir.iterdir():
-                if item.is_file() and item.suffix == '.png':
-                    trainer_name = item.stem
-                    trainer_pngs.append(trainer_name)
-        return sorted(trainer_pngs)
+        return list(self.assets.stems(self.trainer_dir, '.png'))
 
     def get_trainer_palettes(self, trainer_name: str) -> List[str]:
         """Get all palette files for a trainer"""
-        palettes = []
-
-        # Look for exact match first
-        exact_pal = self.trainer_dir / f"{trainer_name}.pal"
-        if exact_pal.exists():
-            palettes.append(trainer_name)
-
-        # Look for numbered variants (e.g., kimono_girl_1.pal, kimono_girl_2.pal, etc.)
-        for item in self.trainer_dir.iterdir():
-            if item.is_file() and item.suffix == '.pal':
-                if item.stem.startswith(f"{trainer_name}_") and item.stem != trainer_name:
-                    # Extract the variant (e.g., "1" from "kimono_girl_1")
-                    variant = item.stem.replace(f"{trainer_name}_", "")
-                    palettes.append(f"{trainer_name}_{variant}")
-
-        return sorted(palettes)
+        # The exact match plus numbered variants (e.g., kimono_girl_1.pal, kimono_girl_2.pal, etc.)
+        return self.assets.variants(self.trainer_dir, trainer_name, '.pal')
 
-    def process_trainer(self, trainer_name: str) -> bool:
+    def process_trainer(self, trainer_name: str) -> SpriteResult:
         """Process a single trainer's sprite with all palette variants"""
+        timer = self.begin_sprite()
         trainer_png = self.trainer_dir / f"{trainer_name}.png"
-        if not trainer_png.exists():
+        if not self.assets.exists(trainer_png):
             print(f"Trainer PNG not found: {trainer_name}")
-            return False
+            return self._finish(False)
 
         # Normalize output name
         output_name = reduce_name(trainer_name)
@@ -666,28 +2714,28 @@ class GBCSpriteProcessor:
 
         if not palettes:
             print(f"No palette files found for {trainer_name}")
-            return False
+            return self._finish(False)
 
-        # Extract frames from sprite sheet (trainers are typically single frame)
-        raw_frames = self.extract_sprite_frames(str(trainer_png))
-        if not raw_frames:
+        # Decode the sheet to shade maps once (trainers are typically single frame)
+        with timer.stage('decode'):
+            shade_frames = self.extract_shade_frames(str(trainer_png))
+        if not shade_frames:
             print(f"Could not extract frames from {trainer_name}")
-            return False
+            return self._finish(False)
 
-        # Process each palette variant
+        # Process each palette variant as a palette swap over the same shade map
         for palette_name in palettes:
             palette_file = self.trainer_dir / f"{palette_name}.pal"
-            if not palette_file.exists():
+            palette = self.palette_db.get(palette_file)
+            if palette is None:
                 print(f"Palette file not found: {palette_file}")
                 continue
 
-            palette = GBCPaletteParser.parse_palette_file(str(palette_file))
-
-            # Apply palette and transparency to each frame
-            processed_frames = []
-            for frame in raw_frames:
-                processed_frame = self.apply_palette_to_sprite(frame, palette)
-                processed_frames.append(processed_frame)
+            # Only the first frame is saved, so only it is rendered
+            with timer.stage('render'):
+                processed_frames = [
+                    GBCPaletteEngine.render(shade_frames[0], GBCPaletteEngine.sprite_slots(palette))
+                ]
 
             # Determine output filename with normalized names
             if palette_name == trainer_name:
@@ -701,82 +2749,73 @@ class GBCSpriteProcessor:
             # Save static PNG (first frame)
             if processed_frames:
                 static_path = output_dir / output_filename
-                processed_frames[0].save(static_path)
+                with timer.stage('encode'):
+                    self.save_static_sprite(processed_frames[0], static_path)
                 print(f"Saved trainer sprite: {static_path}")
 
-        return True
-
-    def process_all_trainers(self):
-        """Process all trainer sprites"""
-        trainer_list = self.get_trainer_list()
-        total = len(trainer_list)
-        processed = 0
+        if self.show_timings:
+            print(f"Timing {trainer_name}: {timer.summary()}")
 
-        print(f"Found {total} trainers to process...")
+        return self._finish(True)
 
-        for i, trainer_name in enumerate(trainer_list, 1):
-            print(f"[{i}/{total}] Processing trainer {trainer_name}")
-            if self.process_trainer(trainer_name):
-                processed += 1
-
-        print(f"\nCompleted! Processed {processed}/{total} trainer sprites")
-        print(f"Output directory: {self.trainer_sprites_dir}")
+    def process_all_trainers(self, jobs: int = 1):
+        """Process all trainer sprites"""
+        self.process_categories(['trainers'], jobs)
 
     def create_trainer_manifest(self):
         """Create a JSON manifest of all processed trainer sprites with dimensions"""
         trainer_manifest = {}
 
-        for trainer_dir in self.trainer_sprites_dir.iterdir():
-            if trainer_dir.is_dir():
-                trainer_name = trainer_dir.name
-                trainer_data = {}
-
-                # Find all PNG files for this trainer
-                for sprite_file in trainer_dir.iterdir():
-                    if sprite_file.suffix == '.png':
-                        # Get image dimensions
-                        try:
-                            with Image.open(sprite_file) as img:
-                                width, height = img.size
-                                sprite_info = {
-                                    "url": f"sprites/trainers/{trainer_name}/{sprite_file.name}",
-                                    "width": width,
-                                    "height": height
-                                }
-                        except Exception as e:
-                            print(f"Warning: Could not read dimensions for {sprite_file}: {e}")
-                            sprite_info = {
-                                "url": f"sprites/trainers/{trainer_name}/{sprite_file.name}",
-                                "width": 64,  # fallback dimensions
-                                "height": 64
-                            }
-
-                        # Use filename without extension as key
-                        variant_key = sprite_file.stem
-                        trainer_data[variant_key] = sprite_info
+        for trainer_dir in self.list_outputs(self.trainer_sprites_dir):
+            if self.is_output_dir(trainer_dir):
+                trainer_data = self.get_trainer_manifest_entry(trainer_dir)
 
                 # Only add trainers that have at least one sprite
                 if trainer_data:
-                    trainer_manifest[trainer_name] = trainer_data
+                    trainer_manifest[trainer_dir.name] = trainer_data
 
         return trainer_manifest
 
+    def get_trainer_manifest_entry(self, trainer_dir: Path) -> Dict:
+        """Manifest entry for one trainer output directory, keyed by palette variant"""
+        trainer_data = {}
+
+        # Find all PNG files for this trainer
+        for sprite_file in self.list_outputs(trainer_dir):
+            if sprite_file.suffix == '.png':
+                # Get image dimensions
+                try:
+                    width, height = self.get_sprite_size(sprite_file)
+                    sprite_info = {
+                        "url": self.get_output_url(sprite_file),
+                        "width": width,
+                        "height": height
+                    }
+                except Exception as e:
+                    print(f"Warning: Could not read dimensions for {sprite_file}: {e}")
+                    sprite_info = {
+                        "url": self.get_output_url(sprite_file),
+                        "width": 64,  # fallback dimensions
+                        "height": 64
+                    }
+
+                # Use filename without extension as key
+                variant_key = sprite_file.stem
+                trainer_data[variant_key] = sprite_info
+
+        return trainer_data
+
     def get_item_list(self) -> List[str]:
         """Get list of all item PNG files"""
-        item_pngs = []
-        if self.items_dir.exists():
-            for item in self.items_dir.iterdir():
-                if item.is_file() and item.suffix == '.png':
-                    item_name = item.stem
-                    item_pngs.append(item_name)
-        return sorted(item_pngs)
-
-    def process_item(self, item_name: str) -> bool:
+        return list(self.assets.stems(self.items_dir, '.png'))
+
+    def process_item(self, item_name: str) -> SpriteResult:
         """Process a single item's sprite as monochrome"""
+        timer = self.begin_sprite()
         item_png = self.items_dir / f"{item_name}.png"
-        if not item_png.exists():
+        if not self.assets.exists(item_png):
             print(f"Item PNG not found: {item_name}")
-            return False
+            return self._finish(False)
 
         # Normalize output name
         output_name = reduce_name(item_name)
@@ -789,74 +2828,68 @@ class GBCSpriteProcessor:
         print(f"Using monochrome palette for {item_name}")
 
         # Extract frames from sprite sheet (items are typically single frame)
-        raw_frames = self.extract_sprite_frames(str(item_png))
+        with timer.stage('decode'):
+            raw_frames = self.extract_sprite_frames(str(item_png))
         if not raw_frames:
             print(f"Could not extract frames from {item_name}")
-            return False
+            return self._finish(False)
 
         # Apply palette and transparency to each frame
         processed_frames = []
-        for frame in raw_frames:
-            processed_frame = self.apply_palette_to_sprite(frame, palette)
-            processed_frames.append(processed_frame)
+        with timer.stage('render'):
+            for frame in raw_frames:
+                processed_frame = self.apply_palette_to_sprite(frame, palette)
+                processed_frames.append(processed_frame)
 
         # Save static PNG (first frame) directly in items directory with normalized name
         if processed_frames:
             static_path = self.item_sprites_dir / f"{output_name}.png"
-            processed_frames[0].save(static_path)
+            with timer.stage('encode'):
+                self.save_static_sprite(processed_frames[0], static_path)
             print(f"Saved item sprite: {static_path}")
 
-        return True
+        return self._finish(True)
 
-    def process_all_items(self):
+    def process_all_items(self, jobs: int = 1):
         """Process all item sprites"""
-        item_list = self.get_item_list()
-        total = len(item_list)
-        processed = 0
-
-        print(f"Found {total} items to process...")
-
-        for i, item_name in enumerate(item_list, 1):
-            print(f"[{i}/{total}] Processing item {item_name}")
-            if self.process_item(item_name):
-                processed += 1
-
-        print(f"\nCompleted! Processed {processed}/{total} item sprites")
-        print(f"Output directory: {self.item_sprites_dir}")
+        self.process_categories(['items'], jobs)
 
     def create_item_manifest(self):
         """Create a JSON manifest of all processed item sprites with dimensions"""
         item_manifest = {}
 
         # Items are stored directly in the items directory, not in subdirectories
-        for sprite_file in self.item_sprites_dir.iterdir():
-            if sprite_file.is_file() and sprite_file.suffix == '.png':
-                item_name = sprite_file.stem
-
-                # Get image dimensions
-                try:
-                    with Image.open(sprite_file) as img:
-                        width, height = img.size
-                        sprite_info = {
-                            "url": f"sprites/items/{sprite_file.name}",
-                            "width": width,
-                            "height": height
-                        }
-                except Exception as e:
-                    print(f"Warning: Could not read dimensions for {sprite_file}: {e}")
-                    sprite_info = {
-                        "url": f"sprites/items/{sprite_file.name}",
-                        "width": 32,  # fallback dimensions for items (typically smaller)
-                        "height": 32
-                    }
-
-                # Use simple naming scheme for items
-                item_manifest[item_name] = {
-                    "icon": sprite_info
-                }
+        for sprite_file in self.list_outputs(self.item_sprites_dir):
+            if self.is_output_file(sprite_file) and sprite_file.suffix == '.png':
+                item_manifest[sprite_file.stem] = self.get_item_manifest_entry(sprite_file)
 
         return item_manifest
 
+    def get_item_manifest_entry(self, sprite_file: Path) -> Dict:
+        """Manifest entry for one item output file"""
+        # Get image dimensions
+        try:
+            width, height = self.get_sprite_size(sprite_file)
+            sprite_info = {
+                "url": self.get_output_url(sprite_file),
+                "width": width,
+                "height": height
+            }
+        except Exception as e:
+            print(f"Warning: Could not read dimensions for {sprite_file}: {e}")
+            sprite_info = {
+                "url": self.get_output_url(sprite_file),
+                "width": 32,  # fallback dimensions for items (typically smaller)
+                "height": 32
+            }
+
+        self.add_atlas_fields(sprite_info, sprite_file)
+
+        # Use simple naming scheme for items
+        return {
+            "icon": sprite_info
+        }
+
     def get_item_category(self, item_name: str) -> str:
         """Categorize items based on their name for palette selection"""
         item_lower = item_name.lower()
@@ -927,127 +2960,57 @@ class GBCSpriteProcessor:
             print(f"Warning: Sprite and mask size mismatch - sprite: {sprite.size}, mask: {mask.size}")
             mask = mask.resize(sprite.size, Image.NEAREST)
 
-        # Convert sprite to RGBA if not already
-        if sprite.mode != 'RGBA':
-            sprite = sprite.convert('RGBA')
-
-        # Convert mask to grayscale
-        mask_gray = mask.convert('L')
-
-        # Create new RGBA image with transparency applied
-        masked_sprite = Image.new('RGBA', sprite.size, (0, 0, 0, 0))
-        sprite_pixels = sprite.load()
-        mask_pixels = mask_gray.load()
-        result_pixels = masked_sprite.load()
-
-        for y in range(sprite.size[1]):
-            for x in range(sprite.size[0]):
-                # For Game Boy masks: dark/black areas in mask = opaque, light/white = transparent
-                # This is opposite of what I initially implemented
-                mask_value = mask_pixels[x, y]
-                if mask_value < 128:  # Dark areas in mask = visible sprite pixels
-                    result_pixels[x, y] = sprite_pixels[x, y]
-                # Light areas in mask = transparent (already initialized to (0,0,0,0))
-
-        return masked_sprite
+        # For Game Boy masks: dark/black areas in mask = opaque, light/white = transparent
+        return GBCPaletteEngine.apply_mask(sprite, mask)
 
     def apply_palette_to_mini_sprite(self, sprite: Image.Image, palette: List[Tuple[int, int, int]]) -> Image.Image:
         """Apply GBC palette to mini sprite - different logic than main sprites"""
-        # Convert to grayscale first to map palette indices
-        gray_sprite = sprite.convert('L')
-
-        # Extend palette to 4 colors if needed (GBC standard)
-        while len(palette) < 4:
-            palette.append((255, 255, 255))  # Add white as default
-
-        # Create RGBA image - for mini sprites, don't make anything transparent yet
-        rgba_sprite = Image.new('RGBA', sprite.size, (0, 0, 0, 0))
-        pixels = rgba_sprite.load()
-        gray_pixels = gray_sprite.load()
-
-        for y in range(sprite.size[1]):
-            for x in range(sprite.size[0]):
-                gray_value = gray_pixels[x, y]
-
-                # Map grayscale values to palette indices for mini sprites
-                # Use all 4 palette colors, don't make any transparent automatically
-                if gray_value >= 192:    # Lightest -> palette[0]
-                    r, g, b = palette[0] if len(palette) > 0 else (255, 255, 255)
-                    pixels[x, y] = (r, g, b, 255)
-                elif gray_value >= 128:  # Light gray -> palette[1]
-                    r, g, b = palette[1] if len(palette) > 1 else (200, 200, 200)
-                    pixels[x, y] = (r, g, b, 255)
-                elif gray_value >= 64:   # Dark gray -> palette[2]
-                    r, g, b = palette[2] if len(palette) > 2 else (100, 100, 100)
-                    pixels[x, y] = (r, g, b, 255)
-                else:                    # Darkest -> palette[3]
-                    r, g, b = palette[3] if len(palette) > 3 else (0, 0, 0)
-                    pixels[x, y] = (r, g, b, 255)
-
-        return rgba_sprite
+        # Use all 4 palette colors, don't make any transparent automatically
+        return GBCPaletteEngine.colorize(
+            sprite, GBCPaletteEngine.MINI_THRESHOLDS, GBCPaletteEngine.mini_slots(palette)
+        )
 
     def get_mini_list(self) -> List[str]:
         """Get list of all mini sprite base names (without _mask suffix)"""
-        mini_sprites = set()
-        if self.minis_dir.exists():
-            for item in self.minis_dir.iterdir():
-                if item.is_file() and item.suffix == '.png' and not item.name.endswith('_mask.png'):
-                    # Extract base name (remove .png extension)
-                    base_name = item.stem
-                    mini_sprites.add(base_name)
-        return sorted(list(mini_sprites))
-
-    def process_mini(self, mini_name: str) -> bool:
+        return [stem for stem in self.assets.stems(self.minis_dir, '.png') if not stem.endswith('_mask')]
+
+    def process_mini(self, mini_name: str) -> SpriteResult:
         """Process a single mini sprite with its mask for transparency - create both static and animated versions"""
+        timer = self.begin_sprite()
         mini_png = self.minis_dir / f"{mini_name}.png"
         mask_png = self.minis_dir / f"{mini_name}_mask.png"
 
-        if not mini_png.exists():
+        if not self.assets.exists(mini_png):
             print(f"Mini sprite not found: {mini_name}")
-            return False
+            return self._finish(False)
 
         # Normalize output name
         output_name = reduce_name(mini_name)
         print(f"Processing mini sprite {mini_name} -> {output_name}...")
 
         try:
-            # Load the sprite image
-            sprite_img = Image.open(mini_png).convert('RGBA')
-
-            # Get appropriate palette based on Pokemon name
-            palette = self.get_mini_palette(mini_name)
+            # Decode the sheet and its mask once; every frame is cut from them
+            with timer.stage('decode'):
+                sprite_img = self.open_sheet(mini_png).convert('L')
+                mask_img = None
+                if self.assets.exists(mask_png):
+                    mask_img = self.open_sheet(mask_png).convert('L')
 
-            # Extract frames from the sprite sheet (mini sprites may have multiple frames)
-            raw_frames = self.extract_sprite_frames_for_mini(sprite_img)
+                # Get appropriate palette based on Pokemon name
+                palette = self.get_mini_palette(mini_name)
 
-            # Process each frame
-            processed_frames = []
-            for frame in raw_frames:
-                # Apply colorization using mini-specific palette logic
-                colored_frame = self.apply_palette_to_mini_sprite(frame, palette)
-
-                # Apply mask if available
-                if mask_png.exists():
-                    mask_img = Image.open(mask_png)
-                    # For multi-frame sprites, we may need to extract corresponding mask frames
-                    mask_frames = self.extract_sprite_frames_for_mini(mask_img)
-                    if len(mask_frames) == len(raw_frames):
-                        # Use corresponding mask frame
-                        frame_idx = raw_frames.index(frame)
-                        final_frame = self.apply_mask_to_sprite(colored_frame, mask_frames[frame_idx])
-                    else:
-                        # Use first mask frame for all sprite frames
-                        final_frame = self.apply_mask_to_sprite(colored_frame, mask_frames[0])
-                else:
-                    print(f"Warning: No mask found for {mini_name}, using sprite as-is")
-                    final_frame = colored_frame
+            if mask_img is None:
+                print(f"Warning: No mask found for {mini_name}, using sprite as-is")
 
-                processed_frames.append(final_frame)
+            # Colour the whole frame stack in one render, with the mask as its alpha
+            with timer.stage('render'):
+                processed_frames = self.render_mini_frames(sprite_img, mask_img, palette)
 
             # Save static PNG (first frame) with normalized name
             if processed_frames:
                 static_path = self.minis_sprites_dir / f"{output_name}.png"
-                processed_frames[0].save(static_path)
+                with timer.stage('encode'):
+                    self.save_static_sprite(processed_frames[0], static_path)
                 print(f"Saved static mini sprite: {static_path}")
 
                 # Create animated GIF if there are multiple frames
@@ -1057,48 +3020,75 @@ class GBCSpriteProcessor:
                     durations = [800] * len(processed_frames)  # 800ms per frame for smooth overworld animation
 
                     gif_path = self.minis_sprites_dir / f"{output_name}_animated.gif"
-                    self.create_animated_gif(processed_frames, durations, str(gif_path))
+                    with timer.stage('encode'):
+                        self.create_animation(processed_frames, durations, gif_path)
                 else:
                     # For single frame sprites, create a simple "breathing" animation
-                    self.create_breathing_animation(processed_frames[0], output_name)
+                    with timer.stage('encode'):
+                        self.create_breathing_animation(processed_frames[0], output_name)
 
-            return True
+            return self._finish(True)
 
         except Exception as e:
             print(f"Error processing mini sprite {mini_name}: {e}")
-            return False
+            return self._finish(False)
 
-            return True
+    def get_mini_frame_boxes(self, size: Tuple[int, int]) -> List[Tuple[int, int, int, int]]:
+        """Crop boxes of the frames in a mini sheet - they're typically 16x16 or 16x32"""
+        width, height = size
 
-        except Exception as e:
-            print(f"Error processing mini sprite {mini_name}: {e}")
-            return False
+        # Most mini sprites are 16 pixels wide, taller sheets stack 16x16 frames
+        if width == 16 and height > width:
+            return [(0, top, width, top + 16) for top in range(0, height - 15, 16)]
+
+        # Single frame or non-standard size, treat as single frame
+        return [(0, 0, width, height)]
 
     def extract_sprite_frames_for_mini(self, sprite: Image.Image) -> List[Image.Image]:
         """Extract frames from mini sprite - they're typically 16x16 or 16x32"""
-        width, height = sprite.size
-
-        # Most mini sprites are 16 pixels wide
-        if width == 16:
-            # Check if it's a multi-frame sprite (height > width)
-            if height > width:
-                frame_height = 16  # Standard mini sprite frame height
-                frames = []
-                num_frames = height // frame_height
-
-                for i in range(num_frames):
-                    top = i * frame_height
-                    bottom = min(top + frame_height, height)
-                    frame = sprite.crop((0, top, width, bottom))
-                    frames.append(frame)
-
-                return frames if frames else [sprite]
-            else:
-                # Single frame sprite
-                return [sprite]
-        else:
-            # Non-standard size, treat as single frame
+        boxes = self.get_mini_frame_boxes(sprite.size)
+        if boxes == [(0, 0, sprite.width, sprite.height)]:
             return [sprite]
+        return [sprite.crop(box) for box in boxes]
+
+    def stack_mini_mask(self, mask: Image.Image, boxes: List[Tuple[int, int, int, int]]) -> Image.Image:
+        """Line a mask sheet's frames up with the sprite frames at the given boxes"""
+        mask = mask if mask.mode == 'L' else mask.convert('L')
+        mask_boxes = self.get_mini_frame_boxes(mask.size)
+        if len(mask_boxes) != len(boxes):
+            # Use first mask frame for all sprite frames
+            mask_boxes = [mask_boxes[0]] * len(boxes)
+        if mask_boxes == boxes:
+            return mask.crop((0, 0, mask.width, boxes[-1][3]))
+
+        stack = Image.new('L', (boxes[0][2], boxes[-1][3]))
+        for box, mask_box in zip(boxes, mask_boxes):
+            frame = mask.crop(mask_box)
+            size = (box[2] - box[0], box[3] - box[1])
+            if frame.size != size:
+                print(f"Warning: Sprite and mask size mismatch - sprite: {size}, mask: {frame.size}")
+                frame = frame.resize(size, Image.NEAREST)
+            stack.paste(frame, box[:2])
+        return stack
+
+    def render_mini_frames(self, sprite: Image.Image, mask: Optional[Image.Image],
+                           palette: List[Tuple[int, int, int]]) -> List[Image.Image]:
+        """Colour all frames of a mini sheet together, then cut them apart
+
+        The frames stay stacked as they are in the sheet, so thresholding, colouring
+        and masking are one operation each over the whole stack instead of per frame.
+        Without a mask the frames are fully opaque.
+        """
+        boxes = self.get_mini_frame_boxes(sprite.size)
+        stack = sprite.crop((0, 0, sprite.width, boxes[-1][3]))
+        shade_stack = GBCPaletteEngine.to_shade_map(stack, GBCPaletteEngine.MINI_THRESHOLDS)
+        slot_colors = GBCPaletteEngine.mini_slots(palette)
+        if mask is None:
+            colored = GBCPaletteEngine.render(shade_stack, slot_colors)
+        else:
+            # For Game Boy masks: dark/black areas in mask = opaque, light/white = transparent
+            colored = GBCPaletteEngine.render_masked(shade_stack, self.stack_mini_mask(mask, boxes), slot_colors)
+        return [colored.crop(box) for box in boxes]
 
     def create_breathing_animation(self, static_frame: Image.Image, mini_name: str):
         """Create a subtle breathing animation for single-frame mini sprites"""
@@ -1110,13 +3100,25 @@ class GBCSpriteProcessor:
             durations = [1500, 1500]  # 1.5 seconds per frame for very slow breathing
 
             gif_path = self.minis_sprites_dir / f"{mini_name}_animated.gif"
-            self.create_animated_gif(frames, durations, str(gif_path))
+            self.create_animation(frames, durations, gif_path)
 
         except Exception as e:
             print(f"Warning: Could not create breathing animation for {mini_name}: {e}")
 
-    def get_mini_palette(self, mini_name: str) -> List[Tuple[int, int, int]]:
-        """Get appropriate color palette for mini sprites based on Pokemon type/characteristics"""
+    def resolve_mini_palette(self, pokemon_name: str) -> Path:
+        """Find the normal.pal a mini sprite borrows from its Pokemon (may not exist)"""
+        palette_dir = self.pokemon_dir / pokemon_name
+        if pokemon_name in self.palette_directory_mapping:
+            palette_dir = self.pokemon_dir / self.palette_directory_mapping[pokemon_name]
+        return palette_dir / "normal.pal"
+
+    def get_mini_pokemon_name(self, mini_name: str) -> Optional[str]:
+        """Pokemon whose palette a mini sprite borrows, or None for minis with a fixed palette"""
+        entry = self.name_index.minis.get(mini_name)
+        return entry['pokemon'] if entry is not None else self.derive_mini_pokemon_name(mini_name)
+
+    def derive_mini_pokemon_name(self, mini_name: str) -> Optional[str]:
+        """Strip a mini's form suffix to find its Pokemon (see get_mini_pokemon_name)"""
         mini_lower = mini_name.lower()
 
         # Try to find corresponding Pokemon palette from main sprites
@@ -1145,16 +3147,20 @@ class GBCSpriteProcessor:
         elif '_water' in mini_lower:
             pokemon_name = mini_name.replace('_water', '')
         elif mini_name == 'egg':
+            return None
+
+        return pokemon_name
+
+    def get_mini_palette(self, mini_name: str) -> List[Tuple[int, int, int]]:
+        """Get appropriate color palette for mini sprites based on Pokemon type/characteristics"""
+        pokemon_name = self.get_mini_pokemon_name(mini_name)
+        if pokemon_name is None:
             return [(255, 255, 240), (240, 200, 160), (200, 150, 100), (150, 100, 60)]  # Cream/beige
 
         # Check if we have a palette file for this Pokemon
-        palette_dir = self.pokemon_dir / pokemon_name
-        if pokemon_name in self.palette_directory_mapping:
-            palette_dir = self.pokemon_dir / self.palette_directory_mapping[pokemon_name]
-
-        normal_pal = palette_dir / "normal.pal"
-        if normal_pal.exists():
-            return GBCPaletteParser.parse_palette_file(str(normal_pal))
+        palette = self.palette_db.get(self.resolve_mini_palette(pokemon_name))
+        if palette is not None:
+            return palette
 
         # Fallback to type-based coloring for minis
         return self.get_type_based_palette(mini_name)
@@ -1182,21 +3188,9 @@ class GBCSpriteProcessor:
             # Default neutral palette for unknown types
             return [(240, 240, 240), (180, 180, 180), (120, 120, 120), (80, 80, 80)]  # Normal - Gray
 
-    def process_all_minis(self):
+    def process_all_minis(self, jobs: int = 1):
         """Process all mini sprites with masking"""
-        mini_list = self.get_mini_list()
-        total = len(mini_list)
-        processed = 0
-
-        print(f"Found {total} mini sprites to process...")
-
-        for i, mini_name in enumerate(mini_list, 1):
-            print(f"[{i}/{total}] Processing mini {mini_name}")
-            if self.process_mini(mini_name):
-                processed += 1
-
-        print(f"\nCompleted! Processed {processed}/{total} mini sprites")
-        print(f"Output directory: {self.minis_sprites_dir}")
+        self.process_categories(['minis'], jobs)
 
     def create_mini_manifest(self):
         """Create a JSON manifest of all processed mini sprites with dimensions - includes both static and animated versions"""
@@ -1204,53 +3198,15 @@ class GBCSpriteProcessor:
 
         # Get unique mini names (without file extensions)
         mini_names = set()
-        for sprite_file in self.minis_sprites_dir.iterdir():
-            if sprite_file.is_file() and sprite_file.suffix in ['.png', '.gif']:
+        for sprite_file in self.list_outputs(self.minis_sprites_dir):
+            if self.is_output_file(sprite_file) and sprite_file.suffix in ['.png', '.gif']:
                 # Remove _animated suffix if present to get base name
                 base_name = sprite_file.stem.replace('_animated', '')
                 mini_names.add(base_name)
 
         # Process each mini sprite
         for mini_name in sorted(mini_names):
-            mini_data = {}
-
-            # Check for static PNG
-            static_file = self.minis_sprites_dir / f"{mini_name}.png"
-            if static_file.exists():
-                try:
-                    with Image.open(static_file) as img:
-                        width, height = img.size
-                        mini_data["overworld"] = {
-                            "url": f"sprites/minis/{static_file.name}",
-                            "width": width,
-                            "height": height
-                        }
-                except Exception as e:
-                    print(f"Warning: Could not read dimensions for {static_file}: {e}")
-                    mini_data["overworld"] = {
-                        "url": f"sprites/minis/{static_file.name}",
-                        "width": 16,  # fallback dimensions
-                        "height": 16
-                    }
-
-            # Check for animated GIF
-            animated_file = self.minis_sprites_dir / f"{mini_name}_animated.gif"
-            if animated_file.exists():
-                try:
-                    with Image.open(animated_file) as img:
-                        width, height = img.size
-                        mini_data["overworld_animated"] = {
-                            "url": f"sprites/minis/{animated_file.name}",
-                            "width": width,
-                            "height": height
-                        }
-                except Exception as e:
-                    print(f"Warning: Could not read dimensions for {animated_file}: {e}")
-                    mini_data["overworld_animated"] = {
-                        "url": f"sprites/minis/{animated_file.name}",
-                        "width": 16,  # fallback dimensions
-                        "height": 16
-                    }
+            mini_data = self.get_mini_manifest_entry(mini_name)
 
             # Only add to manifest if we have at least one file
             if mini_data:
@@ -1258,24 +3214,76 @@ class GBCSpriteProcessor:
 
         return mini_manifest
 
+    def get_mini_manifest_entry(self, mini_name: str) -> Dict:
+        """Manifest entry for one mini sprite's static and animated outputs"""
+        mini_data = {}
+
+        # Check for static PNG
+        static_file = self.minis_sprites_dir / f"{mini_name}.png"
+        if self.output_exists(static_file):
+            try:
+                width, height = self.get_sprite_size(static_file)
+                mini_data["overworld"] = {
+                    "url": self.get_output_url(static_file),
+                    "width": width,
+                    "height": height
+                }
+            except Exception as e:
+                print(f"Warning: Could not read dimensions for {static_file}: {e}")
+                mini_data["overworld"] = {
+                    "url": self.get_output_url(static_file),
+                    "width": 16,  # fallback dimensions
+                    "height": 16
+                }
+            self.add_atlas_fields(mini_data["overworld"], static_file)
+
+        # Check for animated GIF
+        animated_file = self.minis_sprites_dir / f"{mini_name}_animated.gif"
+        if self.output_exists(animated_file):
+            try:
+                width, height = self.get_sprite_size(animated_file)
+                mini_data["overworld_animated"] = {
+                    "url": self.get_output_url(animated_file),
+                    "width": width,
+                    "height": height
+                }
+            except Exception as e:
+                print(f"Warning: Could not read dimensions for {animated_file}: {e}")
+                mini_data["overworld_animated"] = {
+                    "url": self.get_output_url(animated_file),
+                    "width": 16,  # fallback dimensions
+                    "height": 16
+                }
+            self.add_animation_formats(mini_data["overworld_animated"], animated_file)
+
+        return mini_data
+
     def get_icon_list(self) -> List[str]:
         """Get list of all icon PNG files (excluding palette file)"""
-        icon_pngs = []
-        if self.icons_dir.exists():
-            for item in self.icons_dir.iterdir():
-                if item.is_file() and item.suffix == '.png':
-                    icon_name = item.stem
-                    icon_pngs.append(icon_name)
-        return sorted(icon_pngs)
+        return list(self.assets.stems(self.icons_dir, '.png'))
 
     def _get_icon_colors(self, icon_name: str) -> Tuple[str, str]:
         """Get the two palette colors for an icon based on Pokemon name"""
+        entry = self.name_index.icons.get(icon_name)
+        key = entry['icon_colors'] if entry is not None else self.find_icon_color_key(icon_name)
+        if key is not None:
+            return self.icon_color_map[key]
+
+        # Unown forms without an unown entry
+        if icon_name.lower().startswith('unown'):
+            return ('BLACK', 'BLUE')  # Default Unown colors
+
+        # Default fallback
+        return ('GRAY', 'GRAY')
+
+    def find_icon_color_key(self, icon_name: str) -> Optional[str]:
+        """The overworld_icon_pals.asm entry an icon's colours come from, if any"""
         # Normalize icon name to match palette map keys
         normalized = icon_name.lower()
 
         # Direct lookup
         if normalized in self.icon_color_map:
-            return self.icon_color_map[normalized]
+            return normalized
 
         # Try without form suffix for regional forms
         for suffix in ['_alolan', '_galarian', '_hisuian', '_paldean', '_paldean_fire', '_paldean_water',
@@ -1283,16 +3291,13 @@ class GBCSpriteProcessor:
             if normalized.endswith(suffix):
                 base_name = normalized.replace(suffix, '')
                 if base_name in self.icon_color_map:
-                    return self.icon_color_map[base_name]
+                    return base_name
 
         # Check for Unown forms (unown_a, unown_b, etc.)
-        if normalized.startswith('unown'):
-            if 'unown' in self.icon_color_map:
-                return self.icon_color_map['unown']
-            return ('BLACK', 'BLUE')  # Default Unown colors
+        if normalized.startswith('unown') and 'unown' in self.icon_color_map:
+            return 'unown'
 
-        # Default fallback
-        return ('GRAY', 'GRAY')
+        return None
 
     def _convert_gbc_to_rgb(self, gbc_color: Tuple[int, int, int]) -> Tuple[int, int, int]:
         """Convert GBC 5-bit RGB (0-31) to 8-bit RGB (0-255)"""
@@ -1301,12 +3306,13 @@ class GBCSpriteProcessor:
         b = (gbc_color[2] * 255) // 31
         return (r, g, b)
 
-    def process_icon(self, icon_name: str) -> bool:
+    def process_icon(self, icon_name: str) -> SpriteResult:
         """Process a single Pokemon icon - extract 2 frames, apply colors, create animated GIF"""
+        timer = self.begin_sprite()
         icon_png = self.icons_dir / f"{icon_name}.png"
-        if not icon_png.exists():
+        if not self.assets.exists(icon_png):
             print(f"Icon PNG not found: {icon_name}")
-            return False
+            return self._finish(False)
 
         # Normalize the output name to match evolution chain data format
         output_name = reduce_name(icon_name)
@@ -1314,7 +3320,9 @@ class GBCSpriteProcessor:
 
         try:
             # Load the icon image (16x32, grayscale with 2 frames stacked)
-            icon_img = Image.open(icon_png)
+            with timer.stage('decode'):
+                icon_img = self.open_sheet(icon_png)
+                icon_img.load()
             width, height = icon_img.size
 
             # Icons are 16x32 with two 16x16 frames
@@ -1330,18 +3338,20 @@ class GBCSpriteProcessor:
 
             # Extract the two frames
             frames = []
-            for i in range(2):
-                top = i * frame_height
-                bottom = top + frame_height
-                frame = icon_img.crop((0, top, width, bottom))
-                # Apply colorization and transparency
-                frame_rgba = self.apply_icon_palette(frame, palette1, palette2)
-                frames.append(frame_rgba)
+            with timer.stage('render'):
+                for i in range(2):
+                    top = i * frame_height
+                    bottom = top + frame_height
+                    frame = icon_img.crop((0, top, width, bottom))
+                    # Apply colorization and transparency
+                    frame_rgba = self.apply_icon_palette(frame, palette1, palette2)
+                    frames.append(frame_rgba)
 
             # Save static PNG (first frame) with normalized name
             if frames:
                 static_path = self.icons_sprites_dir / f"{output_name}.png"
-                frames[0].save(static_path)
+                with timer.stage('encode'):
+                    self.save_static_sprite(frames[0], static_path)
                 print(f"Saved static icon: {static_path}")
 
                 # Create animated GIF with the two frames
@@ -1349,98 +3359,41 @@ class GBCSpriteProcessor:
                 if len(frames) > 1:
                     durations = [500, 500]  # 500ms per frame for gentle bobbing animation
                     gif_path = self.icons_sprites_dir / f"{output_name}_animated.gif"
-                    self.create_animated_gif(frames, durations, str(gif_path))
+                    with timer.stage('encode'):
+                        self.create_animation(frames, durations, gif_path)
 
-            return True
+            return self._finish(True)
 
         except Exception as e:
             print(f"Error processing icon {icon_name}: {e}")
             import traceback
             traceback.print_exc()
-            return False
+            return self._finish(False)
 
     def apply_icon_palette(self, icon_frame: Image.Image, palette1: List[Tuple[int, int, int]], palette2: List[Tuple[int, int, int]]) -> Image.Image:
         """Apply two-color palette to icon frame with transparency"""
-        # Convert to grayscale if needed
-        if icon_frame.mode != 'L':
-            gray_frame = icon_frame.convert('L')
-        else:
-            gray_frame = icon_frame
-
-        # Create RGBA output
-        rgba = Image.new('RGBA', icon_frame.size, (0, 0, 0, 0))
-        gray_pixels = gray_frame.load()
-        rgba_pixels = rgba.load()
-
         # Convert palette colors from GBC 5-bit to 8-bit RGB
-        # Use palette1 for main color mapping
-        light_color = self._convert_gbc_to_rgb(palette1[0])      # Lightest - near white
-        mid_color = self._convert_gbc_to_rgb(palette1[1])        # Skin/base tone
-        main_color = self._convert_gbc_to_rgb(palette1[2])       # Main distinguishing color
-        dark_color = self._convert_gbc_to_rgb(palette1[3])       # Black
-
-        for y in range(icon_frame.size[1]):
-            for x in range(icon_frame.size[0]):
-                gray_value = gray_pixels[x, y]
-
-                # Map grayscale values to the 4 palette colors
-                # White/near-white becomes transparent
-                if gray_value >= 250:
-                    rgba_pixels[x, y] = (0, 0, 0, 0)  # Transparent
-                elif gray_value >= 192:
-                    # Lightest non-transparent - use light color
-                    rgba_pixels[x, y] = (*light_color, 255)
-                elif gray_value >= 128:
-                    # Medium - use mid/skin color
-                    rgba_pixels[x, y] = (*mid_color, 255)
-                elif gray_value >= 64:
-                    # Darker - use main color
-                    rgba_pixels[x, y] = (*main_color, 255)
-                else:
-                    # Darkest - use black/dark color
-                    rgba_pixels[x, y] = (*dark_color, 255)
+        # Use palette1 for main color mapping: light, skin/base, main color, black
+        colors = [self._convert_gbc_to_rgb(color) for color in palette1[:4]]
 
-        return rgba
+        # White/near-white becomes transparent, the rest maps to the 4 palette colors
+        return GBCPaletteEngine.colorize(
+            icon_frame, GBCPaletteEngine.ICON_THRESHOLDS, GBCPaletteEngine.icon_slots(colors)
+        )
 
     def apply_icon_transparency(self, icon_frame: Image.Image) -> Image.Image:
         """Apply transparency to icon frame - white pixels become transparent"""
-        # Convert to RGBA
         if icon_frame.mode == 'L':
-            # Grayscale - convert to RGBA
-            rgba = Image.new('RGBA', icon_frame.size, (0, 0, 0, 0))
-            gray_pixels = icon_frame.load()
-            rgba_pixels = rgba.load()
-
-            for y in range(icon_frame.size[1]):
-                for x in range(icon_frame.size[0]):
-                    gray_value = gray_pixels[x, y]
-                    # White/near-white becomes transparent, everything else is grayscale
-                    if gray_value >= 250:
-                        rgba_pixels[x, y] = (0, 0, 0, 0)  # Transparent
-                    else:
-                        rgba_pixels[x, y] = (gray_value, gray_value, gray_value, 255)
-
-            return rgba
+            # White/near-white becomes transparent, everything else is grayscale
+            return GBCPaletteEngine.render(icon_frame, GBCPaletteEngine.gray_passthrough_slots())
         elif icon_frame.mode == 'RGBA':
             return icon_frame
         else:
             return icon_frame.convert('RGBA')
 
-    def process_all_icons(self):
+    def process_all_icons(self, jobs: int = 1):
         """Process all Pokemon icons"""
-        icon_list = self.get_icon_list()
-        total = len(icon_list)
-        processed = 0
-
-        print(f"Found {total} icons to process...")
-
-        for i, icon_name in enumerate(icon_list, 1):
-            print(f"[{i}/{total}] Processing icon {icon_name}")
-            if self.process_icon(icon_name):
-                processed += 1
-
-        print(f"\nCompleted! Processed {processed}/{total} icons")
-        print(f"Output directory: {self.icons_sprites_dir}")
+        self.process_categories(['icons'], jobs)
 
     def create_icon_manifest(self):
         """Create a JSON manifest of all processed icon sprites with dimensions"""
@@ -1448,53 +3401,15 @@ class GBCSpriteProcessor:
 
         # Get unique icon names (without file extensions)
         icon_names = set()
-        for sprite_file in self.icons_sprites_dir.iterdir():
-            if sprite_file.is_file() and sprite_file.suffix in ['.png', '.gif']:
+        for sprite_file in self.list_outputs(self.icons_sprites_dir):
+            if self.is_output_file(sprite_file) and sprite_file.suffix in ['.png', '.gif']:
                 # Remove _animated suffix if present to get base name
                 base_name = sprite_file.stem.replace('_animated', '')
                 icon_names.add(base_name)
 
         # Process each icon
         for icon_name in sorted(icon_names):
-            icon_data = {}
-
-            # Check for static PNG
-            static_file = self.icons_sprites_dir / f"{icon_name}.png"
-            if static_file.exists():
-                try:
-                    with Image.open(static_file) as img:
-                        width, height = img.size
-                        icon_data["static"] = {
-                            "url": f"sprites/icons/{static_file.name}",
-                            "width": width,
-                            "height": height
-                        }
-                except Exception as e:
-                    print(f"Warning: Could not read dimensions for {static_file}: {e}")
-                    icon_data["static"] = {
-                        "url": f"sprites/icons/{static_file.name}",
-                        "width": 16,
-                        "height": 16
-                    }
-
-            # Check for animated GIF
-            animated_file = self.icons_sprites_dir / f"{icon_name}_animated.gif"
-            if animated_file.exists():
-                try:
-                    with Image.open(animated_file) as img:
-                        width, height = img.size
-                        icon_data["animated"] = {
-                            "url": f"sprites/icons/{animated_file.name}",
-                            "width": width,
-                            "height": height
-                        }
-                except Exception as e:
-                    print(f"Warning: Could not read dimensions for {animated_file}: {e}")
-                    icon_data["animated"] = {
-                        "url": f"sprites/icons/{animated_file.name}",
-                        "width": 16,
-                        "height": 16
-                    }
+            icon_data = self.get_icon_manifest_entry(icon_name)
 
             # Only add to manifest if we have at least one file
             if icon_data:
@@ -1502,6 +3417,133 @@ class GBCSpriteProcessor:
 
         return icon_manifest
 
+    def get_icon_manifest_entry(self, icon_name: str) -> Dict:
+        """Manifest entry for one icon's static and animated outputs"""
+        icon_data = {}
+
+        # Check for static PNG
+        static_file = self.icons_sprites_dir / f"{icon_name}.png"
+        if self.output_exists(static_file):
+            try:
+                width, height = self.get_sprite_size(static_file)
+                icon_data["static"] = {
+                    "url": self.get_output_url(static_file),
+                    "width": width,
+                    "height": height
+                }
+            except Exception as e:
+                print(f"Warning: Could not read dimensions for {static_file}: {e}")
+                icon_data["static"] = {
+                    "url": self.get_output_url(static_file),
+                    "width": 16,
+                    "height": 16
+                }
+            self.add_atlas_fields(icon_data["static"], static_file)
+
+        # Check for animated GIF
+        animated_file = self.icons_sprites_dir / f"{icon_name}_animated.gif"
+        if self.output_exists(animated_file):
+            try:
+                width, height = self.get_sprite_size(animated_file)
+                icon_data["animated"] = {
+                    "url": self.get_output_url(animated_file),
+                    "width": width,
+                    "height": height
+                }
+            except Exception as e:
+                print(f"Warning: Could not read dimensions for {animated_file}: {e}")
+                icon_data["animated"] = {
+                    "url": self.get_output_url(animated_file),
+                    "width": 16,
+                    "height": 16
+                }
+            self.add_animation_formats(icon_data["animated"], animated_file)
+
+        return icon_data
+
+    def create_atlases(self, categories: List[str]):
+        """Pack each category's static sprites into power-of-two atlas sheets
+
+        Sheets go to sprites/atlases/<category>_<n>.png and every placement is
+        recorded in sprites/atlases/atlases.json, with the digest of the file that was
+        packed, which the manifest builders read to add atlas/x/y/w/h next to the
+        per-file URLs of sprites that are still the same.
+        """
+        atlas_dir = self.output_path / "sprites" / "atlases"
+        atlas_dir.mkdir(parents=True, exist_ok=True)
+        index_path = atlas_dir / "atlases.json"
+        index = self._load_atlas_index()
+
+        for category in categories:
+            source_dir = getattr(self, SPRITE_CATEGORIES[category].output_attr)
+            images: Dict[str, Image.Image] = {}
+            digests: Dict[str, str] = {}
+            for sprite_file in sorted(source_dir.glob("*.png")):
+                rel_path = sprite_file.relative_to(self.output_path).as_posix()
+                data = sprite_file.read_bytes()
+                digests[rel_path] = hashlib.sha256(data).hexdigest()
+                with Image.open(io.BytesIO(data)) as img:
+                    images[rel_path] = img.convert('RGBA')
+
+            for stale in atlas_dir.glob(f"{category}_*.png"):
+                stale.unlink()
+
+            sheets, placements = SpriteAtlasPacker().pack({url: img.size for url, img in images.items()})
+            canvases = [Image.new('RGBA', size, (0, 0, 0, 0)) for size in sheets]
+            entries = {}
+            for url, (sheet, x, y) in placements.items():
+                canvases[sheet].paste(images[url], (x, y))
+                width, height = images[url].size
+                entries[url] = {"atlas": f"sprites/atlases/{category}_{sheet}.png",
+                                "x": x, "y": y, "w": width, "h": height, "digest": digests[url]}
+
+            sheet_info = []
+            for sheet, canvas in enumerate(canvases):
+                sheet_path = atlas_dir / f"{category}_{sheet}.png"
+                self.save_static_sprite(canvas, sheet_path)
+                sheet_info.append({"url": f"sprites/atlases/{category}_{sheet}.png",
+                                   "width": canvas.width, "height": canvas.height})
+                print(f"Saved atlas: {sheet_path} ({canvas.width}x{canvas.height})")
+
+            index[category] = {"sheets": sheet_info, "entries": entries}
+            print(f"Packed {len(entries)} {category} into {len(canvases)} atlas sheet(s)")
+
+        with open(index_path, 'w') as f:
+            json.dump(index, f, indent=2, sort_keys=True)
+        self._atlas_entries = None
+
+    def _load_atlas_index(self) -> Dict:
+        try:
+            with open(self.output_path / "sprites" / "atlases" / "atlases.json", 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def get_output_digest(self, sprite_file: Path) -> Optional[str]:
+        """sha256 of an output file, from this run's records or else from disk"""
+        artifact = self.run_artifacts.get(sprite_file.relative_to(self.output_path).as_posix())
+        if artifact is not None:
+            return artifact.digest
+        try:
+            return hashlib.sha256(sprite_file.read_bytes()).hexdigest()
+        except OSError:
+            return None
+
+    def add_atlas_fields(self, sprite_info: Dict, sprite_file: Path):
+        """Add atlas placement to a manifest entry when the sprite is still the file that was packed
+
+        A sprite re-rendered since the atlases were built (a run without --atlas) no
+        longer matches its atlas region, so it keeps only its per-file URL.
+        """
+        if self._atlas_entries is None:
+            self._atlas_entries = {}
+            for category in self._load_atlas_index().values():
+                self._atlas_entries.update(category.get("entries", {}))
+
+        placement = self._atlas_entries.get(sprite_file.relative_to(self.output_path).as_posix())
+        if placement and placement.get("digest") == self.get_output_digest(sprite_file):
+            sprite_info.update({field: placement[field] for field in ("atlas", "x", "y", "w", "h")})
+
     def create_unified_manifest(self):
         """Create a unified JSON manifest containing Pokemon, trainer, item, mini, and icon sprites"""
         pokemon_data = self.create_sprite_manifest()
@@ -1524,12 +3566,100 @@ class GBCSpriteProcessor:
             json.dump(unified_manifest, f, indent=2, sort_keys=True)
 
         print(f"Created unified sprite manifest: {manifest_path}")
+
+        # Folder -> output name, palette source and icon colour key, for tooling outside this script
+        names = self.name_index
+        index_path = self.output_path / SpriteNameIndex.FILE_NAME
+        state = 'written' if names.write(index_path) else 'unchanged'
+        print(f"Name index: {len(names.pokemon)} Pokemon folders, {len(names.minis)} minis, "
+              f"{len(names.icons)} icons in {index_path} ({state})")
+
+        # Compact per-category files and hash-bucket shards, so pages load only what they need
+        url_prefix = self.output_path.relative_to(self.url_root).as_posix() + '/'
+        shards = ShardedManifestWriter(self.output_path, '' if url_prefix == './' else url_prefix)
+        index = shards.write(unified_manifest)
+        print(f"Sharded manifest: {sum(c['buckets'] for c in index['categories'].values())} shards in "
+              f"{shards.root} ({shards.written} written, {shards.unchanged} unchanged)")
+        print(f"Dimensions: {self.manifest_sources['recorded']} from this run, "
+              f"{self.manifest_sources['disk']} read from disk")
         print(f"Pokemon sprites: {len(pokemon_data)}")
         print(f"Trainer sprites: {len(trainer_data)}")
         print(f"Item sprites: {len(item_data)}")
         print(f"Mini sprites: {len(mini_data)}")
         print(f"Icon sprites: {len(icon_data)}")
 
+    def get_manifest_entry(self, category: str, key: str) -> Optional[Dict]:
+        """Unified manifest entry for one output key, or None if it should not be listed"""
+        if category == 'pokemon':
+            pokemon_dir = self.sprites_dir / key
+            if self.is_output_dir(pokemon_dir):
+                pokemon_data = self.get_pokemon_manifest_entry(pokemon_dir)
+                if pokemon_data["normal_front"]:
+                    return pokemon_data
+        elif category == 'trainers':
+            trainer_dir = self.trainer_sprites_dir / key
+            if self.is_output_dir(trainer_dir):
+                return self.get_trainer_manifest_entry(trainer_dir) or None
+        elif category == 'items':
+            sprite_file = self.item_sprites_dir / f"{key}.png"
+            if self.is_output_file(sprite_file):
+                return self.get_item_manifest_entry(sprite_file)
+        elif category == 'minis':
+            return self.get_mini_manifest_entry(key) or None
+        elif category == 'icons':
+            return self.get_icon_manifest_entry(key) or None
+        return None
+
+    def rebuild_units(self, units: Dict[Tuple[str, str], List[str]]):
+        """Reprocess some work units in their usual order, keeping the build cache current,
+        and patch just their entries of the unified manifest"""
+        cache = self.build_cache
+        manifest_keys: Dict[str, set] = {}
+        for (category, output_key), names in sorted(units.items()):
+            results = [self.process_entry(category, i, len(names), name)
+                       for i, name in enumerate(names, 1)]
+            artifacts = [artifact for result in results for artifact in result.artifacts]
+            for artifact in artifacts:
+                self.run_artifacts[artifact.path] = artifact
+            if cache is not None and results and all(results):
+                cache.store(f"{category}/{output_key}", self.get_cache_key(category, names), artifacts)
+            manifest_keys.setdefault(category, set()).add(output_key)
+
+        self.patch_unified_manifest(manifest_keys)
+        if cache is not None:
+            cache.save()
+
+    def patch_unified_manifest(self, keys: Dict[str, set]):
+        """Rebuild only the given entries of the unified manifest (and the shards holding
+        them) from the outputs on disk, leaving every other entry as it was"""
+        manifest_path = self.output_path / "sprite_manifest.json"
+        try:
+            with open(manifest_path, 'r') as f:
+                unified_manifest = json.load(f)
+        except (OSError, ValueError):
+            self.create_unified_manifest()
+            return
+
+        patched = 0
+        for category, category_keys in keys.items():
+            entries = unified_manifest.setdefault(category, {})
+            for key in sorted(category_keys):
+                entry = self.get_manifest_entry(category, key)
+                if entry is None:
+                    entries.pop(key, None)
+                else:
+                    entries[key] = entry
+                patched += 1
+
+        with open(manifest_path, 'w') as f:
+            json.dump(unified_manifest, f, indent=2, sort_keys=True)
+
+        url_prefix = self.output_path.relative_to(self.url_root).as_posix() + '/'
+        shards = ShardedManifestWriter(self.output_path, '' if url_prefix == './' else url_prefix)
+        shards.write(unified_manifest)
+        print(f"Patched {patched} manifest entries in {manifest_path} "
+              f"({shards.written} shard files written, {shards.unchanged} unchanged)")
+
     def export_sprite(self, sprite: Image.Image, output_path: str) -> None:
         """Export the processed sprite to the specified output path."""
         try:
@@ -1545,9 +3675,743 @@ class GBCSpriteProcessor:
         # For now, return mock data with equal durations for all frames
         return [{'duration': 300} for _ in range(10)]  # Example: 10 frames, each 100ms
 
+def process_extra_roms(processor: GBCSpriteProcessor, rom_paths: List[str], jobs: int, use_cache: bool):
+    """Process further ROM trees after the main one, rendering only what none before them has
+
+    Every sprite's work unit is keyed on the hash of its source sheets and palettes, so a unit
+    of a later ROM that hashes the same as one already built is not rendered again: its
+    per-ROM manifest (OUTPUT/roms/<name>/sprite_manifest.json) points at the stored file.
+    The main processor must have run with shared_units set so its units are on offer.
+    A built .gbc is read like --rom-image, over the main processor's ROM tree.
+    """
+    for rom_path in rom_paths:
+        is_image = rom_path.endswith('.gbc')
+        rom_output = processor.output_path / "roms" / (Path(rom_path).stem if is_image else Path(rom_path).name)
+        (rom_output / "sprites").mkdir(parents=True, exist_ok=True)
+        print(f"\n=== Processing ROM {rom_path} into {rom_output} ===")
+
+        rom_processor = GBCSpriteProcessor(str(processor.rom_path) if is_image else rom_path, str(rom_output),
+                                           use_cache=use_cache, url_root=str(processor.output_path))
+        if is_image:
+            rom_processor.rom_image = RomImageSprites(GBCRomImage(rom_path), rom_processor.rom_path)
+        rom_processor.png_mode = processor.png_mode
+        rom_processor.gif_mode = processor.gif_mode
+        rom_processor.dedup_mode = processor.dedup_mode
+        rom_processor.animation_formats = processor.animation_formats
+        rom_processor.shared_units = processor.shared_units
+        rom_processor.process_categories(list(SPRITE_CATEGORIES), jobs, banners=True)
+        rom_processor.create_unified_manifest()
+
+
+class SpriteDependencyGraph:
+    """Which ROM files every sprite output is built from, and which outputs each file feeds
+
+    Outputs are the batch driver's work units, (category, output key): every source
+    sprite that writes to one output location, in processing order. Each edge keeps the
+    source sprite and the reason it reads the file, so plans can say why an output
+    needs rebuilding.
+    """
+
+    def __init__(self, processor: GBCSpriteProcessor):
+        self.units: Dict[Tuple[str, str], List[str]] = {}
+        # Input path -> unit -> [(source sprite, reason)]
+        self.inputs: Dict[Path, Dict[Tuple[str, str], List[Tuple[str, str]]]] = {}
+        for category, spec in SPRITE_CATEGORIES.items():
+            for name in getattr(processor, spec.list_method)():
+                key = (category, processor.get_output_key(category, name))
+                self.units.setdefault(key, []).append(name)
+                for path, reason in processor.get_sprite_inputs(category, name).items():
+                    self.inputs.setdefault(path, {}).setdefault(key, []).append((name, reason))
+
+    def __contains__(self, path: Path) -> bool:
+        return path in self.inputs
+
+    def affected(self, paths) -> Dict[Tuple[str, str], List[Tuple[Path, str, str]]]:
+        """Units built from any of the paths, each with the (path, source sprite, reason) edges why"""
+        plan: Dict[Tuple[str, str], List[Tuple[Path, str, str]]] = {}
+        for path in sorted(paths):
+            for key, uses in self.inputs.get(path, {}).items():
+                plan.setdefault(key, []).extend((path, name, reason) for name, reason in uses)
+        return plan
+
+
+def get_changed_rom_files(rom_path: Path, rev: str) -> List[Path]:
+    """ROM files that differ from a git revision: committed, uncommitted and untracked changes
+
+    The revision is looked up in the ROM repository first; failing that it is taken as a
+    revision of the repository the ROM is a submodule of, and the submodule commit
+    recorded there is used (so the commit before `npm run update-rom` works too).
+    """
+    def git(*args: str, cwd: Path = rom_path) -> str:
+        return subprocess.run(['git', *args], cwd=cwd, check=True, capture_output=True, text=True).stdout
+
+    try:
+        commit = git('rev-parse', '--verify', '--quiet', f"{rev}^{{commit}}").strip()
+    except subprocess.CalledProcessError:
+        superproject = git('rev-parse', '--show-superproject-working-tree').strip()
+        if not superproject:
+            raise ValueError(f"unknown revision {rev}")
+        submodule = os.path.relpath(rom_path.resolve(), superproject)
+        entry = git('ls-tree', rev, '--', submodule, cwd=Path(superproject)).split()
+        if len(entry) < 3 or entry[1] != 'commit':
+            raise ValueError(f"{rev} records no commit for submodule {submodule}")
+        commit = entry[2]
+
+    changed = git('diff', '--name-only', '--relative', '--no-renames', '-z', commit, '--').split('\0')
+    changed += git('ls-files', '--others', '--exclude-standard', '-z').split('\0')
+    return sorted({rom_path / line for line in changed if line})
+
+
+def process_since(processor: GBCSpriteProcessor, rev: str, plan_only: bool = False) -> bool:
+    """Rebuild only the outputs whose ROM inputs changed since a git revision
+
+    With plan_only, print the outputs that would be rebuilt and the changed inputs
+    behind each of them without processing anything. Changes to this script or to
+    output options are not tracked here; use a normal cached run for those.
+    """
+    try:
+        changed = get_changed_rom_files(processor.rom_path, rev)
+    except (subprocess.CalledProcessError, OSError, ValueError) as e:
+        detail = getattr(e, 'stderr', None) or str(e)
+        print(f"Could not diff {processor.rom_path} against {rev}: {detail.strip()}")
+        return False
+
+    graph = SpriteDependencyGraph(processor)
+    plan = graph.affected(changed)
+    print(f"{len(changed)} ROM files changed since {rev}; "
+          f"{len(plan)} of {len(graph.units)} sprite outputs are built from them")
+    for (category, output_key), reasons in sorted(plan.items()):
+        print(f"  {category}/{output_key} ({', '.join(graph.units[(category, output_key)])})")
+        for path, name, reason in reasons:
+            print(f"    {os.path.relpath(path, processor.rom_path)} -> {name}: {reason}")
+
+    unused = [path for path in changed if path not in graph]
+    if unused:
+        print(f"  Not read by any sprite: {len(unused)} files")
+        if plan_only:
+            for path in unused:
+                print(f"    {os.path.relpath(path, processor.rom_path)}{'' if path.exists() else ' (deleted)'}")
+
+    if not plan_only and plan:
+        processor.rebuild_units({key: graph.units[key] for key in plan})
+    return True
+
+
+class SpriteWatcher:
+    """Reports the files changed, added or removed under some directories (and single files)
+
+    Uses inotify through libc where available, with one watch per directory, and
+    otherwise polls, comparing every file's mtime and size with the previous sweep.
+    """
+
+    # Event bits from <sys/inotify.h>
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_Q_OVERFLOW = 0x00004000
+    IN_ISDIR = 0x40000000
+    WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+    EVENT_HEADER = struct.Struct('iIII')
+
+    def __init__(self, directories: List[Path], files: List[Path], poll_interval: Optional[float] = None,
+                 settle: float = 0.2):
+        self.directories = directories
+        self.files = set(files)
+        self.poll_interval = poll_interval
+        # Quiet time that ends a burst of events (an editor save, a submodule checkout)
+        self.settle = settle
+        self._libc = None
+        self._fd = -1
+        self._watches: Dict[int, Path] = {}
+        self._snapshot: Dict[Path, Tuple[int, int]] = {}
+
+        if poll_interval is None:
+            self._start_inotify()
+        if self._fd >= 0:
+            self.mode = 'inotify'
+        else:
+            self.mode = 'poll'
+            self.poll_interval = poll_interval or 1.0
+            self._snapshot = self._sweep()
+
+    def _start_inotify(self):
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+            fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        except (OSError, AttributeError):
+            return
+        if fd < 0:
+            return
+        self._libc, self._fd = libc, fd
+        for directory in self.directories:
+            self._add_tree(directory)
+        for parent in {path.parent for path in self.files}:
+            self._add_watch(parent)
+
+    def _add_watch(self, directory: Path):
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), self.WATCH_MASK)
+        if wd >= 0:
+            self._watches[wd] = directory
+
+    def _add_tree(self, directory: Path) -> List[Path]:
+        """Watch a directory and every directory below it, returning the files found"""
+        files = []
+        pending = [directory]
+        while pending:
+            current = pending.pop()
+            self._add_watch(current)
+            try:
+                entries = list(os.scandir(current))
+            except OSError:
+                continue
+            for entry in entries:
+                if entry.is_dir():
+                    pending.append(Path(entry.path))
+                else:
+                    files.append(Path(entry.path))
+        return files
+
+    def _is_watched(self, path: Path) -> bool:
+        return path in self.files or any(directory in path.parents for directory in self.directories)
+
+    def _sweep(self) -> Dict[Path, Tuple[int, int]]:
+        stamps = {}
+        pending = list(self.directories)
+        while pending:
+            try:
+                entries = list(os.scandir(pending.pop()))
+            except OSError:
+                continue
+            for entry in entries:
+                if entry.is_dir():
+                    pending.append(Path(entry.path))
+                elif entry.is_file():
+                    stat = entry.stat()
+                    stamps[Path(entry.path)] = (stat.st_mtime_ns, stat.st_size)
+        for path in self.files:
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            stamps[path] = (stat.st_mtime_ns, stat.st_size)
+        return stamps
+
+    def _read_events(self) -> set:
+        changed = set()
+        while True:
+            try:
+                data = os.read(self._fd, 65536)
+            except BlockingIOError:
+                return changed
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = self.EVENT_HEADER.unpack_from(data, offset)
+                offset += self.EVENT_HEADER.size
+                name = data[offset:offset + length].rstrip(b'\0')
+                offset += length
+                if mask & self.IN_Q_OVERFLOW:
+                    print("Warning: inotify queue overflowed, some changes may have been missed")
+                    continue
+                directory = self._watches.get(wd)
+                if directory is None or not name:
+                    continue
+                path = directory / os.fsdecode(name)
+                if mask & self.IN_ISDIR:
+                    # Files can land in a new directory before its watch exists
+                    if mask & (self.IN_CREATE | self.IN_MOVED_TO):
+                        changed.update(self._add_tree(path))
+                elif self._is_watched(path):
+                    changed.add(path)
+
+    def changes(self) -> set:
+        """Block until something changes, then return every path changed, added or removed"""
+        while True:
+            if self.mode == 'inotify':
+                select.select([self._fd], [], [])
+                changed = self._read_events()
+                while select.select([self._fd], [], [], self.settle)[0]:
+                    changed |= self._read_events()
+            else:
+                time.sleep(self.poll_interval)
+                snapshot = self._sweep()
+                changed = {path for path in snapshot.keys() | self._snapshot.keys()
+                           if snapshot.get(path) != self._snapshot.get(path)}
+                self._snapshot = snapshot
+            if changed:
+                return changed
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+def watch_sprites(processor: GBCSpriteProcessor, poll_interval: Optional[float] = None):
+    """Rebuild only the sprites whose ROM inputs change, until interrupted
+
+    Every changed file is mapped back to each sprite built from it through the
+    dependency graph, so a base Pokemon's normal.pal also rebuilds the forms that
+    fall back to it and the mini that borrows it, and overworld_icon_pals.asm
+    rebuilds the icons. Those sprites' work units are
+    reprocessed in their usual order and only their entries of sprite_manifest.json
+    (and the shards holding them) are rewritten. Outputs of deleted sprites are left
+    on disk; their manifest entries follow what is there.
+    """
+    directories = [processor.pokemon_dir, processor.trainer_dir, processor.items_dir,
+                   processor.minis_dir, processor.icons_dir]
+    watcher = SpriteWatcher(directories, [processor.icon_pals_file], poll_interval)
+    graph = SpriteDependencyGraph(processor)
+    print(f"Watching {len(graph.inputs)} input files of {len(graph.units)} sprite outputs under {processor.rom_path} "
+          f"({watcher.mode}); press Ctrl+C to stop")
+
+    try:
+        while True:
+            # Skip files that came and went unseen, like an editor's temporary copies
+            changed = {path for path in watcher.changes() if path in graph or path.exists()}
+            if not changed:
+                continue
+            start = time.perf_counter()
+            print(f"\nChanged: {', '.join(sorted(os.path.relpath(path, processor.rom_path) for path in changed))}")
+
+            processor.palette_db.refresh([path for path in changed if path.suffix == '.pal'])
+            if processor.icon_pals_file in changed:
+                processor.icon_color_map = processor._load_icon_palette_map()
+            processor.rescan_rom()
+
+            affected = set(graph.affected(changed))
+            # Added or deleted files can add, drop or re-route sprites
+            if any(path not in graph or not path.exists() for path in changed):
+                graph = SpriteDependencyGraph(processor)
+                affected.update(graph.affected(changed))
+            if not affected:
+                print("No sprites are built from the changed files")
+                continue
+
+            processor.rebuild_units({key: graph.units.get(key, []) for key in affected})
+            print(f"Rebuilt {len(affected)} sprite outputs in {time.perf_counter() - start:.2f}s")
+    except KeyboardInterrupt:
+        print("\nStopped watching")
+    finally:
+        watcher.close()
+
+
+class SpriteRenderCache:
+    """Encoded sprite responses keyed by URL path, evicted least recently used past a byte budget"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.evictions = 0
+        self._entries: collections.OrderedDict = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, url: str) -> Optional[Tuple[bytes, str]]:
+        """(body, etag) of a cached response, marking it most recently used"""
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is not None:
+                self._entries.move_to_end(url)
+            return entry
+
+    def put(self, url: str, body: bytes, etag: str):
+        with self._lock:
+            old = self._entries.pop(url, None)
+            if old is not None:
+                self.bytes -= len(old[0])
+            if len(body) > self.max_bytes:
+                return
+            self._entries[url] = (body, etag)
+            self.bytes += len(body)
+            while self.bytes > self.max_bytes:
+                _, (evicted, _) = self._entries.popitem(last=False)
+                self.bytes -= len(evicted)
+                self.evictions += 1
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SpriteRenderServer(ThreadingHTTPServer):
+    """Renders /{category}/{name}/{variant}.{png|gif|webp} on demand through the batch colorizers
+
+    {name} is a sprite's output key and {variant} the stem of one of the files the batch
+    run writes for it (normal_front, shiny_front_animated, kimonogirl_2, pikachu_animated),
+    so every URL mirrors a path under OUTPUT/sprites/. A miss renders the sprite's whole
+    work unit into a scratch directory and caches every file it produced, so sibling
+    variants are warm from then on; a static .webp is the matching PNG re-encoded
+    losslessly. Sheets and palettes stay decoded in the processor between renders.
+    """
+
+    daemon_threads = True
+    CONTENT_TYPES = {'png': 'image/png', 'gif': 'image/gif', 'webp': 'image/webp'}
+
+    def __init__(self, address, processor: GBCSpriteProcessor, cache_bytes: int, log_requests: bool = True):
+        super().__init__(address, SpriteRequestHandler)
+        self.processor = processor
+        self.cache = SpriteRenderCache(cache_bytes)
+        self.units = SpriteDependencyGraph(processor).units
+        self.log_requests = log_requests
+        self.renders = 0
+        self.hits = 0
+        self.misses = 0
+        # The processor is not thread-safe; renders run one at a time
+        self._render_lock = threading.Lock()
+
+    def render(self, url: str) -> Optional[Tuple[bytes, str, bool]]:
+        """(body, etag, was cached) for a URL path, rendering its sprite on a miss; None if it has no such output"""
+        cached = self.cache.get(url)
+        if cached is not None:
+            self.hits += 1
+            return cached + (True,)
+        self.misses += 1
+        parts = url.strip('/').split('/')
+        if len(parts) != 3 or '.' not in parts[2]:
+            return None
+        category, key, filename = parts
+        stem, extension = filename.rsplit('.', 1)
+        if extension not in self.CONTENT_TYPES or (category, key) not in self.units:
+            return None
+
+        with self._render_lock:
+            # Another request may have rendered this sprite while we waited
+            entry = self.cache.get(url)
+            png = self.cache.get(f"/{category}/{key}/{stem}.png") if extension == 'webp' else None
+            if entry is None and png is None:
+                outputs = self._render_unit(category, key)
+                entry = outputs.get(filename)
+                png = outputs.get(f"{stem}.png") if extension == 'webp' else None
+            if entry is None and png is not None:
+                encoded = io.BytesIO()
+                Image.open(io.BytesIO(png[0])).save(encoded, format='WEBP', lossless=True, quality=100)
+                entry = (encoded.getvalue(), hashlib.sha256(encoded.getvalue()).hexdigest())
+                self.cache.put(url, *entry)
+        return entry + (False,) if entry is not None else None
+
+    def _render_unit(self, category: str, key: str) -> Dict[str, Tuple[bytes, str]]:
+        """Run one work unit's process_* calls and cache every file it wrote, keyed by file name"""
+        processor = self.processor
+        spec = SPRITE_CATEGORIES[category]
+        outputs: Dict[str, Tuple[bytes, str]] = {}
+        with contextlib.redirect_stdout(io.StringIO()):
+            for name in self.units[(category, key)]:
+                processor.artifacts = []
+                result = getattr(processor, spec.process_method)(name)
+                for artifact in result.artifacts:
+                    path = processor.output_path / artifact.path
+                    outputs[path.name] = (path.read_bytes(), artifact.digest)
+                    path.unlink()
+        self.renders += 1
+        for filename, (body, digest) in outputs.items():
+            self.cache.put(f"/{category}/{key}/{filename}", body, digest)
+        return outputs
+
+
+class SpriteRequestHandler(BaseHTTPRequestHandler):
+    server: SpriteRenderServer
+
+    def do_GET(self):
+        self._respond(send_body=True)
+
+    def do_HEAD(self):
+        self._respond(send_body=False)
+
+    def _respond(self, send_body: bool):
+        url = self.path.split('?', 1)[0]
+        try:
+            rendered = self.server.render(url)
+        except Exception as e:
+            self.send_error(500, f"Could not render {url}: {e}")
+            return
+        if rendered is None:
+            self.send_error(404)
+            return
+
+        body, digest, cached = rendered
+        etag = f'"{digest[:32]}"'
+        matches = [tag.strip() for tag in self.headers.get('If-None-Match', '').split(',')]
+        not_modified = '*' in matches or etag in matches or f"W/{etag}" in matches
+        self.send_response(304 if not_modified else 200)
+        self.send_header('ETag', etag)
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('X-Sprite-Cache', 'hit' if cached else 'miss')
+        if not not_modified:
+            self.send_header('Content-Type', self.server.CONTENT_TYPES[url.rsplit('.', 1)[1]])
+            self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if send_body and not not_modified:
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if self.server.log_requests:
+            super().log_message(format, *args)
+
+
+def serve_sprites(processor: GBCSpriteProcessor, host: str, port: int, cache_bytes: int):
+    """Serve sprites rendered on demand until interrupted (see SpriteRenderServer)
+
+    The processor should write to a scratch output path; rendered files are read
+    back into the cache and removed from it. ROM changes need a restart.
+    """
+    server = SpriteRenderServer((host, port), processor, cache_bytes)
+    print(f"Serving {len(server.units)} sprite outputs from {processor.rom_path} on "
+          f"http://{host}:{server.server_port}/{{category}}/{{name}}/{{variant}}.{{png|gif|webp}} "
+          f"({cache_bytes // (1024 * 1024)} MB cache); press Ctrl+C to stop")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        cache = server.cache
+        print(f"\nStopped serving: {server.renders} renders, {server.hits} hits, {server.misses} misses, "
+              f"{cache.evictions} evictions, {len(cache)} responses ({cache.bytes} bytes) cached")
+    finally:
+        server.server_close()
+
+
+def compare_png_modes(processor: GBCSpriteProcessor) -> bool:
+    """Report bytes and encode time of RGBA vs indexed PNGs for every static sprite output"""
+    totals: Dict[str, List[float]] = {}
+    mismatches = 0
+    skipped = 0
+
+    for png_path in sorted(processor.output_path.glob("sprites/*/**/*.png")):
+        category = png_path.relative_to(processor.output_path).parts[1]
+        with Image.open(png_path) as img:
+            rgba = img.convert('RGBA')
+
+        start = time.perf_counter()
+        rgba_bytes = io.BytesIO()
+        rgba.save(rgba_bytes, 'PNG')
+        rgba_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        indexed = GBCPaletteEngine.to_indexed(rgba)
+        if indexed is None:
+            skipped += 1
+            continue
+        indexed_bytes = io.BytesIO()
+        indexed.save(indexed_bytes, 'PNG')
+        indexed_time = time.perf_counter() - start
+
+        with Image.open(io.BytesIO(indexed_bytes.getvalue())) as decoded:
+            if decoded.convert('RGBA').tobytes() != rgba.tobytes():
+                mismatches += 1
+                print(f"MISMATCH: {png_path}")
+
+        row = totals.setdefault(category, [0, 0, 0, 0.0, 0.0])
+        row[0] += 1
+        row[1] += rgba_bytes.tell()
+        row[2] += indexed_bytes.tell()
+        row[3] += rgba_time
+        row[4] += indexed_time
+
+    print(f"{'category':<10} {'files':>6} {'rgba bytes':>12} {'indexed bytes':>14} {'saved':>7} "
+          f"{'rgba ms':>9} {'indexed ms':>11}")
+    overall = [0, 0, 0, 0.0, 0.0]
+    for category, row in sorted(totals.items()) + [('total', overall)]:
+        if category != 'total':
+            overall[:] = [a + b for a, b in zip(overall, row)]
+        saved = 1 - row[2] / row[1] if row[1] else 0
+        print(f"{category:<10} {row[0]:>6} {row[1]:>12} {row[2]:>14} {saved:>6.1%} "
+              f"{row[3] * 1000:>9.1f} {row[4] * 1000:>11.1f}")
+
+    if skipped:
+        print(f"Skipped {skipped} images with more than 256 colors")
+    print(f"Decoded pixels identical: {overall[0] - mismatches}/{overall[0]}")
+    return mismatches == 0
+
+
+def write_profile_report(processor: GBCSpriteProcessor, report_path: str, top: int):
+    """Write the --profile JSON report and print the slowest sprites"""
+    categories: Dict[str, Dict] = {}
+    for record in processor.profile_records:
+        totals = categories.setdefault(record['category'], {
+            'sprites': 0, 'wall': 0.0, 'cpu': 0.0, 'bytes': 0, 'stat_calls': 0, 'peak_memory': 0, 'stages': {}
+        })
+        totals['sprites'] += 1
+        for field in ('wall', 'cpu', 'bytes', 'stat_calls'):
+            totals[field] += record[field]
+        totals['peak_memory'] = max(totals['peak_memory'], record['peak_memory'])
+        for stage, seconds in record['stages'].items():
+            totals['stages'][stage] = totals['stages'].get(stage, 0.0) + seconds
+
+    slowest = sorted(processor.profile_records, key=lambda record: -record['wall'])
+    report = {
+        'phases': processor.profile_phases,
+        'categories': categories,
+        'sprites': slowest,
+    }
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+
+    print(f"\n{'phase':<12} {'wall ms':>10} {'cpu ms':>10} {'stats':>8} {'peak KB':>9}")
+    for phase, stats in processor.profile_phases.items():
+        print(f"{phase:<12} {stats['wall'] * 1000:>10.1f} {stats['cpu'] * 1000:>10.1f} "
+              f"{stats['stat_calls']:>8} {stats['peak_memory'] // 1024:>9}")
+
+    print(f"\n{'category':<10} {'sprites':>8} {'wall ms':>10} {'cpu ms':>10} {'decode':>8} {'render':>8} "
+          f"{'encode':>8} {'KB':>8} {'stats':>8} {'peak KB':>9}")
+    for category, totals in categories.items():
+        stages = totals['stages']
+        print(f"{category:<10} {totals['sprites']:>8} {totals['wall'] * 1000:>10.1f} {totals['cpu'] * 1000:>10.1f} "
+              + "".join(f"{stages.get(stage, 0.0) * 1000:>9.1f}" for stage in ('decode', 'render', 'encode'))
+              + f" {totals['bytes'] // 1024:>8} {totals['stat_calls']:>8} {totals['peak_memory'] // 1024:>9}")
+
+    print(f"\nTop {min(top, len(slowest))} slowest sprites:")
+    print(f"{'category':<10} {'sprite':<32} {'wall ms':>9} {'cpu ms':>9} {'decode':>8} {'render':>8} "
+          f"{'encode':>8} {'KB':>6} {'stats':>6}")
+    for record in slowest[:top]:
+        stages = record['stages']
+        print(f"{record['category']:<10} {record['name']:<32} {record['wall'] * 1000:>9.1f} {record['cpu'] * 1000:>9.1f} "
+              + "".join(f"{stages.get(stage, 0.0) * 1000:>9.1f}" for stage in ('decode', 'render', 'encode'))
+              + f" {record['bytes'] // 1024:>6} {record['stat_calls']:>6}")
+    print(f"\nProfile report written to {report_path}")
+
+
+def _animation_timeline(frames: List[Image.Image], durations: List[float]) -> List[Tuple[bytes, float]]:
+    """Visible pixels and display time of each distinct step of an animation
+
+    Consecutive identical frames are merged, as the GIF encoder does, and fully
+    transparent pixels are cleared so encoders that drop their color still compare equal.
+    """
+    timeline = []
+    for frame, duration in zip(frames, durations):
+        rgba = frame.convert('RGBA')
+        visible = rgba.getchannel('A').point(lambda a: 255 if a else 0)
+        pixels = Image.composite(rgba, Image.new('RGBA', rgba.size), visible).tobytes()
+        if timeline and timeline[-1][0] == pixels:
+            timeline[-1] = (pixels, timeline[-1][1] + duration)
+        else:
+            timeline.append((pixels, duration))
+    return timeline
+
+
+def _render_animations(processor: GBCSpriteProcessor, categories: List[str]):
+    """Render categories into a scratch directory, returning the scratch processor and
+    every animation it wrote as (gif_path, frames, durations)"""
+    with tempfile.TemporaryDirectory() as scratch:
+        (Path(scratch) / "sprites").mkdir()
+        bench = GBCSpriteProcessor(str(processor.rom_path), scratch)
+        bench.gif_mode = processor.gif_mode
+        bench.animation_log = []
+        with contextlib.redirect_stdout(io.StringIO()):
+            bench.process_categories(categories)
+    return bench, bench.animation_log
+
+
+def compare_gif_modes(processor: GBCSpriteProcessor) -> bool:
+    """Report bytes and encode time of quantized vs fixed-palette GIFs for every animation
+
+    Each animation is rendered once, encoded in memory in both modes and decoded back;
+    the palette-mode frames must show the same pixels for the same time.
+    """
+    bench, animations = _render_animations(processor, ['pokemon', 'minis', 'icons'])
+    modes = ('quantize', 'palette')
+    # files, bytes per mode, encode seconds per mode
+    totals: Dict[str, List[float]] = {}
+    mismatches = 0
+
+    for gif_path, frames, durations in animations:
+        category = gif_path.relative_to(bench.output_path).parts[1]
+        row = totals.setdefault(category, [0, 0, 0, 0.0, 0.0])
+        row[0] += 1
+        timelines = []
+        for i, mode in enumerate(modes):
+            bench.gif_mode = mode
+            encoded = io.BytesIO()
+            start = time.perf_counter()
+            bench.save_animated_gif(frames, durations, encoded)
+            row[3 + i] += time.perf_counter() - start
+            row[1 + i] += encoded.tell()
+
+            with Image.open(io.BytesIO(encoded.getvalue())) as decoded:
+                timelines.append(_animation_timeline(
+                    [frame.convert('RGBA') for frame in ImageSequence.Iterator(decoded)],
+                    [float(frame.info.get('duration') or 0) for frame in ImageSequence.Iterator(decoded)]))
+        if timelines[0] != timelines[1]:
+            mismatches += 1
+            print(f"MISMATCH: {gif_path.relative_to(bench.output_path)}")
+
+    print(f"{'category':<10} {'files':>6} {'quantize bytes':>15} {'palette bytes':>14} "
+          f"{'quantize ms':>12} {'palette ms':>11} {'speedup':>8}")
+    overall = [0, 0, 0, 0.0, 0.0]
+    for category, row in sorted(totals.items()) + [('total', overall)]:
+        if category != 'total':
+            overall[:] = [a + b for a, b in zip(overall, row)]
+        speedup = row[3] / row[4] if row[4] else 0
+        print(f"{category:<10} {row[0]:>6} {row[1]:>15} {row[2]:>14} "
+              f"{row[3] * 1000:>12.1f} {row[4] * 1000:>11.1f} {speedup:>7.1f}x")
+
+    print(f"Decoded animations identical: {overall[0] - mismatches}/{overall[0]}")
+    return mismatches == 0
+
+
+def benchmark_animation_formats(processor: GBCSpriteProcessor) -> bool:
+    """Report bytes, encode time and timing fidelity of GIF, WebP and APNG for every animation
+
+    The animated categories are rendered into a scratch directory; each animation is then
+    encoded in memory once per format and decoded back to check pixels and frame timing
+    against the intended schedule.
+    """
+    bench, animations = _render_animations(processor, ['pokemon', 'minis', 'icons'])
+
+    formats = ('gif',) + ANIMATION_FORMATS
+    # files, bytes, encode seconds, identical files, frames, total abs timing error ms, max loop drift ms
+    totals = {animation_format: [0, 0, 0.0, 0, 0, 0.0, 0.0] for animation_format in formats}
+
+    for gif_path, frames, durations in animations:
+        schedule = bench.get_animation_schedule(frames, durations)
+        expected = _animation_timeline(frames, schedule)
+
+        for animation_format in formats:
+            encoded = io.BytesIO()
+            start = time.perf_counter()
+            if animation_format == 'gif':
+                bench.save_animated_gif(frames, durations, encoded)
+            else:
+                bench.save_animation(frames, durations, encoded, animation_format)
+            encode_time = time.perf_counter() - start
+
+            with Image.open(io.BytesIO(encoded.getvalue())) as decoded:
+                decoded_frames = []
+                decoded_durations = []
+                for frame in ImageSequence.Iterator(decoded):
+                    # Converting loads the frame, which is when WebP fills in its duration
+                    decoded_frames.append(frame.convert('RGBA'))
+                    decoded_durations.append(float(frame.info.get('duration') or 0))
+            actual = _animation_timeline(decoded_frames, decoded_durations)
+
+            row = totals[animation_format]
+            row[0] += 1
+            row[1] += encoded.tell()
+            row[2] += encode_time
+            if [pixels for pixels, _ in actual] != [pixels for pixels, _ in expected]:
+                print(f"MISMATCH ({animation_format}): {gif_path.relative_to(bench.output_path)}")
+                continue
+
+            row[3] += 1
+            # An animation whose frames are all identical may be written as a still image
+            if len(expected) > 1:
+                row[4] += len(expected)
+                row[5] += sum(abs(a[1] - e[1]) for a, e in zip(actual, expected))
+                row[6] = max(row[6], abs(sum(decoded_durations) - sum(schedule)))
+
+    print(f"{'format':<7} {'files':>6} {'bytes':>10} {'vs gif':>7} {'encode ms':>10} "
+          f"{'identical':>10} {'frame err ms':>13} {'max loop drift ms':>18}")
+    gif_bytes = totals['gif'][1]
+    for animation_format, row in totals.items():
+        ratio = row[1] / gif_bytes if gif_bytes else 0
+        frame_error = row[5] / row[4] if row[4] else 0
+        print(f"{animation_format:<7} {row[0]:>6} {row[1]:>10} {ratio:>6.0%} {row[2] * 1000:>10.1f} "
+              f"{row[3]:>10} {frame_error:>13.2f} {row[6]:>18.1f}")
+
+    return all(row[3] == row[0] for row in totals.values())
+
+
 def main():
     parser = argparse.ArgumentParser(description="Process Game Boy Color sprites (Pokemon, Trainers, Items, Minis, and Icons)")
-    parser.add_argument('target', nargs='?', help='Specific Pokemon/trainer/item name to process')
+    parser.add_argument('target', nargs='?',
+                        help="Specific Pokemon/trainer/item name to process, or 'serve' to render sprites on demand over HTTP")
     parser.add_argument('--all', action='store_true', help='Process all sprites')
     parser.add_argument('--pokemon', action='store_true', help='Process Pokemon sprites only')
     parser.add_argument('--trainers', action='store_true', help='Process trainer sprites only')
@@ -1556,112 +4420,254 @@ def main():
     parser.add_argument('--icons', action='store_true', help='Process Pokemon icon sprites only')
     parser.add_argument('--rom-path', default='polishedcrystal', help='Path to ROM directory')
     parser.add_argument('--output-path', default='public', help='Output directory')
+    parser.add_argument('--rom-image', metavar='GBC',
+                        help='Read Pokemon and trainer pics and palettes from this built ROM (with the .sym '
+                             'file next to it) instead of gfx/pokemon and gfx/trainers under --rom-path')
+    parser.add_argument('--rom-sym', metavar='SYM', help='Symbol file of --rom-image, if not next to it')
+    parser.add_argument('--extra-rom', action='append', default=[], metavar='PATH',
+                        help='With --all, also process another ROM tree (e.g. pokemonHnS), or another built '
+                             '.gbc read like --rom-image, into OUTPUT/roms/<name>, reusing sprites identical '
+                             'to ones already rendered')
+    parser.add_argument('--jobs', type=int, default=1,
+                        help='Number of worker processes for batch runs (0 = one per CPU core)')
+    parser.add_argument('--pipeline', type=int, nargs='?', const=2, default=0, metavar='WRITERS',
+                        help='Read sheets ahead and encode/write outputs on background threads (default 2 writer '
+                             'threads) while sprites are coloured in order, and report per-stage throughput')
+    parser.add_argument('--pipeline-depth', type=int, default=8, metavar='SPRITES',
+                        help='With --pipeline, how many sprites the reader may run ahead (writes are capped at '
+                             'this many per writer thread)')
+    parser.add_argument('--png-mode', choices=['rgba', 'indexed'], default='rgba',
+                        help='Write static PNGs as 32-bit RGBA or as palette-mode PNGs with tRNS transparency')
+    parser.add_argument('--png-report', action='store_true',
+                        help='Compare RGBA and indexed PNG size and encode time over the existing sprite outputs')
+    parser.add_argument('--gif-mode', choices=['quantize', 'palette'], default='quantize',
+                        help="Encode GIFs through Pillow's quantizer, or index frames straight from their exact "
+                             "colors into one shared color table (same pixels, no quantizing)")
+    parser.add_argument('--gif-report', action='store_true',
+                        help='Compare quantized and fixed-palette GIF size and encode time over every animation')
+    parser.add_argument('--animation-formats', default='',
+                        help=f"Comma-separated animation formats to write next to each GIF ({', '.join(ANIMATION_FORMATS)})")
+    parser.add_argument('--animation-benchmark', action='store_true',
+                        help='Compare GIF, WebP and APNG size, encode time and frame timing over every animation')
+    parser.add_argument('--dedup', choices=['off', 'hardlink', 'manifest'], default='off',
+                        help='Share byte-identical outputs: write each once and hardlink the copies to it, and with '
+                             'manifest also point their manifest URLs at one file')
+    parser.add_argument('--atlas', action='store_true',
+                        help='Pack icon, item and mini sprites into atlas sheets and add their placements to the manifest')
+    parser.add_argument('--timings', action='store_true',
+                        help='Print a decode/render/encode timing breakdown for each Pokemon and trainer')
+    parser.add_argument('--profile', nargs='?', const='sprite_profile.json', metavar='REPORT',
+                        help='Record per-sprite and per-category wall/CPU time, bytes, stat calls and peak memory '
+                             'to a JSON report (default sprite_profile.json) and print the slowest sprites')
+    parser.add_argument('--profile-top', type=int, default=20, help='Number of slowest sprites to list with --profile')
+    parser.add_argument('--pstats', metavar='FILE',
+                        help='Also run under cProfile and dump pstats to FILE (covers the main process only)')
+    parser.add_argument('--since', metavar='REV',
+                        help='Rebuild only the sprites whose ROM inputs changed since this git revision of the ROM '
+                             '(or of this repository, using the ROM submodule commit it records)')
+    parser.add_argument('--plan', action='store_true',
+                        help='With --since, print what would be rebuilt and why without processing anything')
+    parser.add_argument('--watch', action='store_true',
+                        help='Keep running and rebuild only the sprites whose ROM graphics or palettes change, '
+                             'patching their manifest entries in place (after any build requested)')
+    parser.add_argument('--watch-poll', type=float, metavar='SECONDS',
+                        help='With --watch, poll for changes at this interval instead of using inotify')
+    parser.add_argument('--host', default='127.0.0.1', help="Address for 'serve' to listen on")
+    parser.add_argument('--port', type=int, default=8000, help="Port for 'serve' to listen on (0 = any free port)")
+    parser.add_argument('--serve-cache-mb', type=float, default=64, metavar='MB',
+                        help="Size of the in-memory cache of rendered responses kept by 'serve'")
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Reprocess every sprite instead of skipping ones whose inputs are unchanged')
 
     args = parser.parse_args()
+    if args.plan and not args.since:
+        parser.error('--plan requires --since')
+    jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+    if args.pipeline and jobs > 1:
+        parser.error('--pipeline runs in one process; it cannot be combined with --jobs')
+    if args.pipeline < 0 or args.pipeline_depth < 1:
+        parser.error('--pipeline and --pipeline-depth must be positive')
+
+    serve = args.target == 'serve'
+    output_path = args.output_path
+    if serve:
+        # Renders pass through a scratch tree and are read back into memory
+        scratch = tempfile.TemporaryDirectory(prefix='sprite-serve-')
+        output_path = scratch.name
+        (Path(output_path) / "sprites").mkdir()
 
     # Initialize processor
-    processor = GBCSpriteProcessor(args.rom_path, args.output_path)
-
-    if args.all:
-        # Process everything
-        print("Processing all Pokemon sprites...")
-        processor.process_all_pokemon()
-
-        print("\nProcessing all trainer sprites...")
-        processor.process_all_trainers()
-
-        print("\nProcessing all item sprites...")
-        processor.process_all_items()
-
-        print("\nProcessing all mini sprites...")
-        processor.process_all_minis()
-
-        print("\nProcessing all icon sprites...")
-        processor.process_all_icons()
-
-        # Create unified manifest
-        print("\nCreating unified sprite manifest...")
-        processor.create_unified_manifest()
-
-    elif args.pokemon:
-        # Process only Pokemon
-        processor.process_all_pokemon()
-        # Create unified manifest with existing trainer and item data
-        processor.create_unified_manifest()
-
-    elif args.trainers:
-        # Process only trainers
-        processor.process_all_trainers()
-        # Create unified manifest with existing Pokemon and item data
-        processor.create_unified_manifest()
-
-    elif args.items:
-        # Process only items
-        processor.process_all_items()
-        # Create unified manifest with existing Pokemon and trainer data
-        processor.create_unified_manifest()
-
-    elif args.minis:
-        # Process only mini sprites
-        processor.process_all_minis()
-        # Create unified manifest with existing data
-        processor.create_unified_manifest()
-
-    elif args.icons:
-        # Process only icon sprites
-        processor.process_all_icons()
-        # Create unified manifest with existing data
-        processor.create_unified_manifest()
-
-    elif args.target:
-        # Try to process specific target (check if it's Pokemon, trainer, item, mini, or icon)
-        if processor.process_pokemon(args.target):
-            print(f"Processed Pokemon: {args.target}")
-        elif processor.process_trainer(args.target):
-            print(f"Processed trainer: {args.target}")
-        elif processor.process_item(args.target):
-            print(f"Processed item: {args.target}")
-        elif processor.process_mini(args.target):
-            print(f"Processed mini sprite: {args.target}")
-        elif processor.process_icon(args.target):
-            print(f"Processed icon: {args.target}")
-        else:
-            print(f"Target '{args.target}' not found as Pokemon, trainer, item, mini sprite, or icon")
-
-    else:
-        # Default: process test cases
-        print("No target specified. Processing test cases...")
-        print("Testing Pokemon (Abra)...")
-        if processor.process_pokemon('abra'):
-            print("Pokemon test successful!")
-        else:
-            print("Pokemon test failed")
+    processor = GBCSpriteProcessor(args.rom_path, output_path, use_cache=not args.no_cache and not serve)
+    processor.show_timings = args.timings
+    processor.png_mode = args.png_mode
+    processor.gif_mode = args.gif_mode
+    processor.dedup_mode = args.dedup
+    processor.profile = args.profile is not None
+    processor.pipeline_writers = args.pipeline
+    processor.pipeline_depth = args.pipeline_depth
+    if args.rom_image:
+        processor.rom_image = RomImageSprites(GBCRomImage(args.rom_image, args.rom_sym), processor.rom_path)
+        print(f"Reading {len(processor.rom_image.sheets)} pics and {len(processor.rom_image.palettes)} palettes "
+              f"from {args.rom_image}")
+
+    deep_profiler = None
+    if args.pstats:
+        deep_profiler = cProfile.Profile()
+        deep_profiler.enable()
+    processor.animation_formats = [f for f in args.animation_formats.split(',') if f]
+    unknown = set(processor.animation_formats) - set(ANIMATION_FORMATS)
+    if unknown:
+        parser.error(f"unknown animation format(s): {', '.join(sorted(unknown))}")
+
+    # os.stat counting and allocation tracing are undone once the profiled run is over
+    profiling = SpriteProfiler.installed() if processor.profile else contextlib.nullcontext()
+    with profiling:
+        if serve:
+            # WebP URLs of animations are served from the WebP written next to each GIF
+            if 'webp' not in processor.animation_formats:
+                processor.animation_formats.append('webp')
+            processor.sheet_cache = {}
+            serve_sprites(processor, args.host, args.port, int(args.serve_cache_mb * 1024 * 1024))
+
+        elif args.png_report:
+            if not compare_png_modes(processor):
+                raise SystemExit(1)
+
+        elif args.gif_report:
+            if not compare_gif_modes(processor):
+                raise SystemExit(1)
+
+        elif args.animation_benchmark:
+            if not benchmark_animation_formats(processor):
+                raise SystemExit(1)
+
+        elif args.since:
+            if not process_since(processor, args.since, plan_only=args.plan):
+                raise SystemExit(1)
+
+        elif args.all:
+            if args.extra_rom:
+                # Remember every unit built so the extra ROMs can reuse identical ones
+                processor.shared_units = {}
+
+            # Process everything, scheduling all categories together when running in parallel
+            with processor.profile_phase('sprites'):
+                processor.process_categories(list(SPRITE_CATEGORIES), jobs, banners=True)
+
+            if args.atlas:
+                print("\nPacking sprite atlases...")
+                with processor.profile_phase('atlases'):
+                    processor.create_atlases(['icons', 'items', 'minis'])
+
+            # Create unified manifest
+            print("\nCreating unified sprite manifest...")
+            with processor.profile_phase('manifest'):
+                processor.create_unified_manifest()
+
+            if args.extra_rom:
+                process_extra_roms(processor, args.extra_rom, jobs, use_cache=not args.no_cache)
+
+        elif args.pokemon:
+            # Process only Pokemon
+            processor.process_all_pokemon(jobs)
+            # Create unified manifest with existing trainer and item data
+            processor.create_unified_manifest()
+
+        elif args.trainers:
+            # Process only trainers
+            processor.process_all_trainers(jobs)
+            # Create unified manifest with existing Pokemon and item data
+            processor.create_unified_manifest()
+
+        elif args.items:
+            # Process only items
+            processor.process_all_items(jobs)
+            if args.atlas:
+                processor.create_atlases(['items'])
+            # Create unified manifest with existing Pokemon and trainer data
+            processor.create_unified_manifest()
+
+        elif args.minis:
+            # Process only mini sprites
+            processor.process_all_minis(jobs)
+            if args.atlas:
+                processor.create_atlases(['minis'])
+            # Create unified manifest with existing data
+            processor.create_unified_manifest()
+
+        elif args.icons:
+            # Process only icon sprites
+            processor.process_all_icons(jobs)
+            if args.atlas:
+                processor.create_atlases(['icons'])
+            # Create unified manifest with existing data
+            processor.create_unified_manifest()
+
+        elif args.target:
+            # Try to process specific target (check if it's Pokemon, trainer, item, mini, or icon)
+            if processor.process_pokemon(args.target):
+                print(f"Processed Pokemon: {args.target}")
+            elif processor.process_trainer(args.target):
+                print(f"Processed trainer: {args.target}")
+            elif processor.process_item(args.target):
+                print(f"Processed item: {args.target}")
+            elif processor.process_mini(args.target):
+                print(f"Processed mini sprite: {args.target}")
+            elif processor.process_icon(args.target):
+                print(f"Processed icon: {args.target}")
+            else:
+                print(f"Target '{args.target}' not found as Pokemon, trainer, item, mini sprite, or icon")
 
-        print("Testing trainer (red)...")
-        if processor.process_trainer('red'):
-            print("Trainer test successful!")
-        else:
-            print("Trainer test failed")
+        elif args.watch:
+            # Nothing to build up front; only watch for changes below
+            pass
 
-        print("Testing item (poke_ball)...")
-        if processor.process_item('poke_ball'):
-            print("Item test successful!")
         else:
-            print("Item test failed")
+            # Default: process test cases
+            print("No target specified. Processing test cases...")
+            print("Testing Pokemon (Abra)...")
+            if processor.process_pokemon('abra'):
+                print("Pokemon test successful!")
+            else:
+                print("Pokemon test failed")
 
-        print("Testing mini sprite (pikachu)...")
-        if processor.process_mini('pikachu'):
-            print("Mini sprite test successful!")
-        else:
-            print("Mini sprite test failed")
+            print("Testing trainer (red)...")
+            if processor.process_trainer('red'):
+                print("Trainer test successful!")
+            else:
+                print("Trainer test failed")
 
-        print("Testing icon (pikachu)...")
-        if processor.process_icon('pikachu'):
-            print("Icon test successful!")
-        else:
-            print("Icon test failed")
+            print("Testing item (poke_ball)...")
+            if processor.process_item('poke_ball'):
+                print("Item test successful!")
+            else:
+                print("Item test failed")
+
+            print("Testing mini sprite (pikachu)...")
+            if processor.process_mini('pikachu'):
+                print("Mini sprite test successful!")
+            else:
+                print("Mini sprite test failed")
+
+            print("Testing icon (pikachu)...")
+            if processor.process_icon('pikachu'):
+                print("Icon test successful!")
+            else:
+                print("Icon test failed")
+
+            print("Run with --all to process all sprites, --pokemon for Pokemon only, --trainers for trainers only, --items for items only, --minis for mini sprites only, or --icons for icons only")
+
+        if args.watch:
+            watch_sprites(processor, args.watch_poll)
+
+    if deep_profiler is not None:
+        deep_profiler.disable()
+        deep_profiler.dump_stats(args.pstats)
+        print(f"\ncProfile stats written to {args.pstats}; top functions by cumulative time:")
+        pstats.Stats(deep_profiler).sort_stats('cumulative').print_stats(25)
 
-        print("Run with --all to process all sprites, --pokemon for Pokemon only, --trainers for trainers only, --items for items only, --minis for mini sprites only, or --icons for icons only")
+    if processor.profile:
+        write_profile_report(processor, args.profile, args.profile_top)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,487 @@
+#!/usr/bin/env python3
+"""
+Benchmark process_sprites.py on a synthetic ROM tree, so performance can be measured
+without the polishedcrystal submodule and compared between commits.
+
+The generated tree mirrors the layout the processor reads: 4-shade front/back sheets
+with normal/shiny palettes, trainers with numbered palette variants, mini + mask pairs,
+16x32 icons and overworld_icon_pals.asm. Every batch is timed per category and per
+processing stage, and the results are written as JSON.
+
+    python3 scripts/benchmark-sprites.py --pokemon 200 --frames 8 --output bench.json
+    python3 scripts/benchmark-sprites.py --compare bench.json
+    python3 scripts/benchmark-sprites.py --rom-dir polishedcrystal --categories minis
+    python3 scripts/benchmark-sprites.py --serve --concurrency 8
+
+With --serve, load-tests `process_sprites.py serve` instead: every URL the batch run
+would write is requested once from a cold server (each miss renders its sprite), then
+again from the warm cache, then revalidated with If-None-Match, and p50/p99 latency
+is reported for each pass.
+"""
+
+import argparse
+import contextlib
+import http.client
+import io
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from PIL import Image
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+from process_sprites import (  # noqa: E402
+    GBCPaletteEngine, GBCSpriteProcessor, SPRITE_CATEGORIES, SpriteDependencyGraph, SpriteRenderServer,
+)
+
+# The four gray levels of a 2bpp sheet, lightest first
+SHADES = [255, 170, 85, 0]
+
+# Processor methods timed per call (inclusive of anything they call)
+STAGE_METHODS = [
+    'extract_sprite_frames',
+    'extract_shade_frames',
+    'extract_sprite_frames_for_mini',
+    'render_mini_frames',
+    'stack_mini_mask',
+    'apply_palette_to_sprite',
+    'apply_palette_to_mini_sprite',
+    'apply_icon_palette',
+    'apply_icon_transparency',
+    'apply_mask_to_sprite',
+    'save_static_sprite',
+    'create_animated_gif',
+    'save_animation',
+    'create_sprite_manifest',
+    'create_trainer_manifest',
+    'create_item_manifest',
+    'create_mini_manifest',
+    'create_icon_manifest',
+    'create_unified_manifest',
+]
+
+# Palette engine entry points the colorizers are built on
+ENGINE_METHODS = ['render', 'colorize', 'render_masked']
+
+
+def shade_sheet(rng, width, height, frames):
+    """A vertical sheet of 4-shade frames, mostly white background like real sprites"""
+    weights = [6, 2, 2, 1]
+    img = Image.new('L', (width, height * frames))
+    img.putdata(rng.choices(SHADES, weights, k=width * height * frames))
+    return img
+
+
+def write_palette(path, colors):
+    path.write_text("".join(f"\tRGB {r:02d}, {g:02d}, {b:02d}\n" for r, g, b in colors))
+
+
+def random_colors(rng, count=2):
+    return [(rng.randrange(32), rng.randrange(32), rng.randrange(32)) for _ in range(count)]
+
+
+def generate_rom(root, sizes, frames, seed):
+    """Write a synthetic ROM tree under root; returns the number of files written"""
+    rng = random.Random(seed)
+    written = 0
+
+    pokemon_dir = root / 'gfx' / 'pokemon'
+    for i in range(sizes['pokemon']):
+        mon_dir = pokemon_dir / f"mon{i:04d}"
+        mon_dir.mkdir(parents=True)
+        shade_sheet(rng, 56, 56, frames).save(mon_dir / 'front.png')
+        shade_sheet(rng, 48, 48, 1).save(mon_dir / 'back.png')
+        write_palette(mon_dir / 'normal.pal', random_colors(rng))
+        write_palette(mon_dir / 'shiny.pal', random_colors(rng))
+        written += 4
+
+    trainer_dir = root / 'gfx' / 'trainers'
+    trainer_dir.mkdir(parents=True)
+    for i in range(sizes['trainers']):
+        name = f"trainer{i:03d}"
+        shade_sheet(rng, 56, 56, 1).save(trainer_dir / f"{name}.png")
+        write_palette(trainer_dir / f"{name}.pal", random_colors(rng))
+        written += 2
+        # Every fourth trainer has numbered palette variants, like kimono_girl_1..5
+        if i % 4 == 0:
+            for variant in range(1, 4):
+                write_palette(trainer_dir / f"{name}_{variant}.pal", random_colors(rng))
+                written += 1
+
+    items_dir = root / 'gfx' / 'items'
+    items_dir.mkdir(parents=True)
+    for i in range(sizes['items']):
+        shade_sheet(rng, 16, 16, 1).save(items_dir / f"item{i:03d}.png")
+        written += 1
+
+    minis_dir = root / 'gfx' / 'minis'
+    minis_dir.mkdir(parents=True)
+    for i in range(sizes['minis']):
+        name = f"mon{i:04d}"
+        mini_frames = 2 if i % 2 == 0 else 1
+        shade_sheet(rng, 16, 16, mini_frames).save(minis_dir / f"{name}.png")
+        mask = Image.new('L', (16, 16 * mini_frames))
+        mask.putdata(rng.choices([0, 255], [1, 3], k=16 * 16 * mini_frames))
+        mask.save(minis_dir / f"{name}_mask.png")
+        written += 2
+
+    icons_dir = root / 'gfx' / 'icons'
+    icons_dir.mkdir(parents=True)
+    icon_colors = ['RED', 'BLUE', 'GREEN', 'BROWN', 'PURPLE', 'GRAY', 'PINK', 'TEAL']
+    pal_lines = []
+    for i in range(sizes['icons']):
+        name = f"mon{i:04d}"
+        shade_sheet(rng, 16, 16, 2).save(icons_dir / f"{name}.png")
+        pal_lines.append(f"\ticonpal {rng.choice(icon_colors)}, {rng.choice(icon_colors)} ; {name.upper()}\n")
+        written += 1
+
+    data_dir = root / 'data' / 'pokemon'
+    data_dir.mkdir(parents=True)
+    (data_dir / 'overworld_icon_pals.asm').write_text("".join(pal_lines))
+    written += 1
+
+    return written
+
+
+class StageTimes:
+    """Wraps processor and palette engine methods to accumulate calls and wall time"""
+
+    def __init__(self):
+        self.calls = {}
+        self.seconds = {}
+        self._restore = []
+
+    def _timed(self, name, func):
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.calls[name] = self.calls.get(name, 0) + 1
+                self.seconds[name] = self.seconds.get(name, 0.0) + time.perf_counter() - start
+        return wrapper
+
+    def attach(self, processor):
+        for name in STAGE_METHODS:
+            setattr(processor, name, self._timed(name, getattr(processor, name)))
+        for name in ENGINE_METHODS:
+            original = GBCPaletteEngine.__dict__[name]
+            timed = self._timed(f"GBCPaletteEngine.{name}", original.__func__)
+            setattr(GBCPaletteEngine, name, classmethod(timed))
+            self._restore.append((name, original))
+
+    def detach(self):
+        for name, original in self._restore:
+            setattr(GBCPaletteEngine, name, original)
+        self._restore = []
+
+
+def run_once(rom_root, scratch, options):
+    """Process every category once into a fresh output tree and time it"""
+    output_root = Path(scratch)
+    (output_root / 'sprites').mkdir(parents=True)
+    processor = GBCSpriteProcessor(str(rom_root), str(output_root))
+    processor.png_mode = options.png_mode
+    processor.gif_mode = options.gif_mode
+    processor.animation_formats = [f for f in options.animation_formats.split(',') if f]
+
+    stages = StageTimes()
+    stages.attach(processor)
+    categories = {}
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            # Parse palettes outside the timed batches, as a separate stage
+            start = time.perf_counter()
+            processor.palette_db
+            palette_seconds = time.perf_counter() - start
+
+            for category in options.categories:
+                before = len(processor.run_artifacts)
+                names = getattr(processor, SPRITE_CATEGORIES[category].list_method)()
+                start = time.perf_counter()
+                processor.process_categories([category])
+                seconds = time.perf_counter() - start
+                artifacts = list(processor.run_artifacts.values())[before:]
+                categories[category] = {
+                    'sprites': len(names),
+                    'files': len(artifacts),
+                    'frames': sum(artifact.frames for artifact in artifacts),
+                    'bytes': sum(artifact.bytes for artifact in artifacts),
+                    'seconds': seconds,
+                }
+
+            start = time.perf_counter()
+            processor.create_unified_manifest()
+            manifest_seconds = time.perf_counter() - start
+    finally:
+        stages.detach()
+
+    for result in categories.values():
+        result['sprites_per_s'] = result['sprites'] / result['seconds'] if result['seconds'] else 0.0
+        result['frames_per_s'] = result['frames'] / result['seconds'] if result['seconds'] else 0.0
+
+    return {
+        'palette_db_seconds': palette_seconds,
+        'manifest_seconds': manifest_seconds,
+        'total_seconds': palette_seconds + manifest_seconds + sum(r['seconds'] for r in categories.values()),
+        'categories': categories,
+        'stages': {name: {'calls': stages.calls[name], 'seconds': stages.seconds[name]}
+                   for name in sorted(stages.calls)},
+    }
+
+
+def best_of(runs):
+    """Keep the fastest run of each category and stage; noise only ever adds time"""
+    best = min(runs, key=lambda run: run['total_seconds'])
+    result = json.loads(json.dumps(best))
+    for category in result['categories']:
+        fastest = min((run['categories'][category] for run in runs), key=lambda r: r['seconds'])
+        result['categories'][category] = fastest
+    for stage in result['stages']:
+        result['stages'][stage] = min((run['stages'][stage] for run in runs if stage in run['stages']),
+                                      key=lambda r: r['seconds'])
+    return result
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a list of numbers"""
+    ordered = sorted(values)
+    return ordered[max(0, min(len(ordered) - 1, round(fraction * len(ordered)) - 1))]
+
+
+def latency_summary(samples):
+    """p50/p99/max in milliseconds of (seconds, ...) samples"""
+    seconds = [sample[0] for sample in samples]
+    if not seconds:
+        return {'requests': 0}
+    return {
+        'requests': len(seconds),
+        'p50_ms': percentile(seconds, 0.5) * 1000,
+        'p99_ms': percentile(seconds, 0.99) * 1000,
+        'max_ms': max(seconds) * 1000,
+    }
+
+
+def serve_once(rom_root, scratch, options):
+    """Load-test the on-demand render server: cold, warm and revalidated passes over every output URL"""
+    scratch = Path(scratch)
+    animation_formats = [f for f in options.animation_formats.split(',') if f]
+    if 'webp' not in animation_formats:
+        animation_formats.append('webp')
+
+    def make_processor(output_root):
+        (output_root / 'sprites').mkdir(parents=True)
+        processor = GBCSpriteProcessor(str(rom_root), str(output_root))
+        processor.png_mode = options.png_mode
+        processor.gif_mode = options.gif_mode
+        processor.animation_formats = list(animation_formats)
+        return processor
+
+    # The URLs a client could ask for: every file a batch run writes, by work unit
+    listing = make_processor(scratch / 'listing')
+    urls = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for (category, key), names in SpriteDependencyGraph(listing).units.items():
+            if category not in options.categories:
+                continue
+            for name in names:
+                result = getattr(listing, SPRITE_CATEGORIES[category].process_method)(name)
+                urls.extend(f"/{category}/{key}/{Path(artifact.path).name}" for artifact in result.artifacts)
+    urls = sorted(set(urls))
+    random.Random(options.seed).shuffle(urls)
+
+    processor = make_processor(scratch / 'serve')
+    processor.sheet_cache = {}
+    start = time.perf_counter()
+    server = SpriteRenderServer(('127.0.0.1', 0), processor, int(options.serve_cache_mb * 1024 * 1024),
+                                log_requests=False)
+    startup_seconds = time.perf_counter() - start
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    connections = threading.local()
+    etags = {}
+
+    def fetch(url, revalidate=False):
+        if not hasattr(connections, 'conn'):
+            connections.conn = http.client.HTTPConnection('127.0.0.1', server.server_port)
+        headers = {'If-None-Match': etags[url]} if revalidate else {}
+        start = time.perf_counter()
+        connections.conn.request('GET', url, headers=headers)
+        response = connections.conn.getresponse()
+        response.read()
+        seconds = time.perf_counter() - start
+        etags.setdefault(url, response.getheader('ETag'))
+        return seconds, response.status, response.getheader('X-Sprite-Cache')
+
+    def run_pass(requests, revalidate=False):
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options.concurrency) as pool:
+            samples = list(pool.map(lambda url: fetch(url, revalidate), requests))
+        return samples, time.perf_counter() - start
+
+    try:
+        cold, cold_seconds = run_pass(urls)
+        warm, warm_seconds = run_pass(urls * options.warm_rounds)
+        revalidated, revalidate_seconds = run_pass(urls, revalidate=True)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    statuses = [sample[1] for sample in cold + warm] + [sample[1] for sample in revalidated]
+    return {
+        'urls': len(urls),
+        'concurrency': options.concurrency,
+        'startup_seconds': startup_seconds,
+        'renders': server.renders,
+        'errors': sum(1 for status in statuses if status not in (200, 304)),
+        'cache': {'entries': len(server.cache), 'bytes': server.cache.bytes, 'evictions': server.cache.evictions},
+        'passes': {
+            'cold': dict(latency_summary(cold), seconds=cold_seconds),
+            'cold_render': latency_summary([sample for sample in cold if sample[2] == 'miss']),
+            'cold_sibling': latency_summary([sample for sample in cold if sample[2] == 'hit']),
+            'warm': dict(latency_summary(warm), seconds=warm_seconds,
+                         requests_per_s=len(warm) / warm_seconds if warm_seconds else 0.0),
+            'revalidate': dict(latency_summary(revalidated), seconds=revalidate_seconds,
+                               not_modified=sum(1 for sample in revalidated if sample[1] == 304)),
+        },
+    }
+
+
+def print_serve_summary(result):
+    print(f"{result['urls']} URLs, {result['renders']} renders, {result['errors']} errors, "
+          f"concurrency {result['concurrency']}", file=sys.stderr)
+    print(f"{'pass':<14} {'requests':>9} {'p50 ms':>9} {'p99 ms':>9} {'max ms':>9}", file=sys.stderr)
+    for name, summary in result['passes'].items():
+        if summary['requests']:
+            print(f"{name:<14} {summary['requests']:>9} {summary['p50_ms']:>9.2f} {summary['p99_ms']:>9.2f} "
+                  f"{summary['max_ms']:>9.2f}", file=sys.stderr)
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_comparison(baseline, current, max_regression):
+    """Print old vs new timings; returns False when a category slowed down past the limit"""
+    ok = True
+    print(f"{'category':<10} {'old sprites/s':>14} {'new sprites/s':>14} {'change':>8}")
+    for category, new in current['categories'].items():
+        old = baseline['categories'].get(category)
+        if not old or not old['sprites_per_s']:
+            continue
+        change = new['sprites_per_s'] / old['sprites_per_s'] - 1
+        flag = ''
+        if change < -max_regression:
+            flag = '  REGRESSION'
+            ok = False
+        print(f"{category:<10} {old['sprites_per_s']:>14.1f} {new['sprites_per_s']:>14.1f} {change:>+7.1%}{flag}")
+
+    print(f"\n{'stage':<36} {'old ms':>10} {'new ms':>10} {'change':>8}")
+    for stage, new in current['stages'].items():
+        old = baseline['stages'].get(stage)
+        if not old or not old['seconds']:
+            continue
+        change = new['seconds'] / old['seconds'] - 1
+        print(f"{stage:<36} {old['seconds'] * 1000:>10.1f} {new['seconds'] * 1000:>10.1f} {change:>+7.1%}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark process_sprites.py on a synthetic ROM tree")
+    parser.add_argument('--pokemon', type=int, default=200, help='Number of Pokemon sprite folders')
+    parser.add_argument('--frames', type=int, default=8, help='Frames in each Pokemon front sheet')
+    parser.add_argument('--trainers', type=int, default=60, help='Number of trainer sprites')
+    parser.add_argument('--items', type=int, default=100, help='Number of item sprites')
+    parser.add_argument('--minis', type=int, default=200, help='Number of mini sprites (with masks)')
+    parser.add_argument('--icons', type=int, default=200, help='Number of icon sprites')
+    parser.add_argument('--seed', type=int, default=1, help='Random seed for the generated tree')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs to take the fastest of')
+    parser.add_argument('--png-mode', choices=['rgba', 'indexed'], default='rgba')
+    parser.add_argument('--gif-mode', choices=['quantize', 'palette'], default='quantize')
+    parser.add_argument('--animation-formats', default='', help='Extra animation formats, as in process_sprites.py')
+    parser.add_argument('--rom-dir', help='Generate the synthetic ROM here and keep it (default: a temp dir); '
+                             'an existing ROM tree, such as polishedcrystal, is benchmarked as it is')
+    parser.add_argument('--categories', default=','.join(SPRITE_CATEGORIES),
+                        help='Comma-separated sprite categories to time (default: all)')
+    parser.add_argument('--output', help='Write the JSON results to this file (default: stdout)')
+    parser.add_argument('--compare', help='Compare against a previous JSON result')
+    parser.add_argument('--max-regression', type=float, default=0.2,
+                        help='With --compare, fail if any category loses more than this fraction of its sprites/s')
+    parser.add_argument('--serve', action='store_true',
+                        help="Load-test 'process_sprites.py serve' and report cold/warm p50/p99 latency instead")
+    parser.add_argument('--concurrency', type=int, default=4, help='With --serve, concurrent client connections')
+    parser.add_argument('--warm-rounds', type=int, default=3,
+                        help='With --serve, how many times every URL is requested again once the cache is warm')
+    parser.add_argument('--serve-cache-mb', type=float, default=64, metavar='MB',
+                        help='With --serve, size of the server\'s response cache')
+    args = parser.parse_args()
+    if args.serve and args.compare:
+        parser.error('--compare applies to batch benchmarks, not --serve')
+    args.categories = [category for category in args.categories.split(',') if category]
+    unknown = [category for category in args.categories if category not in SPRITE_CATEGORIES]
+    if unknown:
+        parser.error(f"unknown categories: {', '.join(unknown)}")
+
+    sizes = {category: getattr(args, category) for category in SPRITE_CATEGORIES}
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        rom_root = Path(args.rom_dir) if args.rom_dir else Path(work_dir) / 'rom'
+        if not rom_root.exists():
+            files = generate_rom(rom_root, sizes, args.frames, args.seed)
+            print(f"Generated synthetic ROM with {files} files in {rom_root}", file=sys.stderr)
+
+        runs = []
+        if args.serve:
+            serve_result = serve_once(rom_root, Path(work_dir) / 'serve', args)
+            print_serve_summary(serve_result)
+        for run in range(0 if args.serve else args.repeat):
+            runs.append(run_once(rom_root, Path(work_dir) / f"out{run}", args))
+            print(f"Run {run + 1}/{args.repeat}: {runs[-1]['total_seconds']:.2f}s", file=sys.stderr)
+
+    result = serve_result if args.serve else best_of(runs)
+    result = {
+        'version': 1,
+        'revision': git_revision(),
+        'python': sys.version.split()[0],
+        'pillow': Image.__version__,
+        'cpu_count': os.cpu_count(),
+        'fixture': dict(sizes, frames=args.frames, seed=args.seed),
+        'options': {'png_mode': args.png_mode, 'gif_mode': args.gif_mode, 'animation_formats': args.animation_formats,
+                    'categories': args.categories},
+        'repeat': 1 if args.serve else args.repeat,
+        **result,
+    }
+
+    text = json.dumps(result, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+        print(f"Written benchmark results to {args.output}", file=sys.stderr)
+    elif not args.compare:
+        print(text)
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+        if baseline.get('fixture') != result['fixture']:
+            print("Warning: baseline was run on a different fixture size", file=sys.stderr)
+        if not print_comparison(baseline, result, args.max_regression):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -2,11 +2,42 @@
 """
 Generate a map manifest that maps location IDs to their actual map image files.
 Parses blocks.asm to understand which locations share the same map graphics.
+
+With --tiles, also builds the public/tiles zoom pyramid from the composited world
+map, in the layout `vips dzsave --layout google --suffix .webp[Q=80]` writes:
+tiles/{z}/{y}/{x}.webp, 256px tiles, each level a 2x2 mean shrink of the one below,
+fully transparent tiles left out in favour of tiles/blank.png. Tiles whose pixels are
+unchanged since the last run are not re-encoded.
+
+With --optimize, also rewrites every public/maps PNG in its smallest lossless form:
+indexed when it has 256 colours or fewer, maximum zlib effort, no metadata chunks.
+Maps already written by a previous pass are recognised by hash and skipped.
 """
 
 import re
 import json
 import os
+import math
+import argparse
+import hashlib
+import io
+import struct
+import zlib
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+from PIL import Image
+
+TILE_SIZE = 256
+TILE_FORMAT = 'webp'
+TILE_QUALITY = 80
+# Per-tile pixel hashes of the last pyramid build, kept out of the deploy like the sprite caches
+TILE_CACHE = '.map_tiles_cache.json'
+# Hashes of map PNGs as the optimisation pass last wrote them
+OPTIMIZE_CACHE = '.map_optimize_cache.json'
+OPTIMIZE_SETTINGS = {'palette': 256, 'compress_level': 9, 'strip': True}
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+# Channels per pixel of each PNG colour type
+PNG_CHANNELS = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}
 
 def parse_blocks_asm(blocks_asm_path):
     """Parse blocks.asm to create location -> map file mapping"""
@@ -46,7 +77,359 @@ def get_available_maps(maps_dir):
             available[name.lower()] = name
     return available
 
+def palettize(image):
+    """Exact indexed copy of an RGB image with at most 256 colours, or None"""
+    colors = image.getcolors(256)
+    if colors is None:
+        return None
+    indexed = image.quantize(colors=len(colors), method=Image.Quantize.MEDIANCUT, dither=Image.Dither.NONE)
+    if indexed.convert('RGB').tobytes() == image.tobytes():
+        return indexed
+    # Median cut merged two colours; map each pixel to its own palette entry instead
+    lookup = {bytes(color): index for index, (_, color) in enumerate(colors)}
+    data = image.tobytes()
+    indexed = Image.frombytes('P', image.size, bytes(lookup[data[i:i + 3]] for i in range(0, len(data), 3)))
+    indexed.putpalette([channel for _, color in colors for channel in color])
+    return indexed
+
+def optimize_map(path):
+    """Rewrite one map PNG in its smallest lossless encoding
+
+    Returns (before bytes, after bytes, mode written, sha256 of the file on disk).
+    The original file is kept when nothing smaller comes out.
+    """
+    with open(path, 'rb') as f:
+        original = f.read()
+    image = Image.open(io.BytesIO(original))
+    image.load()
+    # Rebuild from raw pixels so no ancillary chunks (text, ICC, gamma, dpi) are carried over
+    if image.mode not in ('RGB', 'RGBA', 'L', 'LA'):
+        image = image.convert('RGBA' if 'transparency' in image.info or 'A' in image.mode else 'RGB')
+    if image.mode == 'RGBA' and image.getextrema()[3] == (255, 255):
+        image = image.convert('RGB')
+    pixels = Image.frombytes(image.mode, image.size, image.tobytes())
+    candidates = [pixels]
+    if pixels.mode == 'RGB':
+        indexed = palettize(pixels)
+        if indexed is not None:
+            candidates.insert(0, indexed)
+
+    best = original
+    mode = image.mode
+    for candidate in candidates:
+        buffer = io.BytesIO()
+        candidate.save(buffer, format='PNG', optimize=True, compress_level=OPTIMIZE_SETTINGS['compress_level'])
+        if buffer.tell() < len(best):
+            best = buffer.getvalue()
+            mode = candidate.mode
+    if best is not original:
+        staging = path + '.tmp'
+        with open(staging, 'wb') as f:
+            f.write(best)
+        os.replace(staging, path)
+    return len(original), len(best), mode, hashlib.sha256(best).hexdigest()
+
+def optimize_maps(maps_dir, cache_path, jobs=0):
+    """Losslessly shrink every map PNG in maps_dir, skipping ones already optimised"""
+    previous = {}
+    try:
+        with open(cache_path, 'r') as f:
+            data = json.load(f)
+        if data.get('settings') == OPTIMIZE_SETTINGS:
+            previous = data.get('maps', {})
+    except (OSError, ValueError):
+        pass
+
+    hashes = {}
+    todo = []
+    for name in sorted(os.listdir(maps_dir)):
+        if not name.endswith('.png'):
+            continue
+        path = os.path.join(maps_dir, name)
+        with open(path, 'rb') as f:
+            digest = hashlib.sha256(f.read()).hexdigest()
+        if previous.get(name) == digest:
+            hashes[name] = digest
+        else:
+            todo.append(name)
+    print(f"Optimising {len(todo)} map images ({len(hashes)} already optimised)")
+
+    total_before = total_after = 0
+    if todo:
+        with ProcessPoolExecutor(max_workers=jobs or os.cpu_count() or 1) as pool:
+            results = pool.map(optimize_map, [os.path.join(maps_dir, name) for name in todo])
+            for name, (before, after, mode, digest) in zip(todo, results):
+                hashes[name] = digest
+                total_before += before
+                total_after += after
+                saved = before - after
+                print(f"  {name}: {before} -> {after} bytes ({mode}, -{saved * 100 / before:.1f}%)")
+
+    with open(cache_path, 'w') as f:
+        json.dump({'settings': OPTIMIZE_SETTINGS, 'maps': hashes}, f, indent=2, sort_keys=True)
+    if todo:
+        print(f"Maps: {total_before} -> {total_after} bytes "
+              f"(-{(total_before - total_after) * 100 / total_before:.1f}%) across {len(todo)} images")
+
+def pyramid_levels(width, height, tile_size=TILE_SIZE):
+    """Size and tile bounds of every zoom level, 0 (one tile) up to full resolution"""
+    max_zoom = max(0, math.ceil(math.log2(max(width, height) / tile_size)))
+    levels = []
+    for zoom in range(max_zoom + 1):
+        scale = 2 ** (max_zoom - zoom)
+        level_width = math.ceil(width / scale)
+        level_height = math.ceil(height / scale)
+        levels.append({
+            'zoom': zoom,
+            'width': level_width,
+            'height': level_height,
+            'cols': math.ceil(level_width / tile_size),
+            'rows': math.ceil(level_height / tile_size),
+        })
+    return levels
+
+def png_chunk(kind, data):
+    """Encode one PNG chunk"""
+    return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+def png_chunks(f):
+    """Yield (type, data) for each chunk of the PNG open in f, read past its signature"""
+    while True:
+        header = f.read(8)
+        if len(header) < 8:
+            return
+        length, kind = struct.unpack('>I4s', header)
+        data = f.read(length)
+        f.read(4)
+        yield kind, data
+
+def png_band_source(path):
+    """(width, height, colour type, PLTE/tRNS chunks) of a PNG that can be decoded in bands, or None
+
+    Only non-interlaced 8 bit PNGs qualify: their scanlines hold one byte per channel,
+    in the same layout Pillow returns from tobytes().
+    """
+    with open(path, 'rb') as f:
+        if f.read(8) != PNG_SIGNATURE:
+            return None
+        header = b''
+        depth = None
+        for kind, data in png_chunks(f):
+            if kind == b'IHDR':
+                width, height, depth, color_type, _, _, interlace = struct.unpack('>IIBBBBB', data)
+            elif kind in (b'PLTE', b'tRNS'):
+                header += png_chunk(kind, data)
+            elif kind == b'IDAT':
+                break
+    if depth != 8 or interlace or color_type not in PNG_CHANNELS:
+        return None
+    return width, height, color_type, header
+
+def iter_png_bands(path, source, band_height):
+    """Yield (top, band) for each band_height rows of a PNG, inflating only that band
+
+    Each band's filtered scanlines are wrapped in a PNG of their own and decoded by
+    Pillow. The row above the band, already unfiltered, leads it with filter type 0
+    so scanlines filtered against the previous row decode, and is cropped off again.
+    """
+    width, height, color_type, header = source
+    stride = width * PNG_CHANNELS[color_type] + 1
+    inflater = zlib.decompressobj()
+    with open(path, 'rb') as f:
+        f.read(8)
+        chunks = png_chunks(f)
+        raw = bytearray()
+        compressed = b''
+        row_above = None
+        for top in range(0, height, band_height):
+            rows = min(band_height, height - top)
+            while len(raw) < rows * stride:
+                if not compressed:
+                    kind, compressed = next(chunks, (None, b''))
+                    if kind is None:
+                        raise ValueError(f"{path}: image data ends at row {top + len(raw) // stride}")
+                    if kind != b'IDAT':
+                        compressed = b''
+                        continue
+                raw += inflater.decompress(compressed, rows * stride - len(raw))
+                compressed = inflater.unconsumed_tail
+            scanlines = bytes(raw[:rows * stride])
+            del raw[:rows * stride]
+            led = row_above is not None
+            if led:
+                scanlines = b'\x00' + row_above + scanlines
+                rows += 1
+            band = Image.open(io.BytesIO(
+                PNG_SIGNATURE
+                + png_chunk(b'IHDR', struct.pack('>IIBBBBB', width, rows, 8, color_type, 0, 0, 0))
+                + header
+                + png_chunk(b'IDAT', zlib.compress(scanlines, 0))
+                + png_chunk(b'IEND', b'')))
+            band.load()
+            row_above = band.crop((0, rows - 1, width, rows)).tobytes()
+            if led:
+                band = band.crop((0, 1, width, rows))
+            yield top, band
+
+def open_source_bands(path, band_height):
+    """Size of the source image and an iterator of its (top, band) strips of band_height rows
+
+    8 bit PNGs are read a band at a time; any other image is decoded whole first.
+    """
+    source = png_band_source(path)
+    if source is not None:
+        return source[0], source[1], iter_png_bands(path, source, band_height)
+    image = Image.open(path)
+    image.load()
+    bands = ((top, image.crop((0, top, image.width, min(top + band_height, image.height))))
+             for top in range(0, image.height, band_height))
+    return image.width, image.height, bands
+
+def iter_level_tiles(bands, levels, tile_size=TILE_SIZE):
+    """Yield (zoom, x, y, RGBA tile) for every level from bands of two tile rows of the source
+
+    Each band is cut into tiles and shrunk 2x2 (mean of premultiplied pixels); two
+    shrunk bands make a band of the level below, which is tiled and shrunk in turn.
+    At most one band per level is held at a time. Tiles past the image edge are
+    padded with transparency, as dzsave does.
+    """
+    # Shrunk (top, band) halves waiting for their pair, per zoom level
+    halves = [[] for _ in levels]
+
+    def tile_band(zoom, band_top, band):
+        spec = levels[zoom]
+        for row in range(band_top // tile_size, min(band_top // tile_size + 2, spec['rows'])):
+            top = row * tile_size - band_top
+            for col in range(spec['cols']):
+                left = col * tile_size
+                tile = band.crop((left, top, left + tile_size, top + tile_size))
+                yield zoom, col, row, tile.convert('RGBA')
+        if zoom == 0:
+            return
+        waiting = halves[zoom - 1]
+        half = band.reduce(2)
+        waiting.append((band_top // 2, half))
+        if len(waiting) < 2 and band_top // 2 + half.height < levels[zoom - 1]['height']:
+            return
+        below_top = waiting[0][0]
+        below = waiting[0][1]
+        if len(waiting) > 1:
+            below = Image.new('RGBa', (half.width, sum(part.height for _, part in waiting)))
+            for part_top, part in waiting:
+                below.paste(part, (0, part_top - below_top))
+        waiting.clear()
+        yield from tile_band(zoom - 1, below_top, below)
+
+    for band_top, band in bands:
+        if band.mode != 'RGBa':
+            band = band.convert('RGBA').convert('RGBa')
+        yield from tile_band(levels[-1]['zoom'], band_top, band)
+
+def encode_tile(path, data):
+    """Write one RGBA tile (raw bytes) to path as WebP"""
+    tile = Image.frombytes('RGBA', (TILE_SIZE, TILE_SIZE), data)
+    staging = path + '.tmp'
+    tile.save(staging, format='WEBP', quality=TILE_QUALITY)
+    os.replace(staging, path)
+    return os.path.getsize(path)
+
+def build_tile_pyramid(source_path, tiles_dir, cache_path, jobs=0):
+    """Re-tile the world map into tiles_dir, encoding only tiles whose pixels changed"""
+    settings = {'tile_size': TILE_SIZE, 'format': TILE_FORMAT, 'quality': TILE_QUALITY}
+    previous = {}
+    try:
+        with open(cache_path, 'r') as f:
+            data = json.load(f)
+        if data.get('settings') == settings:
+            previous = data.get('tiles', {})
+    except (OSError, ValueError):
+        pass
+
+    width, height, bands = open_source_bands(source_path, TILE_SIZE * 2)
+    levels = pyramid_levels(width, height)
+    print(f"Tiling {source_path} ({width}x{height}) into zoom levels 0-{levels[-1]['zoom']}")
+
+    hashes = {}
+    blank = 0
+    written = 0
+    written_bytes = 0
+    pending = set()
+    max_workers = jobs or os.cpu_count() or 1
+    os.makedirs(tiles_dir, exist_ok=True)
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        for zoom, x, y, tile in iter_level_tiles(bands, levels):
+            # Like dzsave's google layout, leave fully transparent tiles out of the tree
+            if tile.getextrema()[3] == (0, 0):
+                blank += 1
+                continue
+            key = f"{zoom}/{y}/{x}"
+            data = tile.tobytes()
+            hashes[key] = hashlib.sha256(data).hexdigest()
+            path = os.path.join(tiles_dir, str(zoom), str(y), f"{x}.{TILE_FORMAT}")
+            if previous.get(key) == hashes[key] and os.path.exists(path):
+                continue
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Keep a bounded number of raw tiles in flight
+            if len(pending) >= max_workers * 4:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    written_bytes += future.result()
+            pending.add(pool.submit(encode_tile, path, data))
+            written += 1
+        for future in pending:
+            written_bytes += future.result()
+
+    # dzsave also writes a one-band stand-in for viewers to show where a tile is missing
+    blank_path = os.path.join(tiles_dir, 'blank.png')
+    if not os.path.exists(blank_path):
+        Image.new('L', (TILE_SIZE, TILE_SIZE), 1).save(blank_path, dpi=(25.4, 25.4))
+
+    # Drop tiles that fell outside the map or turned blank since the last run
+    removed = 0
+    for key in set(previous) - set(hashes):
+        zoom, y, x = key.split('/')
+        try:
+            os.remove(os.path.join(tiles_dir, zoom, y, f"{x}.{TILE_FORMAT}"))
+            removed += 1
+        except OSError:
+            pass
+        try:
+            # dzsave writes no empty rows either
+            os.rmdir(os.path.join(tiles_dir, zoom, y))
+        except OSError:
+            pass
+
+    manifest = {
+        'source': os.path.basename(source_path),
+        'width': width,
+        'height': height,
+        'tile_size': TILE_SIZE,
+        'url': f"/tiles/{{z}}/{{y}}/{{x}}.{TILE_FORMAT}",
+        'min_zoom': 0,
+        'max_zoom': levels[-1]['zoom'],
+        'levels': levels,
+    }
+    with open(os.path.join(tiles_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    with open(cache_path, 'w') as f:
+        json.dump({'settings': settings, 'tiles': hashes}, f, separators=(',', ':'), sort_keys=True)
+
+    print(f"Tiles: {len(hashes)} in {len(levels)} levels ({blank} blank skipped), {written} re-encoded "
+          f"({written_bytes} bytes), {len(hashes) - written} unchanged, {removed} removed")
+    return manifest
+
 def main():
+    parser = argparse.ArgumentParser(description="Generate public/maps/manifest.json and optionally the public/tiles pyramid")
+    parser.add_argument('--tiles', metavar='WORLD_PNG',
+                        help='Also tile this composited world map (e.g. FullMapFinal.png) into public/tiles, '
+                             're-encoding only tiles whose pixels changed')
+    parser.add_argument('--jobs', type=int, default=0,
+                        help='Worker processes for tile encoding and map optimisation (0 = one per CPU core)')
+    parser.add_argument('--optimize', action='store_true',
+                        help='Losslessly recompress public/maps PNGs (indexed when <= 256 colours, max zlib, '
+                             'metadata stripped), skipping maps already optimised')
+    args = parser.parse_args()
+
     base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     blocks_asm = os.path.join(base_dir, 'polishedcrystal/data/maps/blocks.asm')
     maps_dir = os.path.join(base_dir, 'public/maps')
@@ -89,5 +472,13 @@ def main():
     locations_with_maps = sum(1 for loc in location_to_map if loc in manifest)
     print(f"Locations with available maps: {locations_with_maps}/{len(location_to_map)}")
 
+    public_dir = os.path.join(base_dir, 'public')
+    if args.optimize:
+        optimize_maps(maps_dir, os.path.join(public_dir, OPTIMIZE_CACHE), args.jobs)
+
+    if args.tiles:
+        build_tile_pyramid(args.tiles, os.path.join(public_dir, 'tiles'),
+                           os.path.join(public_dir, TILE_CACHE), args.jobs)
+
 if __name__ == '__main__':
     main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Check that generate-map-manifest.py --tiles lays out the same tile tree as vips dzsave.
+
+Writes a sparse world map at the size recorded in public/vips-properties.xml, opaque
+over exactly the full-resolution tiles public/tiles has and transparent elsewhere,
+tiles it with build_tile_pyramid, and compares the tiles written at every zoom level,
+and blank.png, with public/tiles:
+
+    python3 scripts/verify-map-tiles.py
+"""
+
+import argparse
+import importlib.util
+import math
+import os
+import resource
+import struct
+import sys
+import tempfile
+import xml.etree.ElementTree as ET
+import zlib
+
+from PIL import Image
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+spec = importlib.util.spec_from_file_location('generate_map_manifest',
+                                              os.path.join(BASE_DIR, 'scripts', 'generate-map-manifest.py'))
+generate_map_manifest = importlib.util.module_from_spec(spec)
+# Registered so the tile encoding workers can find encode_tile
+sys.modules[spec.name] = generate_map_manifest
+spec.loader.exec_module(generate_map_manifest)
+
+
+def tile_tree(tiles_dir):
+    """{zoom: set of (x, y)} of the tiles under a google layout tiles_dir"""
+    tree = {}
+    for zoom in os.listdir(tiles_dir):
+        if not zoom.isdigit():
+            continue
+        tiles = tree.setdefault(int(zoom), set())
+        for y in os.listdir(os.path.join(tiles_dir, zoom)):
+            for name in os.listdir(os.path.join(tiles_dir, zoom, y)):
+                if name.endswith(f".{generate_map_manifest.TILE_FORMAT}"):
+                    tiles.add((int(name.split('.')[0]), int(y)))
+    return tree
+
+
+def read_vips_size(properties_path):
+    """(width, height) of the image dzsave tiled, from its vips-properties.xml"""
+    values = {}
+    for prop in ET.parse(properties_path).getroot().iter():
+        if prop.tag.endswith('property'):
+            name, value = list(prop)
+            values[name.text] = value.text
+    return int(values['width']), int(values['height'])
+
+
+def write_sparse_map(path, width, height, opaque, tile_size):
+    """Write an RGBA PNG, opaque grey over the (x, y) tiles in opaque and transparent elsewhere
+
+    Scanlines are compressed one tile row at a time, so the map is never held in memory.
+    """
+    png_chunk = generate_map_manifest.png_chunk
+    compressor = zlib.compressobj(1)
+    with open(path, 'wb') as f:
+        f.write(generate_map_manifest.PNG_SIGNATURE)
+        f.write(png_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0)))
+        for row in range(math.ceil(height / tile_size)):
+            line = bytearray(math.ceil(width / tile_size) * tile_size * 4)
+            for x, y in opaque:
+                if y == row:
+                    line[x * tile_size * 4:(x + 1) * tile_size * 4] = b'\x80\x80\x80\xff' * tile_size
+            scanline = b'\x00' + bytes(line[:width * 4])
+            data = compressor.compress(scanline * min(tile_size, height - row * tile_size))
+            if data:
+                f.write(png_chunk(b'IDAT', data))
+        f.write(png_chunk(b'IDAT', compressor.flush()))
+        f.write(png_chunk(b'IEND', b''))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check generate-map-manifest.py's tile tree against vips dzsave's")
+    parser.add_argument('--tiles-dir', default=os.path.join(BASE_DIR, 'public', 'tiles'),
+                        help='dzsave google layout tree to compare against')
+    parser.add_argument('--properties', default=os.path.join(BASE_DIR, 'public', 'vips-properties.xml'),
+                        help="dzsave's vips-properties.xml for that tree")
+    parser.add_argument('--jobs', type=int, default=0, help='Worker processes for tile encoding')
+    args = parser.parse_args()
+
+    expected = tile_tree(args.tiles_dir)
+    width, height = read_vips_size(args.properties)
+    max_zoom = max(expected)
+    mismatches = 0
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        source_path = os.path.join(work_dir, 'world.png')
+        tiles_dir = os.path.join(work_dir, 'tiles')
+        write_sparse_map(source_path, width, height, expected[max_zoom], generate_map_manifest.TILE_SIZE)
+        generate_map_manifest.build_tile_pyramid(source_path, tiles_dir, os.path.join(work_dir, 'cache.json'),
+                                                 args.jobs)
+        built = tile_tree(tiles_dir)
+
+        for zoom in sorted(set(expected) | set(built)):
+            for x, y in sorted(expected.get(zoom, set()) ^ built.get(zoom, set())):
+                mismatches += 1
+                where = 'only in' if (x, y) in built.get(zoom, set()) else 'missing from'
+                print(f"MISMATCH tile {zoom}/{y}/{x}: {where} the generated tree")
+            print(f"  zoom {zoom}: {len(built.get(zoom, set()))} tiles, {len(expected.get(zoom, set()))} expected")
+
+        with Image.open(os.path.join(args.tiles_dir, 'blank.png')) as reference, \
+                Image.open(os.path.join(tiles_dir, 'blank.png')) as blank:
+            if (blank.mode, blank.size, blank.tobytes()) != (reference.mode, reference.size, reference.tobytes()):
+                mismatches += 1
+                print("MISMATCH blank.png: pixels differ from the dzsave tree")
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // 1024
+    print(f"Verified tile tree of a {width}x{height} map over {max_zoom + 1} levels: "
+          f"{mismatches} mismatches (peak RSS {peak} MB)")
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Check that process_sprites.py's fast paths give the same results as the code they replaced.
+
+The palette engine is compared byte-for-byte against the original per-pixel colorizer
+loops, over every gray level in each source mode and every frame of every sheet in the
+ROM tree:
+
+    python3 scripts/verify-sprites.py --rom-path polishedcrystal
+
+With --rom-image, also checks that reading pics and palettes from the built ROM lists
+the same Pokemon, trainers and trainer palette variants as the PNG tree it was built from:
+
+    python3 scripts/verify-sprites.py --rom-path polishedcrystal --rom-image polishedcrystal/polishedcrystal.gbc
+"""
+
+import argparse
+import sys
+import tempfile
+from pathlib import Path
+from typing import List, Tuple
+
+from PIL import Image
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+from process_sprites import GBCRomImage, GBCSpriteProcessor, RomImageSprites  # noqa: E402
+
+
+class ReferenceColorizers:
+    """Original per-pixel colorizer loops, kept to verify GBCPaletteEngine output"""
+
+    @staticmethod
+    def apply_palette_to_sprite(sprite: Image.Image, palette: List[Tuple[int, int, int]]) -> Image.Image:
+        gray_pixels = sprite.convert('L').load()
+        palette = list(palette)
+        while len(palette) < 4:
+            palette.append((255, 255, 255))
+        rgba_sprite = Image.new('RGBA', sprite.size, (0, 0, 0, 0))
+        pixels = rgba_sprite.load()
+        for y in range(sprite.size[1]):
+            for x in range(sprite.size[0]):
+                gray_value = gray_pixels[x, y]
+                if gray_value >= 240:
+                    pixels[x, y] = (0, 0, 0, 0)
+                elif gray_value >= 170:
+                    pixels[x, y] = (*palette[0], 255)
+                elif gray_value >= 85:
+                    pixels[x, y] = (*palette[1], 255)
+                else:
+                    pixels[x, y] = (*palette[2], 255)
+        return rgba_sprite
+
+    @staticmethod
+    def apply_palette_to_mini_sprite(sprite: Image.Image, palette: List[Tuple[int, int, int]]) -> Image.Image:
+        gray_pixels = sprite.convert('L').load()
+        palette = list(palette)
+        while len(palette) < 4:
+            palette.append((255, 255, 255))
+        rgba_sprite = Image.new('RGBA', sprite.size, (0, 0, 0, 0))
+        pixels = rgba_sprite.load()
+        for y in range(sprite.size[1]):
+            for x in range(sprite.size[0]):
+                gray_value = gray_pixels[x, y]
+                if gray_value >= 192:
+                    pixels[x, y] = (*palette[0], 255)
+                elif gray_value >= 128:
+                    pixels[x, y] = (*palette[1], 255)
+                elif gray_value >= 64:
+                    pixels[x, y] = (*palette[2], 255)
+                else:
+                    pixels[x, y] = (*palette[3], 255)
+        return rgba_sprite
+
+    @staticmethod
+    def apply_icon_palette(icon_frame: Image.Image, colors: List[Tuple[int, int, int]]) -> Image.Image:
+        gray_frame = icon_frame if icon_frame.mode == 'L' else icon_frame.convert('L')
+        gray_pixels = gray_frame.load()
+        rgba = Image.new('RGBA', icon_frame.size, (0, 0, 0, 0))
+        rgba_pixels = rgba.load()
+        for y in range(icon_frame.size[1]):
+            for x in range(icon_frame.size[0]):
+                gray_value = gray_pixels[x, y]
+                if gray_value >= 250:
+                    rgba_pixels[x, y] = (0, 0, 0, 0)
+                elif gray_value >= 192:
+                    rgba_pixels[x, y] = (*colors[0], 255)
+                elif gray_value >= 128:
+                    rgba_pixels[x, y] = (*colors[1], 255)
+                elif gray_value >= 64:
+                    rgba_pixels[x, y] = (*colors[2], 255)
+                else:
+                    rgba_pixels[x, y] = (*colors[3], 255)
+        return rgba
+
+    @staticmethod
+    def apply_icon_transparency(icon_frame: Image.Image) -> Image.Image:
+        rgba = Image.new('RGBA', icon_frame.size, (0, 0, 0, 0))
+        gray_pixels = icon_frame.load()
+        rgba_pixels = rgba.load()
+        for y in range(icon_frame.size[1]):
+            for x in range(icon_frame.size[0]):
+                gray_value = gray_pixels[x, y]
+                if gray_value >= 250:
+                    rgba_pixels[x, y] = (0, 0, 0, 0)
+                else:
+                    rgba_pixels[x, y] = (gray_value, gray_value, gray_value, 255)
+        return rgba
+
+    @staticmethod
+    def apply_mask_to_sprite(sprite: Image.Image, mask: Image.Image) -> Image.Image:
+        sprite = sprite.convert('RGBA')
+        sprite_pixels = sprite.load()
+        mask_pixels = mask.convert('L').load()
+        masked_sprite = Image.new('RGBA', sprite.size, (0, 0, 0, 0))
+        result_pixels = masked_sprite.load()
+        for y in range(sprite.size[1]):
+            for x in range(sprite.size[0]):
+                if mask_pixels[x, y] < 128:
+                    result_pixels[x, y] = sprite_pixels[x, y]
+        return masked_sprite
+
+
+def verify_palette_engine(processor: GBCSpriteProcessor) -> bool:
+    """Check GBCPaletteEngine output byte-for-byte against the original per-pixel loops"""
+    # Every gray level in each source mode the ROM sheets may be stored in
+    gradient = Image.new('L', (16, 16))
+    gradient.putdata(list(range(256)))
+    samples = [(f"gradient:{mode}", gradient.convert(mode)) for mode in ['L', 'LA', 'P', 'RGB', 'RGBA']]
+
+    # Plus every frame of every source sheet found in the ROM
+    sheet_paths = [processor.pokemon_dir / name / f"{sprite_type}.png"
+                   for name in processor.get_pokemon_list() for sprite_type in ['front', 'back']]
+    sheet_paths += [processor.trainer_dir / f"{name}.png" for name in processor.get_trainer_list()]
+    sheet_paths += [processor.items_dir / f"{name}.png" for name in processor.get_item_list()]
+    sheet_paths += [processor.minis_dir / f"{name}.png" for name in processor.get_mini_list()]
+    sheet_paths += [processor.icons_dir / f"{name}.png" for name in processor.get_icon_list()]
+    for sheet_path in sheet_paths:
+        if processor.assets.exists(sheet_path):
+            with Image.open(sheet_path) as img:
+                samples.append((str(sheet_path), img.convert('RGBA')))
+
+    palette = [(248, 176, 64), (120, 64, 16), (0, 0, 0), (0, 0, 0)]
+    icon_colors = [processor._convert_gbc_to_rgb(c) for c in processor.icon_palettes['RED']]
+    mismatches = 0
+
+    for label, image in samples:
+        gray = image.convert('L')
+        mask = image
+        checks = [
+            ('sprite', processor.apply_palette_to_sprite(image, palette),
+             ReferenceColorizers.apply_palette_to_sprite(image, palette)),
+            ('mini', processor.apply_palette_to_mini_sprite(image, palette),
+             ReferenceColorizers.apply_palette_to_mini_sprite(image, palette)),
+            ('icon', processor.apply_icon_palette(image, processor.icon_palettes['RED'], processor.icon_palettes['RED']),
+             ReferenceColorizers.apply_icon_palette(image, icon_colors)),
+            ('icon_transparency', processor.apply_icon_transparency(gray),
+             ReferenceColorizers.apply_icon_transparency(gray)),
+            ('mask', processor.apply_mask_to_sprite(image, mask),
+             ReferenceColorizers.apply_mask_to_sprite(image, mask)),
+        ]
+        for check_name, engine_img, reference_img in checks:
+            if (engine_img.mode, engine_img.size, engine_img.tobytes()) != \
+                    (reference_img.mode, reference_img.size, reference_img.tobytes()):
+                mismatches += 1
+                print(f"MISMATCH {check_name}: {label}")
+
+    print(f"Verified palette engine on {len(samples)} images: {mismatches} mismatches")
+    return mismatches == 0
+
+
+def verify_rom_image(png_processor: GBCSpriteProcessor, image_processor: GBCSpriteProcessor) -> bool:
+    """Check that a --rom-image processor finds the same sprites and trainer variants as a PNG one"""
+    def sprite_lists(processor):
+        # Palette-only Pokemon directories (forms sharing another's sheets) render nothing either way
+        pokemon = {name for name in processor.get_pokemon_list()
+                   if processor.assets.exists(processor.pokemon_dir / name / "front.png")}
+        return [('pokemon', pokemon), ('trainers', set(processor.get_trainer_list()))]
+
+    mismatches = 0
+    for (label, from_pngs), (_, from_image) in zip(sprite_lists(png_processor), sprite_lists(image_processor)):
+        for name in sorted(from_pngs ^ from_image):
+            mismatches += 1
+            print(f"MISMATCH {label}: {name} only {'in the PNG tree' if name in from_pngs else 'in the ROM image'}")
+
+    trainers = sorted(set(png_processor.get_trainer_list()) & set(image_processor.get_trainer_list()))
+    for trainer in trainers:
+        from_pngs = png_processor.get_trainer_palettes(trainer)
+        from_image = image_processor.get_trainer_palettes(trainer)
+        if from_pngs != from_image:
+            mismatches += 1
+            print(f"MISMATCH trainer variants: {trainer}: {from_pngs} from the PNG tree, {from_image} from the ROM image")
+
+    print(f"Verified ROM image sprite lists and variants of {len(trainers)} trainers: {mismatches} mismatches")
+    return mismatches == 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check process_sprites.py's fast paths against reference output")
+    parser.add_argument('--rom-path', default='polishedcrystal', help='Path to ROM directory')
+    parser.add_argument('--rom-image', metavar='GBC', help='Also compare this built ROM against the PNG tree')
+    parser.add_argument('--rom-sym', metavar='SYM', help='Symbol file of --rom-image, if not next to it')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        (Path(work_dir) / 'sprites').mkdir()
+        processor = GBCSpriteProcessor(args.rom_path, work_dir)
+        ok = verify_palette_engine(processor)
+        if args.rom_image:
+            image_processor = GBCSpriteProcessor(args.rom_path, work_dir)
+            image_processor.rom_image = RomImageSprites(GBCRomImage(args.rom_image, args.rom_sym),
+                                                        image_processor.rom_path)
+            ok = verify_rom_image(processor, image_processor) and ok
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,11 @@
 import { useState, useEffect } from 'react';
 import { SpriteInfo, SpriteVariant, SpriteType, SpriteFacing, UnifiedSpriteManifest } from '@/types/spriteTypes';
-import { loadUnifiedSpriteManifest, getUnifiedSpriteWithFallback } from '@/utils/spriteUtils';
+import {
+  loadSpriteManifestEntries,
+  getUnifiedSpriteWithFallback,
+  getPokemonManifestKeys,
+  getTrainerManifestKey,
+} from '@/utils/spriteUtils';
 
 interface UseSpriteDataResult {
   spriteInfo: SpriteInfo | null;
@@ -20,11 +25,13 @@ export function useSpriteData(
   const [error, setError] = useState<string | null>(null);
   const [manifest, setManifest] = useState<UnifiedSpriteManifest | null>(null);
 
-  // Load manifest once
+  // Load the manifest shards holding this sprite and its base Pokemon
   useEffect(() => {
     let isMounted = true;
+    const fullSpriteName =
+      form !== undefined && form !== 'plain' ? `${spriteName}_${form}` : spriteName;
 
-    loadUnifiedSpriteManifest()
+    loadSpriteManifestEntries('pokemon', getPokemonManifestKeys(fullSpriteName))
       .then((loadedManifest) => {
         if (isMounted) {
           setManifest(loadedManifest);
@@ -41,7 +48,7 @@ export function useSpriteData(
     return () => {
       isMounted = false;
     };
-  }, []);
+  }, [spriteName, form]);
 
   // Get sprite info when manifest or dependencies change
   useEffect(() => {
@@ -88,7 +95,7 @@ export function useTrainerSpriteData(trainerName: string): UseSpriteDataResult {
   useEffect(() => {
     let isMounted = true;
 
-    loadUnifiedSpriteManifest()
+    loadSpriteManifestEntries('trainers', [getTrainerManifestKey(trainerName)])
       .then((loadedManifest) => {
         if (isMounted) {
           setManifest(loadedManifest);
@@ -105,7 +112,7 @@ export function useTrainerSpriteData(trainerName: string): UseSpriteDataResult {
     return () => {
       isMounted = false;
     };
-  }, []);
+  }, [trainerName]);
 
   useEffect(() => {
     if (!manifest) {
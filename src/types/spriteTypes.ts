@@ -2,6 +2,14 @@ export interface SpriteInfo {
   url: string;
   width: number;
   height: number;
+  // Atlas placement, present for icons, items and minis when atlases are generated
+  atlas?: string;
+  x?: number;
+  y?: number;
+  w?: number;
+  h?: number;
+  // Alternate encodings of an animated sprite, keyed by format ('webp', 'apng')
+  formats?: Record<string, string>;
 }
 
 export interface PokemonSpriteData {
@@ -24,6 +32,14 @@ export interface UnifiedSpriteManifest {
   trainers: Record<string, TrainerSpriteData>;
 }
 
+// Index of the sharded manifests written to /sprite_manifests/ next to sprite_manifest.json.
+// An entry named `name` lives in shards.replace('{bucket}', fnv1a32(name) % buckets).
+export interface SpriteManifestIndex {
+  version: number;
+  hash: 'fnv1a-32';
+  categories: Record<string, { entries: number; buckets: number; file: string; shards: string }>;
+}
+
 // Legacy types for backward compatibility
 export interface SpriteManifest {
   [pokemonName: string]: PokemonSpriteData;
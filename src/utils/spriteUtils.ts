@@ -8,6 +8,7 @@ import {
   TrainerSpriteData,
   UnifiedSpriteManifest,
   SpriteCategory,
+  SpriteManifestIndex,
 } from '@/types/spriteTypes';
 
 // Known form suffixes that should be preserved with underscores
@@ -168,6 +169,103 @@ export async function loadUnifiedSpriteManifest(): Promise<UnifiedSpriteManifest
   }
 }
 
+let manifestIndex: Promise<SpriteManifestIndex | null> | null = null;
+const manifestShards = new Map<string, Promise<Record<string, unknown>>>();
+
+/**
+ * 32-bit FNV-1a hash of a name's UTF-8 bytes, matching fnv1a_32 in process_sprites.py
+ */
+function fnv1a32(text: string): number {
+  let hash = 0x811c9dc5;
+  for (const byte of new TextEncoder().encode(text)) {
+    hash ^= byte;
+    hash = Math.imul(hash, 0x01000193);
+  }
+  return hash >>> 0;
+}
+
+function loadSpriteManifestIndex(): Promise<SpriteManifestIndex | null> {
+  if (!manifestIndex) {
+    manifestIndex = fetch('/sprite_manifests/index.json')
+      .then((response) => (response.ok ? response.json() : null))
+      .catch(() => null);
+  }
+  return manifestIndex;
+}
+
+function loadSpriteManifestShard(url: string): Promise<Record<string, unknown>> {
+  let shard = manifestShards.get(url);
+  if (!shard) {
+    shard = fetch(url).then((response) => {
+      if (!response.ok) {
+        throw new Error(`Failed to load sprite manifest shard: ${response.statusText}`);
+      }
+      return response.json();
+    });
+    manifestShards.set(url, shard);
+  }
+  return shard;
+}
+
+/**
+ * Load only the manifest entries for a few names, from the small hash-bucket shards
+ * that hold them. The result has the unified manifest's shape with just those entries.
+ * Falls back to the full unified manifest when the sharded manifests are unavailable.
+ */
+export async function loadSpriteManifestEntries(
+  category: 'pokemon' | 'trainers',
+  names: string[],
+): Promise<UnifiedSpriteManifest | null> {
+  if (unifiedManifest) {
+    return unifiedManifest;
+  }
+
+  const index = await loadSpriteManifestIndex();
+  const categoryIndex = index?.categories[category];
+  if (!categoryIndex) {
+    return loadUnifiedSpriteManifest();
+  }
+
+  try {
+    const partial: UnifiedSpriteManifest = { pokemon: {}, trainers: {} };
+    const entries = partial[category] as Record<string, unknown>;
+    await Promise.all(
+      names.map(async (name) => {
+        const bucket = fnv1a32(name) % categoryIndex.buckets;
+        const shard = await loadSpriteManifestShard(
+          `/${categoryIndex.shards.replace('{bucket}', String(bucket))}`,
+        );
+        if (name in shard) {
+          entries[name] = shard[name];
+        }
+      }),
+    );
+    return partial;
+  } catch (error) {
+    console.error('Failed to load sprite manifest shards:', error);
+    return loadUnifiedSpriteManifest();
+  }
+}
+
+/**
+ * Manifest keys getUnifiedSpriteWithFallback may look up for a Pokemon sprite name:
+ * the name itself and, for forms, its base Pokemon
+ */
+export function getPokemonManifestKeys(spriteName: string): string[] {
+  const keys = [normalizePokemonName(spriteName)];
+  if (spriteName.includes('_')) {
+    keys.push(normalizePokemonName(spriteName.split('_')[0]));
+  }
+  return keys;
+}
+
+/**
+ * Manifest key getTrainerSprite looks up for a trainer name
+ */
+export function getTrainerManifestKey(trainerName: string): string {
+  return trainerName.toLowerCase().replace(/-/g, '_');
+}
+
 /**
  * Legacy function for backward compatibility
  */
@@ -274,7 +372,7 @@ export function getTrainerSprite(
   trainerName: string,
   variant?: string,
 ): SpriteInfo | null {
-  const normalizedName = trainerName.toLowerCase().replace(/-/g, '_');
+  const normalizedName = getTrainerManifestKey(trainerName);
 
   // Handle both unified and legacy manifests
   const trainerData =